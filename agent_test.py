@@ -3,11 +3,22 @@ tests to run and debug your minimax and alphabeta agents locally.  The test
 cases used by the project assistant are not public.
 """
 
+import os
+import random
+import tempfile
+import time
 import unittest
 
 import isolation
 import game_agent
 import competition_agent
+import benchmark
+import endgame
+import build_book
+import build_tablebase
+import keyfile
+import opening_book
+import tablebase
 from sample_players import open_move_score
 
 from importlib import reload
@@ -19,13 +30,15 @@ class IsolationTest(unittest.TestCase):
     def setUp(self):
         reload(game_agent)
         self.player1 = game_agent.MinimaxPlayer()
-        self.player1.time_left = lambda: 15.
+        self.player1.time_left = lambda: 100.
         self.player2 = game_agent.AlphaBetaPlayer()
-        self.player2.time_left = lambda: 15.
+        self.player2.time_left = lambda: 100.
         self.game = isolation.Board(self.player1, self.player2)
 
     def testInit(self):
-        self.assertEqual(self.player1.TIMER_THRESHOLD, 11.)
+        self.assertEqual(self.player1.TIMER_THRESHOLD, game_agent.calibrated_timer_threshold())
+        self.assertGreaterEqual(self.player1.TIMER_THRESHOLD, game_agent.MIN_TIMER_THRESHOLD)
+        self.assertEqual(game_agent.AlphaBetaPlayer(timeout=11.).TIMER_THRESHOLD, 11.)
         
     def testCustomScore(self):
         self.game.apply_move((2, 3))
@@ -88,6 +101,1129 @@ class IsolationTest(unittest.TestCase):
         self.game.apply_move((4, 2))
         self.assertEqual(self.player2.alphabeta(self.game, 1, float("-inf"), float("inf")), (2, 4))
 
+    def testPushPop(self):
+        self.game.apply_move((2, 3))
+        before = list(self.game._board_state)
+        self.game.push((0, 5))
+        self.game.push((4, 2))
+        self.assertEqual(self.game.get_player_location(self.player1), (4, 2))
+        self.game.pop()
+        self.game.pop()
+        self.assertEqual(self.game._board_state, before)
+        self.assertEqual(self.game.move_count, 1)
+        self.assertIs(self.game.active_player, self.player2)
+
+    def testZobristKey(self):
+        self.assertEqual(self.game.zobrist_key, 0)
+        self.game.push((2, 3))
+        self.game.push((2, 1))
+        key = self.game.zobrist_key
+        self.assertNotEqual(key, 0)
+        self.assertTrue(0 <= key < 2**64)
+        self.assertEqual(self.game.copy().hash(), key)
+
+        self.game.push((0, 2))
+        self.game.push((4, 2))
+
+        # Transposition: the players swap their starting cells, so the same
+        # cells end up blocked and both players end on the same cells
+        transposed = isolation.Board(self.player1, self.player2)
+        for move in [(2, 1), (2, 3), (0, 2), (4, 2)]:
+            transposed.apply_move(move)
+        self.assertEqual(self.game.zobrist_key, transposed.zobrist_key)
+
+        # Same blocked cells, but the players stand on each other's cells
+        swapped = isolation.Board(self.player1, self.player2)
+        for move in [(2, 3), (2, 1), (4, 2), (0, 2)]:
+            swapped.apply_move(move)
+        self.assertNotEqual(self.game.zobrist_key, swapped.zobrist_key)
+
+        self.game.pop()
+        self.game.pop()
+        self.assertEqual(self.game.zobrist_key, key)
+        self.game.pop()
+        self.game.pop()
+        self.assertEqual(self.game.zobrist_key, 0)
+
+    def testZobristKeyIsStable(self):
+        self.game.apply_move((2, 3))
+        self.game.apply_move((0, 5))
+        self.assertEqual(self.game.zobrist_key, 0xf08e2408b6675c5e)
+
+    def testMobility(self):
+        for board_class in [isolation.Board, isolation.BitBoard]:
+            game = board_class(self.player1, self.player2, seed=3)
+            while True:
+                for player in [self.player1, self.player2]:
+                    opponent = game.get_opponent(player)
+                    self.assertEqual(game.mobility(player), (
+                        game.utility(player), len(game.get_legal_moves(player)),
+                        len(game.get_legal_moves(opponent))))
+                    self.assertEqual(game.is_winner(player), game.utility(player) == float("inf"))
+                    self.assertEqual(game.is_loser(player), game.utility(player) == float("-inf"))
+                legal_moves = game.get_legal_moves()
+                if not legal_moves:
+                    break
+                game.apply_move(legal_moves[0])
+            self.assertEqual(game.mobility(game.active_player)[0], float("-inf"))
+
+    def testDegrees(self):
+        def blank_neighbors(game, idx):
+            row, col = game.index_to_move(idx)
+            return sum(game.move_is_legal((row + dr, col + dc))
+                       for dr, dc in isolation.isolation.KNIGHT_DIRECTIONS)
+
+        rng = random.Random(5)
+        game = isolation.Board(self.player1, self.player2, width=6, height=5)
+        initial = list(game._degrees)
+        while game.get_legal_moves():
+            game.push(rng.choice(game.get_legal_moves()))
+            copied = game.copy()
+            for board in (game, copied):
+                self.assertEqual(board._degrees, [blank_neighbors(board, idx)
+                                                  for idx in range(len(board._degrees))])
+        while game.move_count:
+            game.pop()
+        self.assertEqual(game._degrees, initial)
+
+    def testCanonicalKey(self):
+        moves = [(1,1), (3,2), (2,4)]
+        for board_class in [isolation.Board, isolation.BitBoard]:
+            game = board_class(self.player1, self.player2)
+            for move in moves:
+                game.apply_move(move)
+            key, symmetry = game.canonical_key()
+            self.assertEqual(dict(game.symmetric_keys())[0], game.zobrist_key)
+            self.assertEqual(dict(game.symmetric_keys())[symmetry], key)
+            for image_symmetry in range(8):
+                image = board_class(self.player1, self.player2)
+                for move in moves:
+                    image.apply_move(game.symmetric_move(move, image_symmetry))
+                self.assertEqual(dict(game.symmetric_keys())[image_symmetry], image.zobrist_key)
+                self.assertEqual(image.canonical_key()[0], key)
+                self.assertEqual(game.symmetric_configurations()[image_symmetry],
+                                 image._board_state[:49])
+
+    def testNonSquareSymmetries(self):
+        game = isolation.Board(self.player1, self.player2, width=5, height=7)
+        self.assertEqual(game.symmetries(), [0, 1, 2, 4])
+        self.assertRaises(ValueError, game.symmetric_move, (1, 1), 3)
+        game.apply_move((1,1))
+        game.apply_move((5,0))
+        self.assertEqual([symmetry for symmetry, _ in game.symmetric_keys()], [0, 1, 2, 4])
+        self.assertIsNone(game.symmetric_configurations()[3])
+        for symmetry in game.symmetries():
+            image = isolation.Board(self.player1, self.player2, width=5, height=7)
+            image.apply_move(game.symmetric_move((1,1), symmetry))
+            image.apply_move(game.symmetric_move((5,0), symmetry))
+            self.assertEqual(image.canonical_key()[0], game.canonical_key()[0])
+
+    def testSearchRestoresBoardOnTimeout(self):
+        self.game.apply_move((2, 3))
+        self.game.apply_move((0, 5))
+        before = list(self.game._board_state)
+        calls = iter(range(100))
+        self.player2.time_left = lambda: 100. if next(calls, None) is not None else 0.
+        self.assertRaises(game_agent.SearchTimeout, self.player2.alphabeta, self.game, 5)
+        self.assertEqual(self.game._board_state, before)
+
+class TranspositionTableTest(unittest.TestCase):
+    def setUp(self):
+        self.tt = game_agent.TranspositionTable(2**12)
+
+    def testMemoryCeiling(self):
+        self.assertTrue(self.tt.size * self.tt.ENTRY_BYTES <= 2**12)
+        self.assertTrue(2 * self.tt.size * self.tt.ENTRY_BYTES > 2**12)
+
+    def testStoreLookup(self):
+        self.tt.store(12345, 3, 2.5, 0., 10., 30)
+        self.assertEqual(self.tt.lookup(12345, 3, 0., 10.), (2.5, 30))
+        # Too shallow for a cutoff, but the move is still useful for ordering
+        self.assertEqual(self.tt.lookup(12345, 4, 0., 10.), (None, 30))
+        self.assertEqual(self.tt.lookup(54321, 1, 0., 10.), (None, None))
+
+    def testBounds(self):
+        self.tt.store(1, 3, 5., float("-inf"), 4., 8)
+        self.assertEqual(self.tt.lookup(1, 3, float("-inf"), 4.)[0], 5.)
+        self.assertEqual(self.tt.lookup(1, 3, float("-inf"), 6.)[0], None)
+        self.tt.store(2, 3, -1., 0., 4., 8)
+        self.assertEqual(self.tt.lookup(2, 3, 0., 4.)[0], -1.)
+        self.assertEqual(self.tt.lookup(2, 3, -2., 4.)[0], None)
+
+    def testReplacement(self):
+        buckets = self.tt.mask + 1
+        deep, shallow, newer = 7, 7 + buckets, 7 + 2 * buckets
+        self.tt.store(deep, 6, 1., 0., 10., None)
+        self.tt.store(shallow, 2, 2., 0., 10., None)
+        self.tt.store(newer, 1, 3., 0., 10., None)
+        self.assertEqual(self.tt.lookup(deep, 6, 0., 10.)[0], 1.)
+        self.assertEqual(self.tt.lookup(shallow, 2, 0., 10.)[0], None)
+        self.assertEqual(self.tt.lookup(newer, 1, 0., 10.)[0], 3.)
+
+        self.tt.new_search()
+        self.tt.store(shallow, 2, 2., 0., 10., None)
+        self.assertEqual(self.tt.lookup(shallow, 2, 0., 10.)[0], 2.)
+        self.assertEqual(self.tt.lookup(deep, 6, 0., 10.)[0], None)
+
+    def testSearchWithTable(self):
+        player1 = game_agent.AlphaBetaPlayer(tt_bytes=0)
+        player2 = game_agent.AlphaBetaPlayer()
+        for player in [player1, player2]:
+            player.time_left = lambda: 1000.
+        scores = []
+        for player in [player1, player2]:
+            game = isolation.Board(player, game_agent.AlphaBetaPlayer())
+            game.apply_move((2, 3))
+            game.apply_move((0, 5))
+            scores.append(player.max_value(game, 4, float("-inf"), float("inf")))
+        self.assertEqual(scores[0], scores[1])
+
+
+class MoveOrderingTest(unittest.TestCase):
+    def setUp(self):
+        self.opponent = game_agent.AlphaBetaPlayer()
+
+    def search(self, player, depth):
+        player.time_left = lambda: 1000.
+        game = isolation.Board(player, self.opponent)
+        game.apply_move((2, 3))
+        game.apply_move((0, 5))
+        return game, player.max_value(game, depth, float("-inf"), float("inf"))
+
+    def testSameScore(self):
+        _, unordered = self.search(game_agent.AlphaBetaPlayer(tt_bytes=0, move_ordering=False), 4)
+        _, ordered = self.search(game_agent.AlphaBetaPlayer(tt_bytes=0), 4)
+        self.assertEqual(unordered, ordered)
+
+    def testPrincipalVariation(self):
+        player = game_agent.AlphaBetaPlayer(tt_bytes=0)
+        game, _ = self.search(player, 3)
+        root = game.move_count
+        self.assertEqual(player.pv_length[root], root + 3)
+        for move in player.pv_table[root][root:root + 3]:
+            self.assertIn(move, game.get_legal_indices())
+            game.push_index(move)
+
+    def testKillersAndHistory(self):
+        player = game_agent.AlphaBetaPlayer(tt_bytes=0)
+        self.search(player, 4)
+        self.assertTrue(any(killers[0] is not None for killers in player.killers))
+        self.assertTrue(player.history)
+
+    def testShuffleSwitch(self):
+        player = game_agent.AlphaBetaPlayer()
+        for board_class in [isolation.Board, isolation.BitBoard]:
+            game = board_class(player, self.opponent)
+            game.apply_move((3, 3))
+            game.apply_move((0, 0))
+            game.shuffle_moves = False
+            moves = game.get_legal_moves()
+            self.assertEqual(len(moves), 8)
+            for _ in range(10):
+                self.assertEqual(game.get_legal_moves(), moves)
+                self.assertEqual(game.copy().get_legal_moves(), moves)
+            self.assertFalse(game.copy().shuffle_moves)
+
+    def testNodeCount(self):
+        def count_nodes(player):
+            nodes = [0]
+            def time_left():
+                nodes[0] += 1
+                return 1000.
+            player.time_left = time_left
+            game = isolation.Board(player, self.opponent)
+            for move in [(2, 3), (0, 5), (4, 2), (2, 4)]:
+                game.apply_move(move)
+            game.shuffle_moves = False
+            for depth in range(1, 7):
+                player.alphabeta(game, depth)
+            return nodes[0]
+
+        table_only = count_nodes(game_agent.AlphaBetaPlayer(move_ordering=False, pvs=False))
+        ordered = count_nodes(game_agent.AlphaBetaPlayer(pvs=False))
+        no_table = count_nodes(game_agent.AlphaBetaPlayer(tt_bytes=0, move_ordering=False, pvs=False))
+        self.assertLess(table_only, no_table)
+        self.assertLess(ordered, table_only)
+
+    def root_scores(self, player, depth, search):
+        """Search a few positions with `search(player, game, depth)` and
+        return the root scores.
+        """
+        scores = []
+        for moves in benchmark.record_positions(4, seed=7):
+            players = [player, self.opponent] if len(moves) % 2 == 0 else [self.opponent, player]
+            game = benchmark.replay(isolation.Board, players[0], players[1], 7, 7, moves)
+            player.time_left = lambda: 1000.
+            player.reset_move_ordering(49)
+            search(player, game, depth)
+            scores.append(player.root_score)
+        return scores
+
+    def testPrincipalVariationSearch(self):
+        def full_window(player, game, depth):
+            player.alphabeta(game, depth)
+        for depth in range(1, 5):
+            self.assertEqual(
+                self.root_scores(game_agent.AlphaBetaPlayer(tt_bytes=0, pvs=True), depth, full_window),
+                self.root_scores(game_agent.AlphaBetaPlayer(tt_bytes=0, pvs=False), depth, full_window))
+
+    def testAspirationWindows(self):
+        def full_window(player, game, depth):
+            player.alphabeta(game, depth)
+        expected = self.root_scores(game_agent.AlphaBetaPlayer(tt_bytes=0), 4, full_window)
+        # Previous scores far above, far below and inside the window
+        for offset in (10., -10., 0.):
+            def aspiration(player, game, depth):
+                player.alphabeta(game, depth)
+                player.aspiration_search(game, depth, player.root_score + offset)
+            self.assertEqual(self.root_scores(game_agent.AlphaBetaPlayer(tt_bytes=0), 4, aspiration),
+                             expected)
+
+    def testLeafOnPrincipalVariation(self):
+        player = game_agent.AlphaBetaPlayer()
+        game, _ = self.search(player, 2)
+        player.follow_pv = True
+        player.max_value(game, 0, float("-inf"), float("inf"))
+        self.assertFalse(player.follow_pv)
+
+    def testSeededBoards(self):
+        for board_class in [isolation.Board, isolation.BitBoard]:
+            orders = []
+            for _ in range(2):
+                game = board_class(self.opponent, game_agent.AlphaBetaPlayer(), seed=42)
+                game.apply_move((3, 3))
+                game.apply_move((0, 0))
+                orders.append([game.get_legal_moves() for _ in range(5)] +
+                              [game.copy().get_legal_moves() for _ in range(5)])
+            self.assertEqual(orders[0], orders[1])
+            self.assertTrue(len(set(map(tuple, orders[0]))) > 1)
+
+    def testGetMoveRestoresShuffle(self):
+        player = game_agent.AlphaBetaPlayer()
+        game = isolation.Board(player, self.opponent)
+        game.apply_move((2, 3))
+        game.apply_move((0, 5))
+        calls = iter(range(2000))
+        move = player.get_move(game, lambda: 100. if next(calls, None) is not None else 0.)
+        self.assertIn(move, game.get_legal_moves())
+        self.assertTrue(game.shuffle_moves)
+
+
+class IterativeDeepeningTest(unittest.TestCase):
+    def setUp(self):
+        self.player = game_agent.AlphaBetaPlayer(collect_stats=True, endgame_cells=0)
+        self.opponent = game_agent.AlphaBetaPlayer()
+
+    def testStopsOnProvenResult(self):
+        # (3, 4) is the only winning move of player 1
+        game = isolation.Board(self.player, self.opponent, 5, 5)
+        for move in [(1, 0), (0, 4), (3, 1), (1, 2), (4, 3), (3, 3), (2, 2), (1, 4)]:
+            game.apply_move(move)
+        self.assertEqual(self.player.get_move(game, lambda: 1000.), (3, 4))
+        self.assertEqual(self.player.root_score, float("inf"))
+        self.assertLess(self.player.stats.moves[0]["depth"], 17)
+
+    def testStopsWhenTreeIsExhausted(self):
+        # On a 3x3 board the players walk around the ring of 8 cells
+        game = isolation.Board(self.player, self.opponent, 3, 3)
+        game.apply_move((0, 0))
+        game.apply_move((1, 1))
+        self.player.get_move(game, lambda: 1000.)
+        self.assertEqual(self.player.stats.moves[0]["depth"], 1)
+
+    def testNoLegalMoves(self):
+        # Player 1 is cornered on (0, 0) after blocking both of its exits
+        for player in (self.player, game_agent.AlphaBetaPlayer(stack_search=True)):
+            game = isolation.Board(player, self.opponent)
+            for move in [(1, 2), (2, 1), (0, 0), (4, 4)]:
+                game.apply_move(move)
+            self.assertEqual(player.get_move(game, lambda: 100.), (-1, -1))
+            self.assertEqual(player.root_score, float("-inf"))
+
+    def testPredictsIterationTime(self):
+        game = isolation.Board(self.player, self.opponent)
+        game.apply_move((2, 3))
+        game.apply_move((0, 5))
+        # A clock that advances by 0.05 ms per node
+        time_left = lambda: 150. - 0.05 * self.player.nodes
+        self.player.get_move(game, time_left)
+        move_stats = self.player.stats.moves[0]
+        self.assertGreater(move_stats["time_left"], self.player.TIMER_THRESHOLD)
+        self.assertEqual(len(move_stats["iteration_ms"]), move_stats["depth"])
+
+        self.assertTrue(self.player.iteration_fits(10., 100, 0))
+        self.assertFalse(self.player.iteration_fits(10., 10**6, 1))
+
+
+class DeadlineTest(unittest.TestCase):
+    def setUp(self):
+        self.player = game_agent.AlphaBetaPlayer(timeout=2.)
+        self.reads = 0
+
+    def clock(self, ms_per_node):
+        """A clock of 10 ms that advances by `ms_per_node` per node. """
+        def time_left():
+            self.reads += 1
+            return 10. - ms_per_node * self.player.nodes
+        return time_left
+
+    def testAmortizedChecks(self):
+        # 8000 nodes at 1 us per node until the threshold
+        self.player.time_left = self.clock(0.001)
+        with self.assertRaises(game_agent.SearchTimeout):
+            while True:
+                self.player.check_timing()
+        self.assertLessEqual(abs(self.player.nodes - 8000), 2)
+        self.assertLess(self.reads, 100)
+
+    def testSlowNodes(self):
+        # The clock is read at every node when a node takes longer than the
+        # check interval
+        self.player.time_left = self.clock(1.)
+        with self.assertRaises(game_agent.SearchTimeout):
+            while True:
+                self.player.check_timing()
+        self.assertEqual(self.player.nodes, 9)
+        self.assertEqual(self.reads, 9)
+
+    def testNewClock(self):
+        self.player.time_left = self.clock(0.001)
+        for _ in range(100):
+            self.player.check_timing()
+        self.player.time_left = lambda: 0.
+        self.player.start_stats()
+        self.assertRaises(game_agent.SearchTimeout, self.player.check_timing)
+
+    def testCalibration(self):
+        threshold = game_agent.calibrated_timer_threshold()
+        self.assertIs(game_agent.calibrated_timer_threshold(), threshold)
+        self.assertGreater(game_agent.measure_abort_ms(1000), 0.)
+        self.assertGreaterEqual(game_agent.measure_clock_pause_ms(1.), 0.)
+
+
+class StackSearchTest(unittest.TestCase):
+    def searches(self, make_player, board_class, depth):
+        """Run iterative deepening up to `depth` plies with the recursive and
+        the stack search over a few mid-game positions and return the moves
+        and scores of both.
+        """
+        results = []
+        for stack_search in (False, True):
+            result = []
+            for moves in benchmark.record_positions(3, seed=4):
+                player = make_player(stack_search)
+                player.time_left = lambda: 1000.
+                players = [player, game_agent.AlphaBetaPlayer()]
+                if len(moves) % 2:
+                    players.reverse()
+                game = benchmark.replay(board_class, players[0], players[1], 7, 7, moves)
+                before = game.to_string()
+                if hasattr(player, "reset_move_ordering"):
+                    player.reset_move_ordering(49)
+                for iterative_depth in range(1, depth + 1):
+                    move = player.alphabeta(game, iterative_depth)
+                    result.append((move, getattr(player, "root_score", None)))
+                self.assertEqual(game.to_string(), before)
+            results.append(result)
+        return results
+
+    def testSameMovesAsRecursiveSearch(self):
+        make_player = lambda stack_search: game_agent.AlphaBetaPlayer(
+            score_fn=open_move_score, stack_search=stack_search)
+        for board_class in (isolation.Board, isolation.BitBoard):
+            recursive, stack = self.searches(make_player, board_class, 4)
+            self.assertEqual(stack, recursive)
+        make_player = lambda stack_search: game_agent.AlphaBetaPlayer(
+            score_fn=open_move_score, tt_bytes=0, pvs=False, move_ordering=False,
+            stack_search=stack_search)
+        recursive, stack = self.searches(make_player, isolation.Board, 4)
+        self.assertEqual(stack, recursive)
+
+    def testCustomPlayer(self):
+        make_player = lambda stack_search: competition_agent.CustomPlayer(
+            stack_search=stack_search)
+        recursive, stack = self.searches(make_player, isolation.Board, 4)
+        self.assertEqual(stack, recursive)
+
+    def testRestoresBoardOnTimeout(self):
+        player = game_agent.AlphaBetaPlayer(stack_search=True)
+        game = isolation.Board(player, game_agent.AlphaBetaPlayer())
+        game.apply_move((2, 3))
+        game.apply_move((0, 5))
+        before = list(game._board_state)
+        calls = iter(range(100))
+        player.time_left = lambda: 100. if next(calls, None) is not None else 0.
+        self.assertRaises(game_agent.SearchTimeout, player.alphabeta, game, 5)
+        self.assertEqual(game._board_state, before)
+
+    def testGetMove(self):
+        player = game_agent.AlphaBetaPlayer(stack_search=True)
+        game = isolation.Board(player, game_agent.AlphaBetaPlayer())
+        game.apply_move((2, 3))
+        game.apply_move((0, 5))
+        # A clock that advances by 0.05 ms per node
+        time_left = lambda: 150. - 0.05 * player.nodes
+        self.assertIn(player.get_move(game, time_left), game.get_legal_moves())
+
+
+class ParallelSearchTest(unittest.TestCase):
+    def random_position(self, board_class, rng, num_moves):
+        game = board_class("p1", "p2")
+        game.shuffle_moves = False
+        for _ in range(num_moves):
+            legal_moves = game.get_legal_moves()
+            if not legal_moves:
+                break
+            game.apply_move(rng.choice(legal_moves))
+        return game
+
+    def testPositionMoves(self):
+        rng = random.Random(3)
+        for board_class in (isolation.Board, isolation.BitBoard):
+            for num_moves in range(0, 40, 3):
+                game = self.random_position(board_class, rng, num_moves)
+                replayed = board_class("p1", "p2")
+                for move in game_agent.position_moves(game):
+                    replayed.apply_move(move)
+                self.assertEqual(replayed.to_string(), game.to_string())
+                self.assertEqual(replayed.zobrist_key, game.zobrist_key)
+                self.assertEqual(replayed.active_player, game.active_player)
+
+    def testSharedTranspositionTable(self):
+        table = game_agent.TranspositionTable(2**12, shared=True)
+        attached = game_agent.TranspositionTable(2**12, buffers=table.buffers)
+        self.assertEqual(attached.lookup(12345, 1, -1., 1.), (None, None))
+        table.store(12345, 3, 0.5, -1., 1., 30)
+        self.assertEqual(attached.lookup(12345, 3, -1., 1.), (0.5, 30))
+        self.assertIsNone(game_agent.TranspositionTable(2**12).buffers)
+        self.assertRaises(ValueError, game_agent.AlphaBetaPlayer, tt_bytes=0, workers=2)
+
+    def testHelperSearch(self):
+        player = game_agent.AlphaBetaPlayer(workers=2)
+        game = self.random_position(isolation.Board, random.Random(7), 20)
+        control, results = player._control, player._results
+        game_agent._init_helper(player._helper_args, player.tt.buffers, control, results)
+        try:
+            control[0] = 7
+            game_agent._helper_search(7, 0, isolation.Board, 7, 7, game_agent.position_moves(game),
+                                      time.monotonic() + 0.1, 0, 2)
+            search_id, depth, code = results[0:3]
+            self.assertEqual(search_id, 7)
+            self.assertGreaterEqual(depth, 2)
+            self.assertIn(code, game.get_legal_indices())
+
+            # Stopped searches publish nothing
+            control[0] = 0
+            game_agent._helper_search(8, 0, isolation.Board, 7, 7, game_agent.position_moves(game),
+                                      time.monotonic() + 0.1, 0, 2)
+            self.assertEqual(results[0], 7)
+        finally:
+            game_agent._helper = None
+
+    def testParallelGetMove(self):
+        player = game_agent.AlphaBetaPlayer(workers=2)
+        try:
+            game = isolation.Board(player, game_agent.AlphaBetaPlayer())
+            game.apply_move((2, 3))
+            game.apply_move((0, 5))
+            for _ in range(2):
+                deadline = time.monotonic() + 0.15
+                time_left = lambda: 1000. * (deadline - time.monotonic())
+                move = player.get_move(game, time_left)
+                self.assertGreater(time_left(), 0.)
+                self.assertIn(move, game.get_legal_moves())
+        finally:
+            player.close()
+
+
+class PonderingTest(unittest.TestCase):
+    def setUp(self):
+        self.player = game_agent.AlphaBetaPlayer(pondering=True)
+        self.game = isolation.Board(self.player, game_agent.AlphaBetaPlayer())
+        self.game.apply_move((2, 3))
+        self.game.apply_move((0, 5))
+
+    def tearDown(self):
+        self.player.close()
+
+    def search_and_ponder(self):
+        deadline = time.monotonic() + 0.15
+        move = self.player.get_move(self.game, lambda: 1000. * (deadline - time.monotonic()))
+        self.game.apply_move(move)
+        self.player.ponder(self.game.copy())
+        self.assertIsNotNone(self.player._ponder_key)
+        self.assertEqual(self.player._control[0], self.player._search_id)
+
+    def testPonderHit(self):
+        self.search_and_ponder()
+        key = game_agent.MIN_NODE_KEY ^ self.game.zobrist_key
+        reply = self.player.tt.lookup(key, 0, float("-inf"), float("inf"))[1]
+        self.game.push_index(reply)
+        time.sleep(0.05)
+        self.player.end_ponder(self.game.copy())
+        self.assertTrue(self.player._ponder_hit)
+        self.assertEqual(self.player._control[0], self.player._search_id)
+
+        deadline = time.monotonic() + 0.15
+        time_left = lambda: 1000. * (deadline - time.monotonic())
+        move = self.player.get_move(self.game, time_left)
+        self.assertIn(move, self.game.get_legal_moves())
+        self.assertGreater(time_left(), 0.)
+        self.assertEqual(self.player._control[0], 0)
+
+    def testPonderMiss(self):
+        self.search_and_ponder()
+        key = game_agent.MIN_NODE_KEY ^ self.game.zobrist_key
+        reply = self.player.tt.lookup(key, 0, float("-inf"), float("inf"))[1]
+        other = [move for move in self.game.get_legal_indices() if move != reply][0]
+        self.game.push_index(other)
+        self.player.end_ponder(self.game.copy())
+        self.assertFalse(self.player._ponder_hit)
+        self.assertIsNone(self.player._ponder_key)
+        self.assertEqual(self.player._control[0], 0)
+
+    def testPlayHooks(self):
+        class PonderingPlayer:
+            def __init__(self):
+                self.calls = []
+
+            def get_move(self, game, time_left):
+                legal_moves = game.get_legal_moves()
+                return legal_moves[0] if legal_moves else (-1, -1)
+
+            def ponder(self, game):
+                self.calls.append(("ponder", game.move_count))
+
+            def end_ponder(self, game):
+                self.calls.append(("end_ponder", None if game is None else game.move_count))
+
+        player = PonderingPlayer()
+        game = isolation.Board(player, game_agent.AlphaBetaPlayer())
+        _, history, _ = game.play(time_limit=150)
+        moves = (len(history) + 1) // 2
+        self.assertEqual(player.calls.count(("end_ponder", None)), 1)
+        self.assertEqual(player.calls[-1], ("end_ponder", None))
+        self.assertEqual([call for call in player.calls if call[0] == "ponder"],
+                         [("ponder", 2 * move + 1) for move in range(moves)])
+
+        self.assertRaises(ValueError, game_agent.AlphaBetaPlayer, tt_bytes=0, pondering=True)
+
+
+class MCTSTest(unittest.TestCase):
+    def setUp(self):
+        self.player = game_agent.MCTSPlayer(seed=1)
+        self.opponent = game_agent.AlphaBetaPlayer()
+        self.game = isolation.Board(self.player, self.opponent)
+        self.game.apply_move((2, 3))
+        self.game.apply_move((0, 5))
+
+    def testGetMoveRestoresBoard(self):
+        before = self.game.to_string()
+        calls = iter(range(300))
+        move = self.player.get_move(self.game, lambda: 100. if next(calls, None) is not None else 0.)
+        self.assertIn(move, self.game.get_legal_moves())
+        self.assertEqual(self.game.to_string(), before)
+        self.assertTrue(self.game.shuffle_moves)
+
+    def testNoLegalMoves(self):
+        game = isolation.Board(self.player, self.opponent)
+        for move in [(1, 2), (2, 1), (0, 0), (4, 4)]:
+            game.apply_move(move)
+        calls = iter(range(1000))
+        self.assertEqual(self.player.get_move(game, lambda: 100. if next(calls, None) is not None
+                                              else 0.), (-1, -1))
+        # Returned without searching until the deadline
+        self.assertLess(next(calls), 3)
+
+    def testSeededSearchIsReproducible(self):
+        moves = []
+        for global_seed in range(2):
+            random.seed(global_seed)
+            player = game_agent.MCTSPlayer(seed=1)
+            game = isolation.Board(player, self.opponent)
+            game.apply_move((2, 3))
+            game.apply_move((0, 5))
+            calls = iter(range(300))
+            moves.append(player.get_move(game, lambda: 100. if next(calls, None) is not None
+                                         else 0.))
+            moves.append(player.root.visits)
+        self.assertEqual(moves[:2], moves[2:])
+
+    def testTreeReuse(self):
+        self.player.time_left = lambda: 100.
+        move = self.player.mcts(self.game, 500)
+        root = self.player.root
+        self.assertEqual(root.move, move)
+        self.game.apply_move(move)
+        reply = max(root.children, key=lambda child: child.visits)
+        self.game.apply_move(reply.move)
+        self.assertIs(self.player.find_root(self.game), reply)
+
+        self.player.reuse_tree = False
+        self.assertIsNot(self.player.find_root(self.game), reply)
+
+    def testVisitsAddUp(self):
+        self.player.time_left = lambda: 100.
+        self.player.start_stats()
+        self.player.mcts(self.game, 200)
+        self.assertEqual(self.player.leaves, 200)
+        self.player.root = None
+        root = self.player.find_root(self.game)
+        for _ in range(200):
+            self.player.run_iteration(self.game, root)
+        self.assertEqual(root.visits, 200)
+        self.assertEqual(sum(child.visits for child in root.children), 200)
+
+    def testFindsWin(self):
+        # (3, 4) is the only one of the five moves of player 1 that wins
+        game = isolation.Board(self.player, self.opponent, 5, 5)
+        for move in [(1, 0), (0, 4), (3, 1), (1, 2), (4, 3), (3, 3), (2, 2), (1, 4)]:
+            game.apply_move(move)
+        self.assertEqual(len(game.get_legal_moves()), 5)
+        self.player.time_left = lambda: 100.
+        self.assertEqual(self.player.mcts(game, 2000), (3, 4))
+
+
+class SearchStatsTest(unittest.TestCase):
+    def play_move(self, player):
+        game = isolation.Board(player, game_agent.AlphaBetaPlayer())
+        game.apply_move((2, 3))
+        game.apply_move((0, 5))
+        calls = iter(range(3000))
+        player.get_move(game, lambda: 100. if next(calls, None) is not None else 0.)
+
+    def testDisabledByDefault(self):
+        player = game_agent.AlphaBetaPlayer()
+        self.play_move(player)
+        self.assertIsNone(player.stats)
+        self.assertGreater(player.nodes, 0)
+
+    def testAlphaBetaStats(self):
+        player = game_agent.AlphaBetaPlayer(collect_stats=True)
+        self.play_move(player)
+        self.assertEqual(len(player.stats.moves), 1)
+        move = player.stats.moves[0]
+        self.assertGreaterEqual(move["depth"], 1)
+        self.assertEqual(len(move["iteration_ms"]), move["depth"])
+        self.assertGreaterEqual(move["nodes"], move["leaves"])
+        self.assertGreater(move["leaves"], 0)
+
+        summary = player.stats.summary()
+        self.assertEqual(summary["moves"], 1)
+        self.assertEqual(summary["nodes"], move["nodes"])
+
+    def testNodesPerSecond(self):
+        # A clock that advances by 0.01 ms per node: 100,000 nodes per
+        # second, including the nodes of the aborted last iteration
+        for player in (game_agent.AlphaBetaPlayer(timeout=5., collect_stats=True),
+                       game_agent.MinimaxPlayer(search_depth=20, timeout=5., collect_stats=True)):
+            game = isolation.Board(player, game_agent.AlphaBetaPlayer())
+            game.apply_move((2, 3))
+            game.apply_move((0, 5))
+            player.get_move(game, lambda: 50. - 0.01 * player.nodes)
+            move = player.stats.moves[0]
+            self.assertLess(sum(move["iteration_ms"]), move["search_ms"])
+            self.assertAlmostEqual(player.stats.summary()["nps"], 100000.)
+
+    def testMinimaxStats(self):
+        player = game_agent.MinimaxPlayer(collect_stats=True)
+        self.play_move(player)
+        self.assertEqual(player.stats.moves[0]["depth"], player.search_depth)
+        self.assertGreater(player.stats.moves[0]["nodes"], 0)
+
+
+class BitBoardTest(unittest.TestCase):
+    def setUp(self):
+        self.player1 = game_agent.AlphaBetaPlayer()
+        self.player2 = game_agent.AlphaBetaPlayer()
+        self.game = isolation.Board(self.player1, self.player2)
+        self.bitgame = isolation.BitBoard(self.player1, self.player2)
+
+    def apply_moves(self, moves):
+        for move in moves:
+            self.game.apply_move(move)
+            self.bitgame.apply_move(move)
+
+    def testBlankSpaces(self):
+        self.assertEqual(sorted(self.bitgame.get_blank_spaces()), sorted(self.game.get_blank_spaces()))
+        self.apply_moves([(2, 3), (0, 5)])
+        self.assertEqual(sorted(self.bitgame.get_blank_spaces()), sorted(self.game.get_blank_spaces()))
+
+    def testLegalMovesMatchBoard(self):
+        self.apply_moves([(2, 3), (0, 5), (4, 2), (2, 4), (6, 3)])
+        for player in [self.player1, self.player2]:
+            self.assertEqual(sorted(self.bitgame.get_legal_moves(player)),
+                             sorted(self.game.get_legal_moves(player)))
+            self.assertEqual(self.bitgame.get_player_location(player),
+                             self.game.get_player_location(player))
+
+    def testBoardStateView(self):
+        self.apply_moves([(2, 3), (0, 5), (4, 2)])
+        self.assertEqual(self.bitgame._board_state, self.game._board_state)
+        self.assertEqual(self.bitgame.to_string(), self.game.to_string())
+
+    def testForecastDoesNotModify(self):
+        self.apply_moves([(2, 3), (0, 5)])
+        new_game = self.bitgame.forecast_move((4, 2))
+        self.assertTrue(self.bitgame.move_is_legal((4, 2)))
+        self.assertFalse(new_game.move_is_legal((4, 2)))
+        self.assertEqual(new_game.get_player_location(self.player1), (4, 2))
+
+    def testPushPop(self):
+        self.apply_moves([(2, 3), (0, 5)])
+        before = self.bitgame.to_string()
+        self.bitgame.push((4, 2))
+        self.bitgame.push((2, 4))
+        self.assertEqual(self.bitgame.get_player_location(self.player2), (2, 4))
+        self.bitgame.pop()
+        self.bitgame.pop()
+        self.assertEqual(self.bitgame._board_state, self.game._board_state)
+        self.assertEqual(self.bitgame.to_string(), before)
+
+    def testMoveIndices(self):
+        for game in [self.game, self.bitgame]:
+            game.shuffle_moves = False
+            self.assertEqual([game.index_to_move(idx) for idx in game.get_legal_indices()],
+                             game.get_legal_moves())
+            self.assertIsNone(game.get_location_index(self.player1))
+        self.apply_moves([(2, 3), (0, 5), (4, 2)])
+        for game in [self.game, self.bitgame]:
+            for player in [self.player1, self.player2]:
+                self.assertEqual([game.index_to_move(idx) for idx in game.get_legal_indices(player)],
+                                 game.get_legal_moves(player))
+                location = game.get_location_index(player)
+                self.assertEqual(game.index_to_move(location), game.get_player_location(player))
+                self.assertEqual(game.move_to_index(game.get_player_location(player)), location)
+            self.assertRaises(KeyError, game.move_to_index, (7, 0))
+
+            key = game.zobrist_key
+            expected_key = game.forecast_move((2, 4)).zobrist_key
+            game.push_index(game.move_to_index((2, 4)))
+            self.assertEqual(game.zobrist_key, expected_key)
+            self.assertEqual(game.get_player_location(self.player2), (2, 4))
+            game.pop()
+            self.assertEqual(game.zobrist_key, key)
+
+    def testZobristKeyMatchesBoard(self):
+        self.apply_moves([(2, 3), (0, 5), (4, 2)])
+        self.assertEqual(self.bitgame.zobrist_key, self.game.zobrist_key)
+        self.bitgame.push((2, 4))
+        self.game.push((2, 4))
+        self.assertEqual(self.bitgame.copy().hash(), self.game.hash())
+        self.bitgame.pop()
+        self.game.pop()
+        self.assertEqual(self.bitgame.zobrist_key, self.game.zobrist_key)
+
+    def testNonSquareBoard(self):
+        game = isolation.Board(self.player1, self.player2, width=5, height=3)
+        bitgame = isolation.BitBoard(self.player1, self.player2, width=5, height=3)
+        for move in [(1, 2), (0, 0), (2, 0)]:
+            game.apply_move(move)
+            bitgame.apply_move(move)
+        self.assertEqual(sorted(bitgame.get_legal_moves()), sorted(game.get_legal_moves()))
+        self.assertEqual(bitgame.utility(self.player1), game.utility(self.player1))
+
+    def testPlay(self):
+        self.apply_moves([(2, 3), (0, 5)])
+        winner, history, outcome = self.bitgame.play(time_limit=50)
+        self.assertIn(winner, [self.player1, self.player2])
+        self.assertIn(outcome, ["illegal move", "forfeit", "timeout"])
+        self.assertTrue(len(history) > 0)
+
+
+def active_player_wins(game):
+    """Exhaustive search of a position. """
+    for move in game.get_legal_moves():
+        game.push(move)
+        loses = active_player_wins(game)
+        game.pop()
+        if not loses:
+            return True
+    return False
+
+
+class EndgameTest(unittest.TestCase):
+    def partitioned_positions(self, seed, count, player_1="p1", player_2="p2"):
+        """Play random 5x5 games and collect the first partitioned position
+        of every game that gets partitioned into regions the solver accepts.
+        """
+        rng = random.Random(seed)
+        positions = []
+        while len(positions) < count:
+            game = isolation.Board(player_1, player_2, 5, 5)
+            while game.get_legal_moves():
+                game.apply_move(rng.choice(game.get_legal_moves()))
+                if game.is_partitioned():
+                    if game.get_legal_moves() and all(
+                            len(game.reachable_cells(player)) <= endgame.ENDGAME_MAX_CELLS
+                            for player in (player_1, player_2)):
+                        positions.append(game)
+                    break
+        return positions
+
+    def testReachableCells(self):
+        game = isolation.Board("p1", "p2", 5, 5)
+        self.assertEqual(game.reachable_cells("p1"), set(game.get_blank_spaces()))
+        self.assertFalse(game.is_partitioned())
+        game.apply_move((0, 0))
+        game.apply_move((4, 4))
+        self.assertEqual(len(game.reachable_cells("p1")), 23)
+        self.assertFalse(game.is_partitioned())
+        # Player 1 is cornered on (0, 0) after blocking both of its exits
+        game = isolation.Board("p1", "p2", 5, 5)
+        for move in [(1, 2), (2, 1), (0, 0)]:
+            game.apply_move(move)
+        self.assertEqual(game.reachable_cells("p1"), set())
+        self.assertEqual(len(game.reachable_cells("p2")), 22)
+        self.assertTrue(game.is_partitioned())
+        bitboard = isolation.BitBoard("p1", "p2", 5, 5)
+        for move in [(1, 2), (2, 1), (0, 0)]:
+            bitboard.apply_move(move)
+        for board in (game, bitboard):
+            active_idx, inactive_idx, region = board.reachable_region(22)
+            self.assertEqual((active_idx, inactive_idx), (2 + 1 * 5, 0))
+            self.assertEqual({(idx % 5, idx // 5) for idx in range(25) if region >> idx & 1},
+                             game.reachable_cells("p2"))
+            self.assertIsNone(board.reachable_region(21))
+
+    def testLongestPath(self):
+        solver = endgame.EndgameSolver()
+        game = isolation.Board("p1", "p2", 3, 3)
+        solver._set_board_size(3, 3)
+        # The 8 outer cells of a 3x3 board form a single knight cycle
+        ring = sum(1 << (r + c * 3) for r, c in game.get_blank_spaces() if (r, c) != (1, 1))
+        self.assertEqual(solver.longest_path(0, ring & ~1), 7)
+        self.assertEqual(solver.longest_path(4, ring), 0)
+
+    def testSolveMatchesSearch(self):
+        solver = endgame.EndgameSolver()
+        for game in self.partitioned_positions(seed=3, count=20):
+            wins = active_player_wins(game)
+            self.assertEqual(solver.solve(game, game.active_player),
+                             float("inf") if wins else float("-inf"))
+            regions = solver._regions(game)
+            self.assertEqual(bin(regions[0][1]).count("1"),
+                             len(game.reachable_cells(game.active_player)))
+            self.assertEqual(solver.solve(game, game.inactive_player),
+                             float("-inf") if wins else float("inf"))
+            move = solver.best_move(game)
+            self.assertIn(move, game.get_legal_moves())
+            if wins:
+                self.assertFalse(active_player_wins(game.forecast_move(move)))
+
+    def testNotPartitioned(self):
+        solver = endgame.EndgameSolver()
+        game = isolation.Board("p1", "p2", 5, 5)
+        self.assertIsNone(solver.solve(game, "p1"))
+        game.apply_move((0, 0))
+        game.apply_move((4, 4))
+        self.assertIsNone(solver.solve(game, "p1"))
+        # Regions larger than max_cells are left to the search
+        game = self.partitioned_positions(seed=4, count=1)[0]
+        self.assertIsNone(endgame.EndgameSolver(max_cells=0).best_move(game))
+
+    def testGetMovePlaysSolution(self):
+        player_1 = game_agent.AlphaBetaPlayer()
+        player_2 = game_agent.AlphaBetaPlayer()
+        for game in self.partitioned_positions(5, 5, player_1, player_2):
+            player = game.active_player
+            self.assertEqual(player.get_move(game, lambda: 100.),
+                             player.endgame.best_move(game))
+
+
+class OpeningBookTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp_dir.name, 'book.bin')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def testSaveLoad(self):
+        book = opening_book.OpeningBook()
+        entries = {(key * 0x9E3779B97F4A7C15) % 2**64: (key % 7, key // 7) for key in range(49)}
+        for key, move in entries.items():
+            book.add(key, move)
+        book.save(self.filename)
+        self.assertEqual(os.path.getsize(self.filename),
+                         keyfile.HEADER.size + 49 * opening_book.RECORD.size)
+
+        loaded = opening_book.OpeningBook(self.filename)
+        self.assertEqual(len(loaded), 49)
+        for key, move in entries.items():
+            self.assertEqual(loaded.lookup(key), move)
+        self.assertIsNone(loaded.lookup(12345))
+        self.assertEqual([key for key, _ in loaded.items()], sorted(entries))
+        loaded.close()
+        book.close()
+
+    def testMergeOnSave(self):
+        book = opening_book.OpeningBook()
+        book.add(1, (0, 0))
+        book.add(3, (0, 1))
+        book.save(self.filename)
+        book.add(2, (1, 0))
+        book.add(3, (1, 1))
+        self.assertEqual(len(book), 3)
+        self.assertEqual(list(book.items()), [(1, (0, 0)), (2, (1, 0)), (3, (1, 1))])
+        book.save(self.filename)
+        self.assertEqual(list(opening_book.OpeningBook(self.filename).items()),
+                         [(1, (0, 0)), (2, (1, 0)), (3, (1, 1))])
+        book.close()
+
+    def testWrongFile(self):
+        with open(self.filename, 'wb') as data_fp:
+            data_fp.write(b'{"not": "a book"}')
+        self.assertRaises(ValueError, opening_book.OpeningBook, self.filename)
+
+        opening_book.OpeningBook().save(self.filename)
+        self.assertRaises(ValueError, opening_book.OpeningBook, self.filename, 5, 5)
+
+
+class BuildBookTest(unittest.TestCase):
+    def testEnumerateOpenings(self):
+        openings = build_book.enumerate_openings(2)
+        # The empty board and the 10 classes of symmetric cells of a 7x7 board
+        self.assertEqual(len(openings), 11)
+        self.assertEqual(len(set(min(build_book.replay(moves).symmetric_keys())
+                                 for moves in openings)), 11)
+
+    def testBuildAndResume(self):
+        openings = build_book.enumerate_openings(2)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, 'book.bin')
+            book = opening_book.OpeningBook(filename)
+            build_book.build_book(book, filename, openings[:4], 1, 0, 1, 2)
+            self.assertEqual(len(opening_book.OpeningBook(filename)), len(book))
+
+            resumed = opening_book.OpeningBook(filename)
+            build_book.build_book(resumed, filename, openings, 1, 0, 1, 100)
+            for moves in openings:
+                game = build_book.replay(moves)
+                for symmetry in range(8):
+                    image = build_book.replay([game.symmetric_move(move, symmetry) for move in moves])
+                    self.assertTrue(image.move_is_legal(resumed.lookup_position(image)))
+            book.close()
+            resumed.close()
+
+
+class TablebaseTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp_dir.name, 'tablebase.bin')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def testSolvedPositionsMatchSearch(self):
+        moves, entries = build_tablebase.solve_endgame(build_tablebase.endgame_position(15, 12))
+        self.assertEqual(len(moves), 29)
+        table = tablebase.Tablebase()
+        for key, wins in entries:
+            table.add(key, wins)
+
+        def check(game):
+            legal_moves = game.get_legal_moves()
+            if legal_moves:
+                wins = table.lookup_position(game)
+                self.assertEqual(wins, active_player_wins(game))
+                self.assertEqual(table.score(game, game.active_player),
+                                 float("inf") if wins else float("-inf"))
+            for move in legal_moves:
+                game.push(move)
+                check(game)
+                game.pop()
+
+        check(build_tablebase.replay(moves))
+
+    def testRegionKey(self):
+        moves = build_tablebase.endgame_position(3, 12)
+        game = build_tablebase.replay(moves)
+        key = tablebase.region_key(game)
+        self.assertIsNotNone(key)
+        self.assertIsNone(tablebase.region_key(game, 1))
+        self.assertIsNone(tablebase.region_key(isolation.Board("p1", "p2")))
+        # Symmetric positions have symmetric regions
+        for symmetry in game.symmetries():
+            image = isolation.BitBoard("player 1", "player 2")
+            for move in moves:
+                image.apply_move(game.symmetric_move(move, symmetry))
+            self.assertEqual(tablebase.region_key(image), key)
+
+    def testBuildAndResume(self):
+        table = tablebase.Tablebase(self.filename)
+        build_tablebase.build_tablebase(table, self.filename, range(5), 10, 1, 2)
+        self.assertGreater(len(table), 0)
+        resumed = tablebase.Tablebase(self.filename)
+        self.assertEqual(len(resumed), len(table))
+        build_tablebase.build_tablebase(resumed, self.filename, range(10), 10, 1, 100)
+        for seed in range(10):
+            game = build_tablebase.replay(build_tablebase.endgame_position(seed, 10))
+            self.assertIsNotNone(resumed.lookup_position(game))
+        table.close()
+        resumed.close()
+
+    def testProbedBySearch(self):
+        moves = build_tablebase.endgame_position(15, 12)
+        table = tablebase.Tablebase()
+        for key, wins in build_tablebase.solve_endgame(moves)[1]:
+            table.add(key, wins)
+        self.assertIsNone(table.lookup_position(isolation.Board("p1", "p2")))
+
+        player = game_agent.AlphaBetaPlayer(tablebase=table)
+        player_1, player_2 = (player, "opponent") if len(moves) % 2 == 0 else ("opponent", player)
+        game = isolation.Board(player_1, player_2)
+        for move in moves:
+            game.apply_move(move)
+        player.time_left = lambda: 100.
+        player.start_stats()
+        self.assertIn(player.max_value(game, 1, float("-inf"), float("inf")),
+                      [float("inf"), float("-inf")])
+
+    def testHitsInRealGames(self):
+        table = tablebase.Tablebase()
+        for seed in range(100):
+            for key, wins in build_tablebase.solve_endgame(
+                    build_tablebase.endgame_position(seed, 12))[1]:
+                table.add(key, wins)
+        # Search late positions of other games than those of the tablebase
+        for seed in range(1000, 1005):
+            moves = build_tablebase.endgame_position(seed, 12)
+            players = [game_agent.AlphaBetaPlayer(tablebase=table) for _ in range(2)]
+            game = isolation.Board(players[0], players[1], seed=seed)
+            for move in moves[:-4]:
+                game.apply_move(move)
+            player = game.active_player
+            player.time_left = lambda: float("inf")
+            player.start_stats()
+            for depth in range(1, 6):
+                player.alphabeta(game, depth)
+        self.assertGreater(table.probes, 0)
+        self.assertGreater(table.hits, 0)
+
+
+class BenchmarkTest(unittest.TestCase):
+    def testRecordPositions(self):
+        positions = benchmark.record_positions(3, seed=1)
+        self.assertEqual(positions, benchmark.record_positions(3, seed=1))
+        for moves in positions:
+            game = benchmark.replay(isolation.Board, "p1", "p2", 7, 7, moves)
+            self.assertGreater(len(game.get_legal_moves()), 1)
+
+    def testSearchNodeCountsAreDeterministic(self):
+        positions = benchmark.record_positions(2, seed=2)
+        runs = [benchmark.benchmark_searches(isolation.Board, 7, 7, positions, 3)
+                for _ in range(2)]
+        for name, result in runs[0].items():
+            self.assertGreater(result["nodes"], 0)
+            self.assertEqual(result["nodes"], runs[1][name]["nodes"])
+
+    def testCompare(self):
+        baseline = {"copy": {"us_per_call": 1.}, "search": {"nodes": 10, "nodes_per_sec": 100.}}
+        results = {"copy": {"us_per_call": 1.5}, "search": {"nodes": 10, "nodes_per_sec": 95.}}
+        self.assertEqual(benchmark.compare(results, baseline, 0.1), ["copy"])
+
+
 class CompetitionTest(unittest.TestCase):
     def setUp(self):
         reload(competition_agent)
@@ -158,61 +1294,76 @@ class CompetitionTest(unittest.TestCase):
         self.assertEqual(diag2[0:49], game_diag2._board_state[0:49])
             
     def testOpeningBook(self):
-        self.player1.load_opening_book('test.json')
-        (move_list, sym) = self.player1.opening_book['-2930664380439188361']
-        move = tuple(move_list)
-        self.assertEqual(move, (3,0))
-        self.assertEqual(competition_agent.Symmetries(sym), competition_agent.Symmetries.SAME)
-        
+        self.game.apply_move((1,1))
+        self.player1.update_opening_book(self.game, (3,0))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, 'book.bin')
+            self.player1.save_opening_book(filename)
+            self.player1.load_opening_book(filename)
+            self.assertEqual(self.player1.opening_book.lookup(self.game.zobrist_key), (3,0))
+            self.player1.opening_book.close()
+
     def testInitCustomPlayerWithBook(self):
-        new_player = competition_agent.CustomPlayer('test.json')
-        (move_list, sym) = new_player.opening_book['-2930664380439188361']
-        move = tuple(move_list)
-        self.assertEqual(move, (3,0))
-        self.assertEqual(competition_agent.Symmetries(sym), competition_agent.Symmetries.SAME)
-        
+        self.game.apply_move((1,1))
+        self.game.apply_move((5,5))
+        self.player1.update_opening_book(self.game, (3,0))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, 'book.bin')
+            self.player1.save_opening_book(filename)
+            new_player = competition_agent.CustomPlayer(filename)
+            game = isolation.Board(new_player, self.player2)
+            game.apply_move((1,1))
+            game.apply_move((5,5))
+            self.assertEqual(new_player.get_move(game, lambda: 15.), (3,0))
+
+            # The same opening seen through the vertical mirror
+            game = isolation.Board(new_player, self.player2)
+            game.apply_move((1,5))
+            game.apply_move((5,1))
+            self.assertEqual(new_player.get_move(game, lambda: 15.), (3,6))
+            new_player.opening_book.close()
+            self.player1.opening_book.close()
+
+    def testIllegalBookMoveIsNotPlayed(self):
+        self.game.apply_move((1,1))
+        self.game.apply_move((5,5))
+        # (3,3) is blank, but not a knight move away from (1,1)
+        self.player1.update_opening_book(self.game, (3,3))
+        calls = iter(range(1000))
+        move = self.player1.get_move(self.game, lambda: 15. if next(calls, None) is not None else 0.)
+        self.assertIn(move, self.game.get_legal_moves())
+
     def testInitCustomPlayerWithoutBook(self):
         new_player = competition_agent.CustomPlayer()
-        self.assertEqual(new_player.opening_book, {})
-        
-    def testUpdateOpeningBook4Symmetries(self):
-        self.game.apply_move((1,1))
-        self.player1.best_move = (1,1)
+        self.assertEqual(len(new_player.opening_book), 0)
+
+    def checkSymmetricLookups(self, moves, best_move, num_images):
+        for move in moves:
+            self.game.apply_move(move)
+        self.player1.best_move = best_move
         self.player1.update_opening_book(self.game)
-        print(self.player1.opening_book)
-        self.assertEqual(self.player1.opening_book['-8974553412868527889'], ((1,1), competition_agent.Symmetries.SAME.value))
-        self.assertEqual(len(self.player1.opening_book), 4)
-    
+        # A single entry serves all symmetric images of the position
+        self.assertEqual(len(self.player1.opening_book), 1)
+        self.assertEqual(self.player1.opening_book.lookup_position(self.game), best_move)
+
+        # In every image the book move leads to a position symmetric to the
+        # one reached by the best move
+        expected = self.game.forecast_move(best_move).canonical_key()[0]
+        images = set()
+        for symmetry in range(8):
+            image = isolation.Board(self.player1, self.player2)
+            for move in moves:
+                image.apply_move(image.symmetric_move(move, symmetry))
+            images.add(image.zobrist_key)
+            book_move = self.player1.opening_book.lookup_position(image)
+            self.assertEqual(image.forecast_move(book_move).canonical_key()[0], expected)
+        self.assertEqual(len(images), num_images)
+
+    def testUpdateOpeningBook4Symmetries(self):
+        self.checkSymmetricLookups([(1,1)], (3,2), 4)
+
     def testUpdateOpeningBook8Symmetries(self):
-        self.game.apply_move((1,1))
-        self.game.apply_move((3,2))
-        self.player1.best_move = (3,2)
-        self.player1.update_opening_book(self.game)
-        print(self.player1.opening_book)
-        self.assertEqual(self.player1.opening_book['5105712017171821632'], ((3,2), competition_agent.Symmetries.SAME.value))
-        self.assertEqual(len(self.player1.opening_book), 8)
-
-    def testRotateMove1(self):
-        self.assertEqual(self.player1.backrotate_move([2,2], competition_agent.Symmetries.VERTICAL), (2, 4))
-           
-    def testRotateMove2(self):
-        self.assertEqual(self.player1.backrotate_move([2,2], competition_agent.Symmetries.HORIZONTAL), (4, 2))
-           
-    def testRotateMove3(self):
-        self.assertEqual(self.player1.backrotate_move([2,2], competition_agent.Symmetries.ROTATE90), (4, 2))
-           
-    def testRotateMove4(self):
-        self.assertEqual(self.player1.backrotate_move([2,2], competition_agent.Symmetries.ROTATE180), (4, 4))
-           
-    def testRotateMove5(self):
-        self.assertEqual(self.player1.backrotate_move([2,2], competition_agent.Symmetries.ROTATE270), (2, 4))
-           
-    def testRotateMove6(self):
-        self.assertEqual(self.player1.backrotate_move([2,2], competition_agent.Symmetries.DIAG1), (4, 4))
-           
-    def testRotateMove7(self):
-        self.assertEqual(self.player1.backrotate_move([2,2], competition_agent.Symmetries.DIAG2), (2, 2))
-           
+        self.checkSymmetricLookups([(1,1), (3,2)], (2,3), 8)
 
 
 if __name__ == '__main__':
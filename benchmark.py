@@ -0,0 +1,271 @@
+"""Time the board primitives, the heuristics and fixed-depth searches over a
+corpus of recorded mid-game positions.
+
+The positions are stored as move sequences in `benchmark_positions.json`
+(regenerate them with `--record`). Results can be written as JSON with
+`--output` and compared against a previously stored result with `--baseline`:
+
+    python benchmark.py --output baseline.json
+    # ... change the engine ...
+    python benchmark.py --baseline baseline.json
+
+Primitive and heuristic timings are reported in microseconds per call (the
+best of several repeats). Searches are reported in nodes per second (for
+MCTS, playouts per second); their node counts are deterministic, so a change
+in the node count of a search means the engine explores a different tree.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import timeit
+
+from isolation import Board, BitBoard
+from sample_players import improved_score, center_score
+from game_agent import (MinimaxPlayer, AlphaBetaPlayer, MCTSPlayer, custom_score,
+                        custom_score_2, custom_score_3)
+
+POSITIONS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              "benchmark_positions.json")
+BOARD_CLASSES = {"board": Board, "bitboard": BitBoard}
+SCORE_FUNCTIONS = [custom_score, custom_score_2, custom_score_3,
+                   improved_score, center_score]
+MCTS_ITERATIONS_PER_PLY = 100  # MCTS iterations per ply of --depth
+
+
+def record_positions(num_positions, seed, width=7, height=7):
+    """Play random games and return the move sequences of `num_positions`
+    mid-game positions (between 20% and 60% of the board filled) in which
+    the active player has a choice of moves.
+    """
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < num_positions:
+        game = Board("player 1", "player 2", width, height, seed=rng.getrandbits(32))
+        stop = rng.randint(width * height // 5, 3 * width * height // 5)
+        moves = []
+        while game.move_count < stop:
+            legal_moves = game.get_legal_moves()
+            if not legal_moves:
+                break
+            move = rng.choice(legal_moves)
+            game.apply_move(move)
+            moves.append(move)
+        if game.move_count == stop and len(game.get_legal_moves()) > 1:
+            positions.append(moves)
+    return positions
+
+
+def load_positions(filename=POSITIONS_FILE):
+    """Return the (width, height, move sequences) of a recorded corpus. """
+    with open(filename) as data_fp:
+        corpus = json.load(data_fp)
+    positions = [[tuple(move) for move in moves] for moves in corpus["positions"]]
+    return corpus["width"], corpus["height"], positions
+
+
+def replay(board_class, player_1, player_2, width, height, moves):
+    """Return a board of `board_class` with a fixed move order after
+    applying `moves`.
+    """
+    game = board_class(player_1, player_2, width, height)
+    for move in moves:
+        game.apply_move(move)
+    game.shuffle_moves = False
+    return game
+
+
+def time_calls(func, args_list, repeat):
+    """Return the best time over `repeat` runs of `func(*args)` for every
+    entry of `args_list`, in microseconds per call.
+    """
+    def run():
+        for args in args_list:
+            func(*args)
+
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+    return 1e6 * best / len(args_list)
+
+
+def benchmark_primitives(games, repeat):
+    """Time the `Board` API and the heuristics over all positions. """
+    first_moves = [(game, game.get_legal_moves()[0]) for game in games]
+    results = {
+        "get_legal_moves": time_calls(lambda game: game.get_legal_moves(),
+                                      [(game,) for game in games], repeat),
+        "apply_move": time_calls(lambda game, move: game.copy().apply_move(move),
+                                 first_moves, repeat),
+        "forecast_move": time_calls(lambda game, move: game.forecast_move(move),
+                                    first_moves, repeat),
+        "copy": time_calls(lambda game: game.copy(), [(game,) for game in games], repeat),
+        "push_pop": time_calls(lambda game, move: (game.push(move), game.pop()),
+                               first_moves, repeat),
+        "utility": time_calls(lambda game: game.utility(game.active_player),
+                              [(game,) for game in games], repeat),
+        "symmetric_configurations": time_calls(lambda game: game.symmetric_configurations(),
+                                               [(game,) for game in games], repeat),
+        "canonical_key": time_calls(lambda game: game.canonical_key(),
+                                    [(game,) for game in games], repeat),
+    }
+    # apply_move cannot be timed in place; report it net of the copy
+    results["apply_move"] = max(results["apply_move"] - results["copy"], 0.)
+    for score_fn in SCORE_FUNCTIONS:
+        results[score_fn.__name__] = time_calls(
+            score_fn, [(game, game.active_player) for game in games], repeat)
+    return {name: {"us_per_call": value} for name, value in results.items()}
+
+
+def run_search(player, game, depth):
+    """Search `game` with `player` and return the number of nodes it visited.
+
+    Alpha-beta players run iterative deepening up to `depth` plies, as in
+    get_move(), minimax players a single search to `depth` plies and MCTS
+    players `depth` iterations (i.e., playouts).
+    """
+    # A clock that does not run out, but advances: the players read it only
+    # every few nodes at the measured node rate (see `game_agent.Deadline`)
+    start = timeit.default_timer()
+    player.time_left = lambda: 1e9 - 1000. * (timeit.default_timer() - start)
+    player.start_stats()
+    if isinstance(player, AlphaBetaPlayer):
+        player.reset_move_ordering(game.width * game.height)
+        for iterative_depth in range(1, depth + 1):
+            player.alphabeta(game, iterative_depth)
+    elif isinstance(player, MCTSPlayer):
+        player.mcts(game, depth)
+    else:
+        player.minimax(game, depth)
+    return player.nodes
+
+
+def benchmark_searches(board_class, width, height, positions, depth):
+    """Run fixed-depth searches over all positions with fresh players (i.e.,
+    empty transposition tables and history) and return the node counts and
+    search speed of every engine.
+    """
+    iterations = depth * MCTS_ITERATIONS_PER_PLY
+    engines = {
+        "minimax_d{}".format(min(depth, 3)):
+            (lambda: MinimaxPlayer(score_fn=improved_score), min(depth, 3)),
+        "alphabeta_d{}".format(depth):
+            (lambda: AlphaBetaPlayer(score_fn=improved_score), depth),
+        "alphabeta_no_tt_d{}".format(depth):
+            (lambda: AlphaBetaPlayer(score_fn=improved_score, tt_bytes=0), depth),
+        "alphabeta_stack_d{}".format(depth):
+            (lambda: AlphaBetaPlayer(score_fn=improved_score, stack_search=True), depth),
+        "mcts_i{}".format(iterations): (lambda: MCTSPlayer(seed=1), iterations),
+    }
+    results = {}
+    for name, (make_player, search_depth) in engines.items():
+        nodes = 0
+        seconds = 0.
+        for moves in positions:
+            player = make_player()
+            players = [player, "opponent"]
+            if len(moves) % 2:
+                players.reverse()
+            game = replay(board_class, players[0], players[1], width, height, moves)
+            start = timeit.default_timer()
+            nodes += run_search(player, game, search_depth)
+            seconds += timeit.default_timer() - start
+        results["search_" + name] = {
+            "nodes": nodes,
+            "nodes_per_sec": nodes / seconds if seconds > 0 else 0.,
+        }
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print the results next to the baseline and return the names of the
+    benchmarks that are more than `tolerance` (a fraction) slower.
+    """
+    regressions = []
+    print("{:<34}{:>14}{:>14}{:>9}".format("Benchmark", "Baseline", "Current", "Ratio"))
+    for name, current in results.items():
+        if name not in baseline:
+            print("{:<34}{:>14}{:>14}".format(name, "-", format_result(current)))
+            continue
+        old = baseline[name]
+        if "us_per_call" in current:
+            # time per call: higher is slower
+            ratio = current["us_per_call"] / old["us_per_call"] if old["us_per_call"] else 1.
+        else:
+            # nodes per second: lower is slower
+            ratio = old["nodes_per_sec"] / current["nodes_per_sec"] if current["nodes_per_sec"] else math.inf
+        flag = ""
+        if ratio > 1. + tolerance:
+            regressions.append(name)
+            flag = "  SLOWER"
+        if "nodes" in current and current["nodes"] != old.get("nodes"):
+            flag += "  (nodes {} -> {})".format(old.get("nodes"), current["nodes"])
+        print("{:<34}{:>14}{:>14}{:>8.2f}x{}".format(
+            name, format_result(old), format_result(current), ratio, flag))
+    return regressions
+
+
+def format_result(result):
+    if "us_per_call" in result:
+        return "{:.2f} us".format(result["us_per_call"])
+    return "{:.0f} n/s".format(result["nodes_per_sec"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--board", choices=sorted(BOARD_CLASSES), default="board",
+                        help="board implementation to benchmark")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="number of timing runs per benchmark (the best is kept)")
+    parser.add_argument("--depth", type=int, default=5,
+                        help="depth of the alpha-beta search benchmarks "
+                             "(minimax searches at most 3 plies, MCTS runs "
+                             "{} iterations per ply)".format(MCTS_ITERATIONS_PER_PLY))
+    parser.add_argument("--positions", default=POSITIONS_FILE,
+                        help="JSON file with the recorded positions")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against the results in this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="slowdown (fraction) tolerated before a benchmark "
+                             "is reported as a regression")
+    parser.add_argument("--record", type=int, metavar="N",
+                        help="record a new corpus of N positions into --positions and exit")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the random games played by --record")
+    args = parser.parse_args()
+
+    if args.record:
+        corpus = {"width": 7, "height": 7,
+                  "positions": record_positions(args.record, args.seed)}
+        with open(args.positions, "w") as data_fp:
+            json.dump(corpus, data_fp)
+        print("Recorded {} positions in {}".format(args.record, args.positions))
+        return 0
+
+    board_class = BOARD_CLASSES[args.board]
+    width, height, positions = load_positions(args.positions)
+    games = [replay(board_class, "player 1", "player 2", width, height, moves)
+             for moves in positions]
+
+    results = benchmark_primitives(games, args.repeat)
+    results.update(benchmark_searches(board_class, width, height, positions, args.depth))
+
+    if args.output:
+        with open(args.output, "w") as data_fp:
+            json.dump({"board": args.board, "depth": args.depth,
+                       "results": results}, data_fp, indent=2, sort_keys=True)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as data_fp:
+            baseline = json.load(data_fp)["results"]
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\n{} benchmark(s) slower than the baseline: {}".format(
+            len(regressions), ", ".join(regressions)))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
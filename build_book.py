@@ -0,0 +1,147 @@
+"""Build the opening book of the competition agent offline.
+
+All positions of the first plies of the game are enumerated, reduced to one
+representative per class of symmetric positions (see `Board.canonical_key`)
+and searched with iterative deepening alpha-beta to a fixed depth, in
+parallel in a pool of worker processes. The best move of every position is
+stored in the book, where it also serves all positions symmetric to it.
+
+The book is saved after every `--save-every` positions (and when the builder
+is interrupted); positions already in the book are skipped, so an
+interrupted build is resumed by running the same command again.
+
+    python build_book.py --plies 3 --depth 8 --workers 4 --book opening_book.bin
+"""
+import argparse
+import timeit
+
+from concurrent.futures import ProcessPoolExecutor
+
+from isolation import Board
+from game_agent import AlphaBetaPlayer, TT_DEFAULT_BYTES
+from competition_agent import CustomPlayer
+from opening_book import OpeningBook
+
+WIDTH, HEIGHT = CustomPlayer.BOARD_WIDTH, CustomPlayer.BOARD_HEIGHT
+
+
+def enumerate_openings(plies):
+    """Return the move sequences of one position per class of symmetric
+    positions for every position reached after 0 to `plies` - 1 moves, i.e.,
+    the positions in which the book must provide one of the first `plies`
+    moves.
+    """
+    game = Board("player 1", "player 2", WIDTH, HEIGHT)
+    game.shuffle_moves = False
+    openings = []
+    seen = set()
+    frontier = [[]]
+    for _ in range(plies):
+        next_frontier = []
+        for moves in frontier:
+            for move in moves:
+                game.push(move)
+            key = game.canonical_key()[0]
+            if key not in seen:
+                seen.add(key)
+                openings.append(moves)
+                next_frontier.extend(moves + [move] for move in game.get_legal_moves())
+            for _ in moves:
+                game.pop()
+        frontier = next_frontier
+    return openings
+
+
+def search_opening(moves, depth, tt_bytes):
+    """Search the position reached by `moves` with iterative deepening
+    alpha-beta to `depth` plies and return its (moves, best move).
+    """
+    player = AlphaBetaPlayer(tt_bytes=tt_bytes)
+    opponent = "opponent"
+    players = [player, opponent] if len(moves) % 2 == 0 else [opponent, player]
+    game = Board(players[0], players[1], WIDTH, HEIGHT)
+    for move in moves:
+        game.apply_move(move)
+    game.shuffle_moves = False
+
+    player.time_left = lambda: float("inf")
+    player.start_stats()
+    player.reset_move_ordering(WIDTH * HEIGHT)
+    if player.tt is not None:
+        player.tt.new_search()
+    best_move = None
+    for iterative_depth in range(1, depth + 1):
+        best_move = player.alphabeta(game, iterative_depth)
+    return moves, best_move
+
+
+def replay(moves):
+    """Return the board of the position reached by `moves`. """
+    game = Board("player 1", "player 2", WIDTH, HEIGHT)
+    for move in moves:
+        game.apply_move(move)
+    return game
+
+
+def build_book(book, filename, openings, depth, tt_bytes, workers, save_every):
+    """Search all `openings` that are not in `book` yet and add their best
+    moves, saving the book to `filename` after every `save_every` results.
+    """
+    todo = [moves for moves in openings if replay(moves).canonical_key()[0] not in book]
+    print("{} opening positions, {} already in the book, {} to search".format(
+        len(openings), len(openings) - len(todo), len(todo)))
+    if not todo:
+        return
+
+    start = timeit.default_timer()
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    futures = []
+    try:
+        if executor is not None:
+            futures = [executor.submit(search_opening, moves, depth, tt_bytes) for moves in todo]
+            results = (future.result() for future in futures)
+        else:
+            results = (search_opening(moves, depth, tt_bytes) for moves in todo)
+
+        for done, (moves, best_move) in enumerate(results, 1):
+            book.add_position(replay(moves), best_move)
+            if done % save_every == 0:
+                book.save(filename)
+                print("{}/{} positions searched ({:.0f} s)".format(
+                    done, len(todo), timeit.default_timer() - start))
+    finally:
+        # Keep the results of an interrupted build
+        book.save(filename)
+        if executor is not None:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--book", default="opening_book.bin",
+                        help="the book file to create or extend")
+    parser.add_argument("--plies", type=int, default=3,
+                        help="number of opening moves covered by the book (at most "
+                             "{})".format(CustomPlayer.MAX_DEPTH_OPENING_BOOK + 1))
+    parser.add_argument("--depth", type=int, default=6,
+                        help="depth of the alpha-beta search of every position")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of positions to search in parallel")
+    parser.add_argument("--tt-kb", type=int, default=TT_DEFAULT_BYTES // 2**10,
+                        help="memory ceiling of the transposition table of "
+                             "every search in KiB (0 disables it)")
+    parser.add_argument("--save-every", type=int, default=100,
+                        help="save the book after this many searched positions")
+    args = parser.parse_args()
+
+    openings = enumerate_openings(args.plies)
+    book = OpeningBook(args.book, WIDTH, HEIGHT)
+    build_book(book, args.book, openings, args.depth, args.tt_kb * 2**10,
+               args.workers, args.save_every)
+    print("{} entries in {}".format(len(book), args.book))
+
+
+if __name__ == "__main__":
+    main()
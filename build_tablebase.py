@@ -0,0 +1,187 @@
+"""Build the endgame tablebase of the alpha-beta agents offline.
+
+Games are played by fixed-depth alpha-beta searches (after a few random
+moves) until the region the players can still reach has at most
+`--max-blanks` cells, so that the endgames are those of real play, and the
+position reached is solved exactly by an exhaustive search in a pool of
+worker processes. Every position of the solved game tree in which the player
+to move can still move is stored in the tablebase under the key of its
+reachable region (see `tablebase.region_key`), where it also serves all
+positions with the same region, whatever the rest of the board looks like.
+
+Game `i` is always played from the random seed `i`, and the tablebase is
+saved after every `--save-every` games (and when the builder is
+interrupted); games whose position is already in the tablebase are skipped,
+so an interrupted build is resumed by running the same command again, and a
+tablebase is extended by running it with `--first-game`.
+
+    python build_tablebase.py --games 1000 --workers 4 --tablebase tablebase.bin
+"""
+import argparse
+import os
+import random
+import timeit
+
+from concurrent.futures import ProcessPoolExecutor
+
+from isolation import Board
+from game_agent import AlphaBetaPlayer
+from sample_players import improved_score
+from tablebase import Tablebase, region_key, TABLEBASE_MAX_BLANKS
+
+WIDTH, HEIGHT = 7, 7
+RANDOM_MOVES = 4  # random moves at the start of every game
+PLAYOUT_DEPTH = 3  # depth of the searches that play the rest of the game
+
+
+def endgame_position(seed, max_blanks):
+    """Play games from `seed` until one reaches a position with a reachable
+    region of at most `max_blanks` cells in which the player to move can
+    still move, and return the moves of that position.
+
+    After `RANDOM_MOVES` random moves, both players play the move of an
+    alpha-beta search `PLAYOUT_DEPTH` plies deep; the seeded move order of
+    the board breaks the ties between equally scored moves.
+    """
+    rng = random.Random(seed)
+    players = [AlphaBetaPlayer(score_fn=improved_score, timeout=0., tt_bytes=0, endgame_cells=0)
+               for _ in range(2)]
+    for player in players:
+        player.time_left = lambda: float("inf")
+    while True:
+        game = Board(players[0], players[1], WIDTH, HEIGHT, seed=rng.getrandbits(32))
+        moves = []
+        legal_moves = game.get_legal_moves()
+        while legal_moves and game.reachable_region(max_blanks) is None:
+            if len(moves) < RANDOM_MOVES:
+                move = rng.choice(legal_moves)
+            else:
+                player = game.active_player
+                player.start_stats()
+                player.reset_move_ordering(WIDTH * HEIGHT)
+                for depth in range(1, PLAYOUT_DEPTH + 1):
+                    move = player.alphabeta(game, depth)
+            game.apply_move(move)
+            moves.append(move)
+            legal_moves = game.get_legal_moves()
+        if legal_moves:
+            return moves
+
+
+def replay(moves):
+    """Return the board of the position reached by `moves`. """
+    game = Board("player 1", "player 2", WIDTH, HEIGHT)
+    for move in moves:
+        game.apply_move(move)
+    game.shuffle_moves = False
+    return game
+
+
+def solve_endgame(moves):
+    """Solve the position reached by `moves` exactly and return its (moves,
+    entries), the (region key, player to move wins) of every position of the
+    game tree in which the player to move can still move. All moves are
+    searched, not only those up to the first winning one, so that the whole
+    tree is stored.
+    """
+    game = replay(moves)
+    results = {}
+    entries = []
+
+    def active_player_wins():
+        key = game.zobrist_key
+        if key in results:
+            return results[key]
+        legal_moves = game.get_legal_moves()
+        wins = False
+        for move in legal_moves:
+            game.push(move)
+            opponent_wins = active_player_wins()
+            game.pop()
+            if not opponent_wins:
+                wins = True
+        results[key] = wins
+        if legal_moves:
+            entries.append((region_key(game, WIDTH * HEIGHT), wins))
+        return wins
+
+    active_player_wins()
+    return moves, entries
+
+
+def solve_game(seed, max_blanks, filename):
+    """Play the game of `seed` and solve its endgame unless its position is
+    already in the tablebase stored in `filename`. Return the (moves,
+    entries) of `solve_endgame`, with entries None for a skipped game.
+    """
+    moves = endgame_position(seed, max_blanks)
+    table = Tablebase(filename, WIDTH, HEIGHT)
+    try:
+        if region_key(replay(moves), WIDTH * HEIGHT) in table:
+            return moves, None
+    finally:
+        table.close()
+    return solve_endgame(moves)
+
+
+def build_tablebase(table, filename, seeds, max_blanks, workers, save_every):
+    """Solve the endgame of every game in `seeds` whose position is not in
+    the tablebase stored in `filename` yet and add the solved positions to
+    `table`, saving it to `filename` after every `save_every` games.
+    """
+    start = timeit.default_timer()
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    futures = []
+    skipped = 0
+    try:
+        if executor is not None:
+            futures = [executor.submit(solve_game, seed, max_blanks, filename) for seed in seeds]
+            results = (future.result() for future in futures)
+        else:
+            results = (solve_game(seed, max_blanks, filename) for seed in seeds)
+
+        for done, (moves, entries) in enumerate(results, 1):
+            if entries is None:
+                skipped += 1
+                continue
+            for key, wins in entries:
+                table.add(key, wins)
+            if done % save_every == 0:
+                table.save(filename)
+                print("{}/{} games solved ({:.0f} s)".format(
+                    done, len(seeds), timeit.default_timer() - start))
+    finally:
+        # Keep the results of an interrupted build
+        table.save(filename)
+        if executor is not None:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+    print("{} games, {} already in the tablebase".format(len(seeds), skipped))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tablebase", default="tablebase.bin",
+                        help="the tablebase file to create or extend")
+    parser.add_argument("--games", type=int, default=1000,
+                        help="number of endgames to solve")
+    parser.add_argument("--first-game", type=int, default=0,
+                        help="seed of the first game")
+    parser.add_argument("--max-blanks", type=int, default=TABLEBASE_MAX_BLANKS,
+                        help="largest reachable region of the solved endgames")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="number of endgames to solve in parallel")
+    parser.add_argument("--save-every", type=int, default=100,
+                        help="save the tablebase after this many solved games")
+    args = parser.parse_args()
+
+    table = Tablebase(args.tablebase, WIDTH, HEIGHT)
+    seeds = range(args.first_game, args.first_game + args.games)
+    build_tablebase(table, args.tablebase, seeds, args.max_blanks, args.workers,
+                    args.save_every)
+    print("{} entries in {}".format(len(table), args.tablebase))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,24 +6,14 @@ champions) in a tournament.
 """
 import random
 import math
-import json
-import os.path
-from enum import Enum
+
+from opening_book import OpeningBook
+from stack_search import StackSearch
 
 class SearchTimeout(Exception):
     """Subclass base exception for code clarity. """
     pass
 
-class Symmetries(Enum):
-    SAME = 0
-    VERTICAL = 1
-    HORIZONTAL = 2
-    ROTATE90 = 3
-    ROTATE180 = 4
-    ROTATE270 = 5
-    DIAG1 = 6
-    DIAG2 = 7
-
 def custom_score(game, player):
     """Calculate the heuristic value of a game state from the point of view
     of the given player.
@@ -45,14 +35,10 @@ def custom_score(game, player):
     float
         The heuristic value of the current game state to the specified player.
     """
-    if game.is_loser(player):
-        return float("-inf")
+    utility, moves_own, moves_opp = game.mobility(player)
+    if utility:
+        return utility
 
-    if game.is_winner(player):
-        return float("inf")
-
-    moves_own = len(game.get_legal_moves(player))
-    moves_opp = len(game.get_legal_moves(game.get_opponent(player)))
     board_size = game.height * game.width
     moves_placed_ratio = game.move_count / board_size
     if moves_placed_ratio > 0.33:
@@ -83,58 +69,50 @@ class CustomPlayer:
 
     Parameters
     ----------
-    data : string
-        The name of the search method to use in get_move().
+    data : string (optional)
+        The file name of the opening book (see `opening_book.OpeningBook`).
 
     timeout : float (optional)
         Time remaining (in milliseconds) when search is aborted.  Note that
         the PvP competition uses more accurate timers that are not cross-
         platform compatible, so a limit of 1ms (vs 10ms for the other classes)
         is generally sufficient.
+
+    stack_search : bool (optional)
+        Search with the non-recursive `stack_search.StackSearch` engine
+        instead of min_value()/max_value(): the same move, without a Python
+        call per node.
     """
     MAX_DEPTH_OPENING_BOOK = 5
     BOARD_WIDTH = 7
     BOARD_HEIGHT = 7
     
-    def __init__(self, data=None, timeout=1.):
+    def __init__(self, data=None, timeout=1., stack_search=False):
         self.score = custom_score
         self.time_left = None
         self.TIMER_THRESHOLD = timeout
+        self.stack = StackSearch(self) if stack_search else None
         self.load_opening_book(data)
 
-    # TODO: Opening book should go into a seperta class!!!
     def load_opening_book(self, filename):
-        # TODO: Make opening book storage, loading etc. more efficient. This should include using ints instead of strings
-        # and avoid most of the conversions. However: First rule is: Don't optimize! Only if it is really required.
-        if (filename != None) and os.path.exists(filename):
-            with open(filename, 'rb') as data_fp:
-                self.opening_book = json.load(data_fp)
-                data_fp.close()
-        else:
-            self.opening_book = {}
+        """Open the opening book stored in `filename`; a missing file (or
+        None) gives an empty book.
+        """
+        self.opening_book = OpeningBook(filename, self.BOARD_WIDTH, self.BOARD_HEIGHT)
 
     def save_opening_book(self, filename):
-        print("Writing new version of opening book.")
-        with open(filename, 'w') as data_fp:
-            json.dump(self.opening_book, data_fp)
-            data_fp.close()
+        self.opening_book.save(filename)
 
-    def update_opening_book(self, game):
+    def update_opening_book(self, game, move=None):
+        """Record `move` (by default the last `best_move`) as the move to play
+        in the current position of `game` and in all its symmetric images.
+        """
         if game.move_count > self.MAX_DEPTH_OPENING_BOOK:
-            print("Maximum depth reached, no update of opening book")
             return
-          
-        print("Adding moves to the opening book: ", self.best_move)
-        symmetric_boards = game.symmetric_configurations()
-        print(symmetric_boards)
-        for sym_config in Symmetries:
-            print("Current sym config", sym_config)
-            hash_config = str(str(symmetric_boards[sym_config.value]).__hash__())
-            print("Current hash: ", hash_config)
-            if hash_config not in self.opening_book:
-                self.opening_book[hash_config] = (self.best_move, sym_config.value)
-                print("Updated opening book:", self.opening_book[hash_config])
-            
+        if move is None:
+            move = self.best_move
+        self.opening_book.add_position(game, move)
+
     def check_timing(self):
         """ To avoid code duplication the time checking should be done in a consistent way
         in the base class so that all derived algorithms can use the same functions.
@@ -152,30 +130,6 @@ class CustomPlayer:
             else:
                 self.best_move = (2, 2)
 
-    def backrotate_move(self, move_list, symmetry):
-        # TODO: Document that this method encapsulates the representation of the JSON file
-        # TODO: Check if this can be put together with the symmetry generation into one class.
-        if symmetry == Symmetries.SAME:
-            return tuple(move_list)
-
-        (i, j) = move_list
-        if symmetry == Symmetries.VERTICAL:
-            return (i, self.BOARD_WIDTH - j - 1)
-        if symmetry == Symmetries.HORIZONTAL:
-            return (self.BOARD_HEIGHT - i - 1, j)
-        if symmetry == Symmetries.ROTATE90:
-            return (self.BOARD_HEIGHT - j - 1, i)
-        if symmetry == Symmetries.ROTATE180:
-            return (self.BOARD_HEIGHT - i - 1, self.BOARD_WIDTH - j - 1)
-        if symmetry == Symmetries.ROTATE270:
-            return (j, self.BOARD_WIDTH - i - 1)
-        if symmetry == Symmetries.DIAG1:
-            return (self.BOARD_HEIGHT - j - 1, self.BOARD_WIDTH - i - 1)
-        if symmetry == Symmetries.DIAG2:
-            return (j, i)
-
-        
-    
     def get_move(self, game, time_left):
         """Search for the best move from the available legal moves and return a
         result before the time limit expires.
@@ -211,20 +165,11 @@ class CustomPlayer:
         if self.best_move != (-1, -1):
             return self.best_move
           
-        symmetric_boards  = game.symmetric_configurations()
-            
-        # Check if symmetric configs are in the opening book
-        for config in symmetric_boards:
-            hash_config = str(str(config).__hash__())
-            print("Hash: ", hash_config)
-            if hash_config in self.opening_book:
-                (move_list, move_symmetry) = self.opening_book[hash_config]
-                print(move_list, move_symmetry)
-                self.best_move = self.backrotate_move(move_list, Symmetries(move_symmetry))
-                print("Found move in opening book", self.best_move)
-        
-        if self.best_move != (-1, -1):
-            return self.best_move
+        if game.move_count <= self.MAX_DEPTH_OPENING_BOOK:
+            book_move = self.opening_book.lookup_position(game)
+            # A book entry of another position never forfeits the game
+            if book_move is not None and book_move in game.get_legal_moves():
+                return book_move
         
         try:
             iterative_depth = 1
@@ -244,7 +189,8 @@ class CustomPlayer:
     def min_value(self, game, current_depth, alpha, beta):
         self.check_timing()
 
-        legal_moves = game.get_legal_moves()
+        # Horizon nodes need no move list: the score covers finished games
+        legal_moves = game.get_legal_indices() if current_depth > 0 else None
 
         if (current_depth <= 0) or (not legal_moves):
             return self.score(game, self)
@@ -255,8 +201,11 @@ class CustomPlayer:
         min_score = math.inf
         current_beta = beta
         for move in legal_moves:
-            result_game = game.forecast_move(move)
-            current_score = self.max_value(result_game, current_depth - 1, alpha, current_beta)
+            game.push_index(move)
+            try:
+                current_score = self.max_value(game, current_depth - 1, alpha, current_beta)
+            finally:
+                game.pop()
             if current_score < min_score:
                 min_score = current_score
             if min_score <= alpha:
@@ -268,7 +217,8 @@ class CustomPlayer:
     def max_value(self, game, current_depth, alpha, beta):
         self.check_timing()
 
-        legal_moves = game.get_legal_moves()
+        # Horizon nodes need no move list: the score covers finished games
+        legal_moves = game.get_legal_indices() if current_depth > 0 else None
 
         if (current_depth <= 0) or (not legal_moves):
             return self.score(game, self)
@@ -279,8 +229,11 @@ class CustomPlayer:
         max_score = -math.inf
         current_alpha = alpha
         for move in legal_moves:
-            result_game = game.forecast_move(move)
-            current_score = self.min_value(result_game, current_depth - 1, current_alpha, beta)
+            game.push_index(move)
+            try:
+                current_score = self.min_value(game, current_depth - 1, current_alpha, beta)
+            finally:
+                game.pop()
             if current_score > max_score:
                 max_score = current_score
             if max_score >= beta:
@@ -334,14 +287,18 @@ class CustomPlayer:
                 each helper function or else your agent will timeout during
                 testing.
         """
+        if self.stack is not None:
+            return self.stack.search(game, depth, alpha, beta)
+
         self.check_timing()
 
-        legal_moves = game.get_legal_moves()
+        # The search works on move indices (see Board.get_legal_indices)
+        legal_moves = game.get_legal_indices()
         if not legal_moves:
             return (-1, -1)
           
         if depth < 1:
-            return legal_moves[0]
+            return game.index_to_move(legal_moves[0])
        
         # As we have legal moves and might timeout anytime, it is better to select
         # an arbitrary first move than an invalid move.
@@ -349,8 +306,11 @@ class CustomPlayer:
         max_score = -math.inf  
         current_alpha = alpha
         for move in legal_moves:
-            result_game = game.forecast_move(move)
-            current_score = self.min_value(result_game, depth - 1, current_alpha, beta)
+            game.push_index(move)
+            try:
+                current_score = self.min_value(game, depth - 1, current_alpha, beta)
+            finally:
+                game.pop()
             if current_score > max_score:
                 max_move = move
                 max_score = current_score
@@ -358,5 +318,5 @@ class CustomPlayer:
                 break
             current_alpha = max(current_alpha, max_score)
         
-        return max_move
+        return game.index_to_move(max_move)
         
@@ -0,0 +1,181 @@
+"""This file contains the `EndgameSolver` class, which plays partitioned
+Isolation endgames exactly.
+
+Once no cell can be reached by both players (see `Board.is_partitioned`),
+the players can no longer interfere with each other and each of them simply
+makes as many moves as possible in its own region. The player with the
+initiative wins if and only if its longest knight path is strictly longer
+than the longest path of its opponent.
+
+Longest paths are found with a depth-first search over (cell, remaining
+cells) states represented as bitmasks, memoized across calls, so that the
+repeated solves of similar regions during a search are (almost) free.
+"""
+from isolation import Board
+
+ENDGAME_MAX_CELLS = 14  # largest region solved exactly
+ENDGAME_SLACK = 6  # blank cells outside both regions tolerated before solving
+CACHE_MAX_ENTRIES = 2**20
+CHECK_INTERVAL = 256  # solver nodes between two calls to check_timing
+
+
+class EndgameSolver:
+    """Solve partitioned positions exactly.
+
+    Parameters
+    ----------
+    max_cells : int (optional)
+        The largest region (in blank cells) a longest path is computed for;
+        positions with a larger region are left to the search.
+
+    check_timing : callable (optional)
+        Called every `CHECK_INTERVAL` solver nodes; may raise an exception
+        (e.g., `game_agent.SearchTimeout`) to abort a solve that takes too
+        long. Aborted solves keep the results memoized so far.
+    """
+    def __init__(self, max_cells=ENDGAME_MAX_CELLS, check_timing=None):
+        self.max_cells = max_cells
+        self.check_timing = check_timing
+        self._size = None
+        self._cells = None
+        self._neighbors = None
+        self._neighbor_masks = None
+        self._cache = {}
+        self._nodes = 0
+
+    def _set_board_size(self, width, height):
+        """Take the knight neighbors (by cell index, row + column * height)
+        of a board size from the geometry of `Board`, build their masks and
+        drop the cache of the previous size.
+        """
+        if self._size == (width, height):
+            return
+        cells, _, neighbors, _ = Board._get_knight_geometry(width, height)
+        self._size = (width, height)
+        self._cells = cells
+        self._neighbors = neighbors
+        self._neighbor_masks = [sum(1 << idx for idx in cell_neighbors)
+                                for cell_neighbors in neighbors]
+        self._cache = {}
+
+    def _regions(self, game):
+        """Return the (location index, region mask) of the active and the
+        inactive player if the position is partitioned and both regions are
+        small enough to be solved, otherwise None.
+
+        Equivalent to `Board.is_partitioned` and `Board.reachable_cells`, but
+        the flood fills stop as soon as a region grows too large or touches
+        the other region, which is the common case outside the endgame.
+        """
+        if game.width * game.height - game.move_count > 2 * self.max_cells + ENDGAME_SLACK:
+            return None
+        locations = []
+        for player in (game.active_player, game.inactive_player):
+            location = game.get_player_location(player)
+            if location is None:
+                return None
+            locations.append(location[0] + location[1] * game.height)
+
+        active_idx, inactive_idx = locations
+        # Any cell the inactive player can move to is shared
+        active_region = self._flood_fill(game, active_idx, self._neighbor_masks[inactive_idx])
+        if active_region is None:
+            return None
+        inactive_region = self._flood_fill(game, inactive_idx, active_region)
+        if inactive_region is None:
+            return None
+        return (active_idx, active_region), (inactive_idx, inactive_region)
+
+    def _flood_fill(self, game, idx, forbidden):
+        """Return the mask of the blank cells reachable from cell index `idx`,
+        or None if there are more than `max_cells` of them or one of them is
+        in the mask `forbidden`.
+        """
+        cells = self._cells
+        neighbors = self._neighbors
+        move_is_legal = game.move_is_legal
+        max_cells = self.max_cells
+        region = 0
+        visited = 1 << idx
+        size = 0
+        frontier = [idx]
+        while frontier:
+            for next_idx in neighbors[frontier.pop()]:
+                bit = 1 << next_idx
+                if visited & bit:
+                    continue
+                visited |= bit
+                if move_is_legal(cells[next_idx]):
+                    if bit & forbidden or size == max_cells:
+                        return None
+                    size += 1
+                    region |= bit
+                    frontier.append(next_idx)
+        return region
+
+    def longest_path(self, idx, mask):
+        """Return the number of moves of the longest knight path starting on
+        cell index `idx` through the blank cells of `mask`.
+        """
+        key = (idx, mask)
+        cache = self._cache
+        if key in cache:
+            return cache[key]
+
+        self._nodes += 1
+        if self.check_timing is not None and self._nodes % CHECK_INTERVAL == 0:
+            self.check_timing()
+
+        best = 0
+        # No path can be longer than the number of remaining cells
+        bound = bin(mask).count("1")
+        moves = self._neighbor_masks[idx] & mask
+        while moves and best < bound:
+            low = moves & -moves
+            moves ^= low
+            length = 1 + self.longest_path(low.bit_length() - 1, mask ^ low)
+            if length > best:
+                best = length
+
+        if len(cache) >= CACHE_MAX_ENTRIES:
+            cache.clear()
+        cache[key] = best
+        return best
+
+    def solve(self, game, player):
+        """Return the exact utility of a partitioned position for `player`
+        (+inf if the player wins, -inf if it loses), or None if the position
+        is not partitioned or a region is too large.
+        """
+        self._set_board_size(game.width, game.height)
+        regions = self._regions(game)
+        if regions is None:
+            return None
+        (active_idx, active_mask), (inactive_idx, inactive_mask) = regions
+        active_wins = (self.longest_path(active_idx, active_mask) >
+                       self.longest_path(inactive_idx, inactive_mask))
+        if active_wins == (player == game.active_player):
+            return float("inf")
+        return float("-inf")
+
+    def best_move(self, game):
+        """Return the first move of the longest path of the active player in
+        a partitioned position (which wins if the position can be won and
+        otherwise survives as long as possible), or None if the position is
+        not partitioned or a region is too large.
+        """
+        self._set_board_size(game.width, game.height)
+        regions = self._regions(game)
+        if regions is None:
+            return None
+        idx, mask = regions[0]
+        best_move, best_length = None, -1
+        moves = self._neighbor_masks[idx] & mask
+        while moves:
+            low = moves & -moves
+            moves ^= low
+            length = self.longest_path(low.bit_length() - 1, mask ^ low)
+            if length > best_length:
+                next_idx = low.bit_length() - 1
+                best_move, best_length = (next_idx % game.height, next_idx // game.height), length
+        return best_move
@@ -2,7 +2,50 @@
 test your agent's strength against a set of known agents using tournament.py
 and include the results in your report.
 """
+import gc
 import math
+import random
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.sharedctypes import RawArray
+
+from endgame import EndgameSolver, ENDGAME_MAX_CELLS
+from isolation import Board
+from stack_search import StackSearch
+
+# Default memory ceiling of the transposition table of each AlphaBetaPlayer
+TT_DEFAULT_BYTES = 4 * 2**20
+
+# Mixed into the key of minimizing nodes: scores are always stored from the
+# point of view of the searching player, so the same position must not be
+# shared between the nodes where it is, and where it is not, on move.
+MIN_NODE_KEY = 0x9E3779B97F4A7C15
+
+# Half-width of the aspiration windows of iterative deepening
+ASPIRATION_WINDOW = 1.
+
+# Longest time (in seconds) a ponder search runs if end_ponder() is never called
+PONDER_MAX_SECONDS = 60.
+
+# Most nodes searched between two reads of the clock, and the longest time
+# (in milliseconds) between two reads at the measured node rate
+MAX_CHECK_NODES = 1024
+CHECK_INTERVAL_MS = 0.5
+
+# The calibrated timer threshold is the worst time measured to abort a search
+# and return, plus the longest pause of the clock and the time of a full
+# garbage collection, times TIMER_SAFETY_FACTOR, and at least
+# MIN_TIMER_THRESHOLD milliseconds. The calibration aborts searches after
+# CALIBRATION_NODES nodes and watches the clock for CALIBRATION_MS
+# milliseconds.
+TIMER_SAFETY_FACTOR = 3.
+MIN_TIMER_THRESHOLD = 2.
+CALIBRATION_NODES = (500, 2000)
+CALIBRATION_MS = 10.
+
+# Exploration constant of the UCT selection of MCTSPlayer
+UCT_EXPLORATION = math.sqrt(2)
 
 
 class SearchTimeout(Exception):
@@ -33,14 +76,10 @@ def custom_score(game, player):
     float
         The heuristic value of the current game state to the specified player.
     """
-    if game.is_loser(player):
-        return float("-inf")
+    utility, own_moves, opp_moves = game.mobility(player)
+    if utility:
+        return utility
 
-    if game.is_winner(player):
-        return float("inf")
-
-    own_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
     return float(own_moves - 1.375*opp_moves)
 
 def custom_score_2(game, player):
@@ -63,14 +102,10 @@ def custom_score_2(game, player):
     float
         The heuristic value of the current game state
     """
-    if game.is_loser(player):
-        return float("-inf")
-
-    if game.is_winner(player):
-        return float("inf")
+    utility, own_moves, opp_moves = game.mobility(player)
+    if utility:
+        return utility
 
-    own_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
     return float(own_moves / (2.5 * (opp_moves+1)))
 
 
@@ -95,14 +130,10 @@ def custom_score_3(game, player):
     float
         The heuristic value of the current game state
     """
-    if game.is_loser(player):
-        return float("-inf")
-
-    if game.is_winner(player):
-        return float("inf")
+    utility, moves_own, moves_opp = game.mobility(player)
+    if utility:
+        return utility
 
-    moves_own = len(game.get_legal_moves(player))
-    moves_opp = len(game.get_legal_moves(game.get_opponent(player)))
     board_size = game.height * game.width
     moves_placed_ratio = game.move_count / board_size
     if moves_placed_ratio > 0.33:
@@ -117,6 +148,278 @@ def custom_score_3(game, player):
 
     return float(move_diff / m_distance)
 
+
+class TranspositionTable:
+    """Fixed-size cache of search results keyed by the Zobrist key of a
+    position.
+
+    All entries live in preallocated arrays, so the memory used by the table
+    never grows after construction. Entries are grouped in buckets of two
+    slots: the first slot keeps the deepest result (depth-preferred), the
+    second one is always overwritten. Results from previous searches (see
+    `new_search()`) may always be replaced. Best moves are stored as move
+    indices (see `isolation.Board.get_legal_indices`).
+
+    Parameters
+    ----------
+    max_bytes : int
+        Upper bound for the memory used by the entry arrays.
+
+    shared : bool (optional)
+        Allocate the entry arrays in shared memory, so that the table can be
+        used by several processes (see `buffers`).
+
+    buffers : tuple (optional)
+        The shared entry arrays (the `buffers` attribute) of a table of the
+        same `max_bytes` created by another process; the new table works on
+        the same entries.
+    """
+    EXACT = 0
+    LOWER_BOUND = 1
+    UPPER_BOUND = 2
+
+    NO_MOVE = -1
+
+    # Typecodes of the entry arrays: key, score, depth, bound, age, move
+    TYPECODES = ('Q', 'd', 'b', 'b', 'B', 'i')
+    ENTRY_BYTES = sum(array(code).itemsize for code in TYPECODES)
+
+    def __init__(self, max_bytes, shared=False, buffers=None):
+        buckets = 1
+        while 2 * buckets * 2 * self.ENTRY_BYTES <= max_bytes:
+            buckets *= 2
+        self.mask = buckets - 1
+        self.size = 2 * buckets
+
+        initial = (0, 0., -1, self.EXACT, 0, self.NO_MOVE)
+        if buffers is None and not shared:
+            self.buffers = None
+            entry_arrays = [array(code, [value]) * self.size
+                            for code, value in zip(self.TYPECODES, initial)]
+        else:
+            if buffers is None:
+                buffers = tuple(RawArray(code, self.size) for code in self.TYPECODES)
+            else:
+                initial = None
+            self.buffers = buffers
+            # Shared memory is accessed through typed views, which index as
+            # fast as arrays
+            entry_arrays = [memoryview(buffer).cast('B').cast(code)
+                            for code, buffer in zip(self.TYPECODES, buffers)]
+            if initial is not None:
+                for view, code, value in zip(entry_arrays, self.TYPECODES, initial):
+                    view[:] = array(code, [value]) * self.size
+        (self.keys, self.scores, self.depths, self.bounds, self.ages,
+         self.moves) = entry_arrays
+        self.age = 0
+
+    def new_search(self):
+        """Mark all stored results as belonging to a previous search. """
+        self.age = (self.age + 1) & 0xFF
+
+    def probe(self, key):
+        """Return the slot holding `key`, or -1 if it is not stored. """
+        slot = (key & self.mask) << 1
+        if self.keys[slot] == key and self.depths[slot] >= 0:
+            return slot
+        slot += 1
+        if self.keys[slot] == key and self.depths[slot] >= 0:
+            return slot
+        return -1
+
+    def lookup(self, key, depth, alpha, beta):
+        """Look up a position before searching it.
+
+        Returns
+        -------
+        (float or None, int or None)
+            The score to return immediately if the stored result was searched
+            at least `depth` plies deep and is conclusive for the window
+            (alpha, beta), and the best move stored for the position.
+        """
+        slot = self.probe(key)
+        if slot < 0:
+            return None, None
+
+        best_move = self.moves[slot]
+        if best_move == self.NO_MOVE:
+            best_move = None
+        if self.depths[slot] >= depth:
+            score = self.scores[slot]
+            bound = self.bounds[slot]
+            if (bound == self.EXACT or
+                    (bound == self.LOWER_BOUND and score >= beta) or
+                    (bound == self.UPPER_BOUND and score <= alpha)):
+                return score, best_move
+        return None, best_move
+
+    def store(self, key, depth, score, alpha, beta, best_move):
+        """Store the result of searching a position `depth` plies deep with
+        the window (alpha, beta).
+        """
+        slot = (key & self.mask) << 1
+        if not (self.keys[slot] == key or depth >= self.depths[slot] or
+                self.ages[slot] != self.age):
+            slot += 1
+
+        if score <= alpha:
+            bound = self.UPPER_BOUND
+        elif score >= beta:
+            bound = self.LOWER_BOUND
+        else:
+            bound = self.EXACT
+
+        self.keys[slot] = key
+        self.scores[slot] = score
+        self.depths[slot] = min(depth, 127)
+        self.bounds[slot] = bound
+        self.ages[slot] = self.age
+        self.moves[slot] = self.NO_MOVE if best_move is None else best_move
+
+
+def move_to_front(moves, move):
+    """Reorder a list of moves in place so that `move` is searched first, if
+    it is in the list.
+    """
+    if move is not None and move in moves:
+        moves.remove(move)
+        moves.insert(0, move)
+
+
+class Deadline:
+    """The clock of a search (a `time_left` function, see get_move()), read
+    only every few nodes.
+
+    `check()` is called every `interval` nodes; the interval is adapted to the
+    node rate measured on the clock itself, so that the clock is read at
+    least every CHECK_INTERVAL_MS milliseconds and at least twice in the time
+    left before the `threshold`: the search is aborted about one node after
+    the time left falls under the threshold. The interval is kept while the
+    clock does not advance (e.g., a fixed clock).
+    """
+    def __init__(self, time_left, threshold):
+        self.time_left = time_left
+        self.threshold = threshold
+        self.interval = 1
+        self.last_time_left = None
+
+    def check(self):
+        """Raise SearchTimeout if the time left is under the threshold, and
+        return the number of nodes to search before the next check.
+        """
+        time_left = self.time_left()
+        slack = time_left - self.threshold
+        if slack < 0:
+            raise SearchTimeout()
+        last_time_left, self.last_time_left = self.last_time_left, time_left
+        if last_time_left is not None and last_time_left > time_left:
+            nodes_per_ms = self.interval / (last_time_left - time_left)
+            interval = int(nodes_per_ms * min(CHECK_INTERVAL_MS, slack / 2))
+            self.interval = max(1, min(interval, MAX_CHECK_NODES))
+        return self.interval
+
+
+_timer_threshold = None
+
+
+def calibrated_timer_threshold():
+    """Return the default `TIMER_THRESHOLD` of the players (in milliseconds),
+    calibrated on this host the first time it is called.
+
+    The calibration measures the worst time an `AlphaBetaPlayer` takes from
+    the clock check that aborts its search to the return of get_move() (the
+    exception unwinding through the search and the bookkeeping of the move),
+    the longest pause of the clock in CALIBRATION_MS milliseconds (i.e., the
+    scheduling delays of the host) and the time of a full garbage collection,
+    which may pause a search at any node; the threshold is their sum times
+    TIMER_SAFETY_FACTOR, and at least MIN_TIMER_THRESHOLD.
+    """
+    global _timer_threshold
+    if _timer_threshold is None:
+        overhead = max(measure_abort_ms(nodes) for nodes in CALIBRATION_NODES)
+        overhead += measure_clock_pause_ms(CALIBRATION_MS)
+        overhead += measure_gc_ms()
+        _timer_threshold = max(MIN_TIMER_THRESHOLD, TIMER_SAFETY_FACTOR * overhead)
+    return _timer_threshold
+
+
+def measure_abort_ms(nodes):
+    """Return the time (in milliseconds) from the clock check that aborts a
+    search of an opening position after `nodes` nodes to the return of
+    get_move().
+    """
+    player = AlphaBetaPlayer(timeout=0., tt_bytes=2**16)
+    game = Board(player, "opponent")
+    game.apply_move((2, 3))
+    game.apply_move((0, 5))
+    expired = []
+
+    def time_left():
+        if not expired and player.nodes >= nodes:
+            expired.append(time.perf_counter())
+        return -1. if expired else 1e9
+
+    player.get_move(game, time_left)
+    return 1000. * (time.perf_counter() - expired[0])
+
+
+def measure_clock_pause_ms(duration_ms):
+    """Read the clock in a loop for `duration_ms` milliseconds and return the
+    longest time (in milliseconds) between two consecutive reads.
+    """
+    last = time.perf_counter()
+    end = last + duration_ms / 1000.
+    pause = 0.
+    while last < end:
+        now = time.perf_counter()
+        pause = max(pause, now - last)
+        last = now
+    return 1000. * pause
+
+
+def measure_gc_ms():
+    """Return the time (in milliseconds) of a full garbage collection. """
+    start = time.perf_counter()
+    gc.collect()
+    return 1000. * (time.perf_counter() - start)
+
+
+class SearchStats:
+    """Search statistics of a player, collected for every call to get_move()
+    when the player is constructed with `collect_stats=True`.
+
+    Each entry of `moves` is a dict with the number of `nodes` visited,
+    `leaves` evaluated and beta `cutoffs`, the `depth` of the last completed
+    iteration, the duration of every completed iteration in `iteration_ms`,
+    the duration of the whole search in `search_ms` (including an aborted
+    last iteration), the `time_left` (ms) when the move was returned, and the
+    effective branching factor `ebf` (node ratio of the last two iterations,
+    or None).
+    """
+    def __init__(self):
+        self.moves = []
+
+    def summary(self):
+        """Aggregate the statistics of all recorded moves into a dict with the
+        totals of nodes, leaves, cutoffs and search time (ms), the search
+        speed in nodes per second, and the mean depth and branching factor.
+        """
+        nodes = sum(move["nodes"] for move in self.moves)
+        search_ms = sum(move["search_ms"] for move in self.moves)
+        depths = [move["depth"] for move in self.moves]
+        ebfs = [move["ebf"] for move in self.moves if move["ebf"] is not None]
+        return {
+            "moves": len(self.moves),
+            "nodes": nodes,
+            "leaves": sum(move["leaves"] for move in self.moves),
+            "cutoffs": sum(move["cutoffs"] for move in self.moves),
+            "search_ms": search_ms,
+            "nps": 1000. * nodes / search_ms if search_ms > 0 else 0.,
+            "depth": sum(depths) / len(depths) if depths else 0.,
+            "ebf": sum(ebfs) / len(ebfs) if ebfs else None,
+        }
+
+
 class IsolationPlayer:
     """Base class for minimax and alphabeta agents -- this class is never
     constructed or tested directly.
@@ -137,20 +440,80 @@ class IsolationPlayer:
     timeout : float (optional)
         Time remaining (in milliseconds) when search is aborted. Should be a
         positive value large enough to allow the function to return before the
-        timer expires.
+        timer expires; by default, the threshold calibrated on this host (see
+        `calibrated_timer_threshold()`).
+
+    collect_stats : bool (optional)
+        Record the `SearchStats` of every move in `self.stats`. The node,
+        leaf and cutoff counters of the current search are always kept.
     """      
-    def __init__(self, search_depth=3, score_fn=custom_score, timeout=11.):
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=None,
+                 collect_stats=False):
         self.search_depth = search_depth
         self.score = score_fn
         self.time_left = None
+        if timeout is None:
+            timeout = calibrated_timer_threshold()
         self.TIMER_THRESHOLD = timeout
+        self.stats = SearchStats() if collect_stats else None
+        self.nodes = 0
+        self.leaves = 0
+        self.cutoffs = 0
+        self._iterations = []
+        self._deadline = None
+        self._countdown = 0
 
     def check_timing(self):
         """ To avoid code duplication the time checking should be done in a consistent way
         in the base class so that all derived algorithms can use the same functions.
+
+        The clock is read by the `Deadline` of the current `time_left` every
+        few nodes only.
         """
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise SearchTimeout()
+        self.nodes += 1
+        self._countdown -= 1
+        if self._countdown <= 0:
+            deadline = self._deadline
+            if deadline is None or deadline.time_left is not self.time_left:
+                deadline = self._deadline = Deadline(self.time_left, self.TIMER_THRESHOLD)
+            self._countdown = deadline.check()
+
+    def start_stats(self):
+        """Reset the search counters at the start of get_move(). """
+        self._countdown = 0
+        self.nodes = 0
+        self.leaves = 0
+        self.cutoffs = 0
+        if self.stats is not None:
+            self._iterations = [(0, 0, self.time_left())]
+
+    def record_iteration(self, depth):
+        """Record that the search to `depth` plies has completed. """
+        if self.stats is not None:
+            self._iterations.append((depth, self.nodes, self.time_left()))
+
+    def finish_stats(self):
+        """Store the statistics of the current move in `self.stats`. """
+        if self.stats is None:
+            return
+        iterations = self._iterations
+        iteration_nodes = [iterations[i][1] - iterations[i - 1][1]
+                           for i in range(1, len(iterations))]
+        ebf = None
+        if len(iteration_nodes) >= 2 and iteration_nodes[-2] > 0:
+            ebf = iteration_nodes[-1] / iteration_nodes[-2]
+        time_left = self.time_left()
+        self.stats.moves.append({
+            "nodes": self.nodes,
+            "leaves": self.leaves,
+            "cutoffs": self.cutoffs,
+            "depth": iterations[-1][0],
+            "iteration_ms": [iterations[i - 1][2] - iterations[i][2]
+                             for i in range(1, len(iterations))],
+            "search_ms": iterations[0][2] - time_left,
+            "time_left": time_left,
+            "ebf": ebf,
+        })
 
 
 class MinimaxPlayer(IsolationPlayer):
@@ -193,15 +556,19 @@ class MinimaxPlayer(IsolationPlayer):
         # in case the search fails due to timeout
         best_move = (-1, -1)
 
+        self.start_stats()
+
         try:
             # The try/except block will automatically catch the exception
             # raised when the timer is about to expire.
-            return self.minimax(game, self.search_depth)
+            best_move = self.minimax(game, self.search_depth)
+            self.record_iteration(self.search_depth)
 
         except SearchTimeout:
             pass  # Handle any actions required after timeout as needed
 
         # Return the best move from the last completed search iteration
+        self.finish_stats()
         return best_move
    
     def min_value(self, game, current_depth):
@@ -210,12 +577,16 @@ class MinimaxPlayer(IsolationPlayer):
         legal_moves = game.get_legal_moves()
 
         if (current_depth <= 0) or (not legal_moves):
+            self.leaves += 1
             return self.score(game, self)
         
         min_score = math.inf
         for move in legal_moves:
-            result_game = game.forecast_move(move)
-            current_score = self.max_value(result_game, current_depth - 1)
+            game.push(move)
+            try:
+                current_score = self.max_value(game, current_depth - 1)
+            finally:
+                game.pop()
             if current_score < min_score:
                 min_score = current_score
 
@@ -227,12 +598,16 @@ class MinimaxPlayer(IsolationPlayer):
         legal_moves = game.get_legal_moves()
 
         if (current_depth <= 0) or (not legal_moves):
+            self.leaves += 1
             return self.score(game, self)
         
         max_score = -math.inf
         for move in legal_moves:
-            result_game = game.forecast_move(move)
-            current_score = self.min_value(result_game, current_depth - 1)
+            game.push(move)
+            try:
+                current_score = self.min_value(game, current_depth - 1)
+            finally:
+                game.pop()
             if current_score > max_score:
                 max_score = current_score
 
@@ -284,8 +659,11 @@ class MinimaxPlayer(IsolationPlayer):
         max_move = legal_moves[0]
         max_score = -math.inf  
         for move in legal_moves:
-            result_game = game.forecast_move(move)
-            current_score = self.min_value(result_game, depth - 1)
+            game.push(move)
+            try:
+                current_score = self.min_value(game, depth - 1)
+            finally:
+                game.pop()
             if current_score > max_score:
                 max_move = move
                 max_score = current_score
@@ -297,7 +675,253 @@ class AlphaBetaPlayer(IsolationPlayer):
     """Game-playing agent that chooses a move using iterative deepening minimax
     search with alpha-beta pruning. You must finish and test this player to
     make sure it returns a good move before the search time limit expires.
+
+    Parameters
+    ----------
+    search_depth : int (optional)
+        See `IsolationPlayer`.
+
+    score_fn : callable (optional)
+        See `IsolationPlayer`.
+
+    timeout : float (optional)
+        See `IsolationPlayer`.
+
+    tt_bytes : int (optional)
+        Memory ceiling (in bytes) of the transposition table, which is kept
+        between moves; 0 disables the table.
+
+    move_ordering : bool (optional)
+        Search the principal variation of the previous iteration first,
+        followed by the transposition table move, the killer moves of the
+        ply and the remaining moves by history score. The random shuffle of
+        the board's move generator is switched off during the search.
+
+    collect_stats : bool (optional)
+        See `IsolationPlayer`.
+
+    endgame_cells : int (optional)
+        Solve positions in which the players have been separated exactly (see
+        `endgame.EndgameSolver`) if neither region has more blank cells than
+        this; 0 disables the endgame solver.
+
+    tablebase : tablebase.Tablebase (optional)
+        An endgame tablebase looked up in positions with a small reachable
+        region (see `build_tablebase.py`); it may be shared by several
+        players.
+
+    workers : int (optional)
+        Number of processes searching every move (lazy SMP): `workers` - 1
+        helper processes run the same iterative deepening search, staggered
+        by one ply, and share the transposition table (in shared memory) with
+        this player. The move of the deepest iteration completed by any of
+        them is played. Requires a transposition table; call `close()` to
+        stop the helper processes.
+
+    pvs : bool (optional)
+        Principal variation search: search all moves but the first one of a
+        node with a null window first, and again with the full window only
+        if they turn out to be better.
+
+    aspiration_window : float (optional)
+        Search every iteration with the window (score - aspiration_window,
+        score + aspiration_window) around the score of the previous one, and
+        again with an open bound if the score falls outside; 0 searches with
+        the full window.
+
+    pondering : bool (optional)
+        Search on the opponent's time: after every move, the position after
+        the predicted reply of the opponent (the best reply stored in the
+        transposition table) is searched by the helper processes (at least
+        one) until `end_ponder()` is called. If the opponent plays the
+        predicted reply, the search goes on as the helper search of the next
+        move, otherwise it is stopped; either way its results stay in the
+        shared transposition table. `Board.play` calls the hooks; requires a
+        transposition table; call `close()` to stop the helper processes.
+
+    stack_search : bool (optional)
+        Search with the non-recursive `stack_search.StackSearch` engine
+        instead of min_value()/max_value(): the same move and score, without
+        a Python call per node.
     """
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=None,
+                 tt_bytes=TT_DEFAULT_BYTES, move_ordering=True, collect_stats=False,
+                 endgame_cells=ENDGAME_MAX_CELLS, tablebase=None, workers=1,
+                 pvs=True, aspiration_window=ASPIRATION_WINDOW, pondering=False,
+                 stack_search=False):
+        super().__init__(search_depth, score_fn, timeout, collect_stats)
+        helpers = max(workers - 1, int(pondering))
+        if helpers and not tt_bytes:
+            raise ValueError("parallel search and pondering require a transposition table")
+        self.tt = TranspositionTable(tt_bytes, shared=helpers > 0) if tt_bytes else None
+        self.endgame = EndgameSolver(endgame_cells, self.check_timing) if endgame_cells else None
+        self.tablebase = tablebase
+        self.move_ordering = move_ordering
+        self.history = {}
+        self.reset_move_ordering(7 * 7)
+
+        self.pvs = pvs
+        self.aspiration_window = aspiration_window
+        self.root_score = None
+        self.stack = StackSearch(self, MIN_NODE_KEY) if stack_search else None
+
+        self.workers = workers
+        self.pondering = pondering
+        self._helpers = helpers
+        self._helper_args = (score_fn, self.TIMER_THRESHOLD, tt_bytes, move_ordering,
+                             endgame_cells, stack_search)
+        self._executor = None
+        self._search_id = 0
+        # Current search id, and (search id, depth, move index) per helper
+        self._control = RawArray('i', 1) if helpers else None
+        self._results = RawArray('i', 3 * helpers) if helpers else None
+        # Zobrist key of the position of the running ponder search, and
+        # whether the opponent played the predicted reply
+        self._ponder_key = None
+        self._ponder_hit = False
+
+    def start_helpers(self, game, deadline=None):
+        """Start searching the current position of `game` in the helper
+        processes, which stop at the `deadline` (of `time.monotonic()`,
+        by default the deadline of this player's search) or as soon as
+        `stop_helpers()` is called.
+        """
+        self.start_executor()
+        self._search_id += 1
+        self._control[0] = self._search_id
+        if deadline is None:
+            deadline = time.monotonic() + self.time_left() / 1000.
+        moves = position_moves(game)
+        for slot in range(self._helpers):
+            # Half of the helpers start one ply deeper
+            first_depth = 1 + (slot + 1) % 2
+            self._executor.submit(_helper_search, self._search_id, slot, type(game),
+                                  game.width, game.height, moves, deadline,
+                                  self.tt.age, first_depth)
+
+    def start_executor(self):
+        """Start the helper processes, if they are not running yet. """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                self._helpers, initializer=_init_helper,
+                initargs=(self._helper_args, self.tt.buffers, self._control, self._results))
+            # The processes are started by the first task: start them now
+            self._executor.submit(int)
+
+    def stop_helpers(self, game, best_move, depth):
+        """Stop the helper processes and return the move of the deepest
+        iteration completed by any search of the current position, given the
+        move `best_move` of the `depth` plies deep search of this player.
+        """
+        self._control[0] = 0
+        results = self._results
+        legal_moves = None
+        for slot in range(0, len(results), 3):
+            search_id, helper_depth, code = results[slot:slot + 3]
+            if search_id != self._search_id or helper_depth <= depth:
+                continue
+            if legal_moves is None:
+                legal_moves = game.get_legal_indices()
+            if code in legal_moves:
+                best_move, depth = game.index_to_move(code), helper_depth
+        return best_move
+
+    def close(self):
+        """Shut down the helper processes of a parallel search. """
+        self._ponder_key = None
+        self._ponder_hit = False
+        if self._executor is not None:
+            self._control[0] = 0
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def ponder(self, game):
+        """Start searching the predicted reply of the opponent to move in
+        `game` in the helper processes (if pondering is enabled).
+        """
+        self.end_ponder(None)
+        if not self.pondering:
+            return
+        reply = self.tt.lookup(game.zobrist_key ^ MIN_NODE_KEY, 0, -math.inf, math.inf)[1]
+        if reply not in game.get_legal_indices():
+            return
+        predicted = game.forecast_move(game.index_to_move(reply))
+        if not predicted.get_legal_moves():
+            return
+        self.tt.new_search()
+        self._ponder_key = predicted.zobrist_key
+        self.start_helpers(predicted, time.monotonic() + PONDER_MAX_SECONDS)
+
+    def end_ponder(self, game):
+        """End the ponder search when the opponent has moved to `game` (None
+        if the game is over): it is stopped, unless `game` is the predicted
+        position, which the next get_move() keeps searching.
+        """
+        if self._ponder_key is None:
+            return
+        if game is not None and game.zobrist_key == self._ponder_key:
+            self._ponder_hit = True
+        else:
+            self._control[0] = 0
+            self._ponder_hit = False
+        self._ponder_key = None
+
+    def reset_move_ordering(self, num_cells):
+        """Clear the killer moves and principal variation and make room for
+        a game of `num_cells` plies. All tables are indexed by the move count
+        of the board (i.e., the absolute ply of a node).
+        """
+        size = num_cells + 2
+        self.killers = [[None, None] for _ in range(size)]
+        self.pv_table = [[None] * size for _ in range(size)]
+        self.pv_length = [0] * size
+        self.pv_line = []
+        self.follow_pv = False
+
+    def order_moves(self, legal_moves, ply, tt_move, on_pv):
+        """Sort the moves of a node in place for the search.
+
+        The transposition table move is always searched first; with
+        `move_ordering` enabled the previous principal variation (if the node
+        is on it), killers and history scores are used as well. Sets
+        `follow_pv` if the first move continues the principal variation.
+        """
+        if self.move_ordering:
+            side = ply & 1
+            history = self.history
+            if history:
+                legal_moves.sort(key=lambda move: history.get((side, move), 0), reverse=True)
+            killers = self.killers[ply]
+            move_to_front(legal_moves, killers[1])
+            move_to_front(legal_moves, killers[0])
+        move_to_front(legal_moves, tt_move)
+
+        # Keep following the previous principal variation as long as the
+        # search is on it (its moves are always searched first)
+        if self.move_ordering and on_pv:
+            if ply < len(self.pv_line) and self.pv_line[ply] in legal_moves:
+                move_to_front(legal_moves, self.pv_line[ply])
+                self.follow_pv = True
+
+    def update_pv(self, ply, move):
+        """Record `move` followed by the principal variation of its child as
+        the principal variation of the node at `ply`.
+        """
+        child_length = self.pv_length[ply + 1]
+        line = self.pv_table[ply]
+        line[ply] = move
+        line[ply + 1:child_length] = self.pv_table[ply + 1][ply + 1:child_length]
+        self.pv_length[ply] = max(child_length, ply + 1)
+
+    def update_cutoff(self, ply, move, depth):
+        """Remember a move that caused a cutoff as killer and in the history. """
+        self.cutoffs += 1
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        key = (ply & 1, move)
+        self.history[key] = self.history.get(key, 0) + depth * depth
 
     def get_move(self, game, time_left):
         """Search for the best move from the available legal moves and return a
@@ -330,72 +954,248 @@ class AlphaBetaPlayer(IsolationPlayer):
             (-1, -1) if there are no available legal moves.
         """
         self.time_left = time_left
+        self.end_ponder(game)
+        ponder_hit, self._ponder_hit = self._ponder_hit, False
+        if self.tt is not None and not ponder_hit:
+            self.tt.new_search()
+        self.start_stats()
+        self.reset_move_ordering(game.width * game.height)
+        self.history = {key: value // 2 for key, value in self.history.items()}
+        shuffle_moves = game.shuffle_moves
+        if self.move_ordering:
+            game.shuffle_moves = False
 
         best_move = (-1, -1)
         if best_move != (-1,-1):
             return best_move
-                  
+
+        completed_depth = 0
         try:
+            # Play separated endgames along the longest path of the region
+            if self.endgame is not None:
+                legal_moves = game.get_legal_moves()
+                if legal_moves:
+                    best_move = legal_moves[0]
+                endgame_move = self.endgame.best_move(game)
+                if endgame_move is not None:
+                    return endgame_move
+
+            # A ponder search of this position goes on as the helper search
+            if self.workers > 1 and not ponder_hit:
+                self.start_helpers(game)
+            elif self.pondering:
+                # Start the helper processes within the time of the search,
+                # not in the first call to ponder() after it
+                self.start_executor()
+
             iterative_depth = 1
             max_depth = 25
     
             # The try/except block will automatically catch the exception
             # raised when the timer is about to expire.
+            # After as many plies as there are blank cells every line of
+            # play has reached the end of the game
+            blank_cells = game.width * game.height - game.move_count
+            score = None
+            previous_nodes = 0
             while iterative_depth <= max_depth:
-                best_move = self.alphabeta(game, iterative_depth, float("-inf"), float("inf"))
+                start_nodes, start_time = self.nodes, self.time_left()
+                best_move, score = self.aspiration_search(game, iterative_depth, score)
+                completed_depth = iterative_depth
+                self.record_iteration(iterative_depth)
+
+                # Stop when the result is proven or the tree is exhausted,
+                # or when the next iteration is not expected to finish
+                if math.isinf(score) or iterative_depth >= blank_cells:
+                    break
+                nodes = self.nodes - start_nodes
+                if not self.iteration_fits(start_time - self.time_left(), nodes, previous_nodes):
+                    break
+                previous_nodes = nodes
                 iterative_depth += 1
 
         except SearchTimeout:
-            return best_move
+            pass
+
+        finally:
+            game.shuffle_moves = shuffle_moves
+            if self.workers > 1 or ponder_hit:
+                best_move = self.stop_helpers(game, best_move, completed_depth)
+            self.finish_stats()
 
         return best_move
 
+    def iteration_fits(self, elapsed_ms, nodes, previous_nodes):
+        """Predict whether the next iteration of iterative deepening can
+        finish in the time left, assuming that it grows by the same factor
+        as the last iteration (`nodes`, in `elapsed_ms`) did over the one
+        before it (`previous_nodes`).
+        """
+        if previous_nodes <= 0:
+            return True
+        expected_ms = elapsed_ms * nodes / previous_nodes
+        return expected_ms < self.time_left() - self.TIMER_THRESHOLD
+
+    def aspiration_search(self, game, depth, score):
+        """Search `depth` plies deep within the aspiration window around the
+        `score` of the previous iteration (None for the full window) and
+        return the best move and its score.
+        """
+        alpha, beta = -math.inf, math.inf
+        if self.aspiration_window and score is not None and math.isfinite(score):
+            alpha = score - self.aspiration_window
+            beta = score + self.aspiration_window
+        while True:
+            move = self.alphabeta(game, depth, alpha, beta)
+            score = self.root_score
+            if score <= alpha and alpha > -math.inf:
+                alpha = -math.inf
+            elif score >= beta and beta < math.inf:
+                beta = math.inf
+            else:
+                return move, score
+
     def min_value(self, game, current_depth, alpha, beta):
         self.check_timing()
-
-        legal_moves = game.get_legal_moves()
+        ply = game.move_count
+        self.pv_length[ply] = ply
+        # Only the first child of a node on the principal variation is on it
+        on_pv = self.follow_pv
+        self.follow_pv = False
+
+        # Horizon nodes need no move list: the score covers finished games
+        legal_moves = game.get_legal_indices() if current_depth > 0 else None
+
+        # Small endgames are looked up, even at the horizon
+        if legal_moves != [] and self.tablebase is not None:
+            exact_score = self.tablebase.score(game, self)
+            if exact_score is not None:
+                self.leaves += 1
+                return exact_score
 
         if (current_depth <= 0) or (not legal_moves):
+            self.leaves += 1
             return self.score(game, self)
 
-        if game.utility(self) != 0.0:
-            return game.utility(self)
-        
+        # Separated endgames are solved exactly (only above the horizon,
+        # where an exact score saves a whole subtree)
+        if self.endgame is not None:
+            exact_score = self.endgame.solve(game, self)
+            if exact_score is not None:
+                self.leaves += 1
+                return exact_score
+
+        # The active player has legal moves, so the game is not over here
+        # (see Board.utility) and the node needs no terminal check
+        key = game.zobrist_key ^ MIN_NODE_KEY
+        tt_move = None
+        if self.tt is not None:
+            tt_score, tt_move = self.tt.lookup(key, current_depth, alpha, beta)
+            if tt_score is not None:
+                return tt_score
+        self.order_moves(legal_moves, ply, tt_move, on_pv)
+
         min_score = math.inf
+        min_move = None
         current_beta = beta
-        for move in legal_moves:
-            result_game = game.forecast_move(move)
-            current_score = self.max_value(result_game, current_depth - 1, alpha, current_beta)
+        for move_idx, move in enumerate(legal_moves):
+            game.push_index(move)
+            try:
+                if move_idx == 0 or not self.pvs:
+                    current_score = self.max_value(game, current_depth - 1, alpha, current_beta)
+                else:
+                    # Null window: prove that the move is not better than
+                    # the best one so far, and search it again otherwise
+                    current_score = self.max_value(game, current_depth - 1,
+                                                   math.nextafter(current_beta, -math.inf),
+                                                   current_beta)
+                    if alpha < current_score < current_beta:
+                        current_score = self.max_value(game, current_depth - 1, alpha, current_beta)
+            finally:
+                game.pop()
             if current_score < min_score:
                 min_score = current_score
+                min_move = move
+                if min_score < current_beta:
+                    self.update_pv(ply, move)
             if min_score <= alpha:
-                return min_score
+                self.update_cutoff(ply, move, current_depth)
+                break
             current_beta = min(current_beta, min_score)
 
+        if self.tt is not None:
+            self.tt.store(key, current_depth, min_score, alpha, beta, min_move)
         return min_score
       
     def max_value(self, game, current_depth, alpha, beta):
         self.check_timing()
-
-        legal_moves = game.get_legal_moves()
+        ply = game.move_count
+        self.pv_length[ply] = ply
+        # Only the first child of a node on the principal variation is on it
+        on_pv = self.follow_pv
+        self.follow_pv = False
+
+        # Horizon nodes need no move list: the score covers finished games
+        legal_moves = game.get_legal_indices() if current_depth > 0 else None
+
+        # Small endgames are looked up, even at the horizon
+        if legal_moves != [] and self.tablebase is not None:
+            exact_score = self.tablebase.score(game, self)
+            if exact_score is not None:
+                self.leaves += 1
+                return exact_score
 
         if (current_depth <= 0) or (not legal_moves):
+            self.leaves += 1
             return self.score(game, self)
 
-        if game.utility(self) != 0.0:
-            return game.utility(self)
-        
+        # Separated endgames are solved exactly (only above the horizon,
+        # where an exact score saves a whole subtree)
+        if self.endgame is not None:
+            exact_score = self.endgame.solve(game, self)
+            if exact_score is not None:
+                self.leaves += 1
+                return exact_score
+
+        # The active player has legal moves, so the game is not over here
+        # (see Board.utility) and the node needs no terminal check
+        key = game.zobrist_key
+        tt_move = None
+        if self.tt is not None:
+            tt_score, tt_move = self.tt.lookup(key, current_depth, alpha, beta)
+            if tt_score is not None:
+                return tt_score
+        self.order_moves(legal_moves, ply, tt_move, on_pv)
+
         max_score = -math.inf
+        max_move = None
         current_alpha = alpha
-        for move in legal_moves:
-            result_game = game.forecast_move(move)
-            current_score = self.min_value(result_game, current_depth - 1, current_alpha, beta)
+        for move_idx, move in enumerate(legal_moves):
+            game.push_index(move)
+            try:
+                if move_idx == 0 or not self.pvs:
+                    current_score = self.min_value(game, current_depth - 1, current_alpha, beta)
+                else:
+                    # Null window: prove that the move is not better than
+                    # the best one so far, and search it again otherwise
+                    current_score = self.min_value(game, current_depth - 1, current_alpha,
+                                                   math.nextafter(current_alpha, math.inf))
+                    if current_alpha < current_score < beta:
+                        current_score = self.min_value(game, current_depth - 1, current_alpha, beta)
+            finally:
+                game.pop()
             if current_score > max_score:
                 max_score = current_score
+                max_move = move
+                if max_score > current_alpha:
+                    self.update_pv(ply, move)
             if max_score >= beta:
-                return max_score
+                self.update_cutoff(ply, move, current_depth)
+                break
             current_alpha = max(current_alpha, max_score)
 
+        if self.tt is not None:
+            self.tt.store(key, current_depth, max_score, alpha, beta, max_move)
         return max_score
 
     def alphabeta(self, game, depth, alpha=float("-inf"), beta=float("inf")):
@@ -443,28 +1243,346 @@ class AlphaBetaPlayer(IsolationPlayer):
                 each helper function or else your agent will timeout during
                 testing.
         """
+        if self.stack is not None:
+            move = self.stack.search(game, depth, alpha, beta)
+            self.root_score = self.stack.root_score
+            return move
+
         self.check_timing()
 
-        legal_moves = game.get_legal_moves()
+        # The search works on move indices (see Board.get_legal_indices)
+        legal_moves = game.get_legal_indices()
         if not legal_moves:
+            # The player has lost
+            self.root_score = -math.inf
             return (-1, -1)
           
         if depth < 1:
-            return legal_moves[0]
+            return game.index_to_move(legal_moves[0])
+
+        # Search the principal variation of the previous iteration (or the
+        # best move of the previous turn) first
+        ply = game.move_count
+        tt_move = None
+        if self.tt is not None:
+            tt_move = self.tt.lookup(game.zobrist_key, depth, alpha, beta)[1]
+        self.pv_line = self.pv_table[ply][:self.pv_length[ply]]
+        self.follow_pv = False
+        self.order_moves(legal_moves, ply, tt_move, True)
+        self.pv_length[ply] = ply
        
         # As we have legal moves and might timeout anytime, it is better to select
         # an arbitrary first move than an invalid move.
         max_move = legal_moves[0]
         max_score = -math.inf  
         current_alpha = alpha
-        for move in legal_moves:
-            result_game = game.forecast_move(move)
-            current_score = self.min_value(result_game, depth - 1, current_alpha, beta)
+        for move_idx, move in enumerate(legal_moves):
+            game.push_index(move)
+            try:
+                if move_idx == 0 or not self.pvs:
+                    current_score = self.min_value(game, depth - 1, current_alpha, beta)
+                else:
+                    current_score = self.min_value(game, depth - 1, current_alpha,
+                                                   math.nextafter(current_alpha, math.inf))
+                    if current_alpha < current_score < beta:
+                        current_score = self.min_value(game, depth - 1, current_alpha, beta)
+            finally:
+                game.pop()
             if current_score > max_score:
                 max_move = move
                 max_score = current_score
+                self.update_pv(ply, move)
             if max_score >= beta:
                 break
             current_alpha = max(current_alpha, max_score)
-        
-        return max_move
+
+        if self.tt is not None:
+            self.tt.store(game.zobrist_key, depth, max_score, alpha, beta, max_move)
+        self.root_score = max_score
+        return game.index_to_move(max_move)
+
+
+def position_moves(game):
+    """Return a sequence of moves that leads from the empty board to the
+    current position of `game`, i.e., to the same blocked cells, player
+    locations and player to move (and hence to the same Zobrist key).
+
+    The order in which the cells were blocked is not known, so the sequence
+    is usually not the actual move history, and it is not a legal game;
+    `apply_move` does not check legality, though.
+    """
+    if game.move_count % 2 == 0:
+        players = [game.active_player, game.inactive_player]
+    else:
+        players = [game.inactive_player, game.active_player]
+    locations = [game.get_player_location(player) for player in players]
+    blanks = set(game.get_blank_spaces())
+    blocked = [(i, j) for j in range(game.width) for i in range(game.height)
+               if (i, j) not in blanks and (i, j) not in locations]
+
+    # Player 1 made the first, third, ... move and ends on its location
+    paths = []
+    for player_idx, location in enumerate(locations):
+        num_moves = (game.move_count + 1 - player_idx) // 2
+        if num_moves:
+            paths.append(blocked[:num_moves - 1] + [location])
+            blocked = blocked[num_moves - 1:]
+        else:
+            paths.append([])
+    moves = []
+    for ply in range(game.move_count):
+        moves.append(paths[ply % 2][ply // 2])
+    return moves
+
+
+# The search player, shared transposition table and control arrays of a lazy
+# SMP helper process, see _init_helper()
+_helper = None
+
+
+def _init_helper(helper_args, buffers, control, results):
+    """Create the search player of a helper process of a parallel
+    `AlphaBetaPlayer` on the shared transposition table.
+    """
+    global _helper
+    score_fn, timeout, tt_bytes, move_ordering, endgame_cells, stack_search = helper_args
+    player = AlphaBetaPlayer(score_fn=score_fn, timeout=timeout, tt_bytes=0,
+                             move_ordering=move_ordering, endgame_cells=endgame_cells,
+                             stack_search=stack_search)
+    player.tt = TranspositionTable(tt_bytes, buffers=buffers)
+    _helper = (player, control, results)
+
+
+def _helper_search(search_id, slot, board_class, width, height, moves, deadline,
+                   age, first_depth):
+    """Search the position reached by `moves` by iterative deepening from
+    `first_depth` plies and publish every completed iteration in the result
+    slot of the helper, until the `deadline` (of `time.monotonic()`) or until
+    the main process starts another search or stops this one.
+    """
+    player, control, results = _helper
+    if control[0] != search_id:
+        return
+    players = [player, "opponent"] if len(moves) % 2 == 0 else ["opponent", player]
+    game = board_class(players[0], players[1], width, height)
+    for move in moves:
+        game.apply_move(move)
+
+    def time_left():
+        if control[0] != search_id:
+            return -math.inf
+        return 1000. * (deadline - time.monotonic())
+
+    player.time_left = time_left
+    player.tt.age = age
+    player.start_stats()
+    player.reset_move_ordering(width * height)
+    game.shuffle_moves = not player.move_ordering
+    try:
+        for depth in range(first_depth, 26):
+            move = player.alphabeta(game, depth)
+            if control[0] != search_id:
+                break
+            results[3 * slot:3 * slot + 3] = [search_id, depth, game.move_to_index(move)]
+    except SearchTimeout:
+        pass
+
+
+class MCTSNode:
+    """A node of the search tree of `MCTSPlayer`.
+
+    `wins` counts the playouts through this node won by the player who made
+    `move`, i.e., the player waiting in the position of the node. `untried`
+    holds the legal moves of the position that have no child yet.
+    """
+    __slots__ = ("move", "key", "untried", "children", "wins", "visits")
+
+    def __init__(self, move, key, untried):
+        self.move = move
+        self.key = key
+        self.untried = untried
+        self.children = []
+        self.wins = 0
+        self.visits = 0
+
+
+class MCTSPlayer(IsolationPlayer):
+    """Game-playing agent that chooses a move using Monte Carlo tree search
+    with UCT selection and uniformly random playouts.
+
+    The search tree is kept between moves: the subtree of the position after
+    the opponent's reply becomes the root of the next search. Moves and
+    playouts are applied in place with `push`/`pop`, so no board is copied.
+
+    Parameters
+    ----------
+    timeout : float (optional)
+        See `IsolationPlayer`.
+
+    exploration : float (optional)
+        The exploration constant of the UCT formula.
+
+    reuse_tree : bool (optional)
+        Keep the search tree between moves.
+
+    collect_stats : bool (optional)
+        See `IsolationPlayer`; the nodes and leaves of a search both count its
+        playouts and the depth is the depth of the deepest tree node.
+
+    seed : int (optional)
+        Seed of the random number generator of the playouts.
+    """
+    def __init__(self, timeout=None, exploration=UCT_EXPLORATION, reuse_tree=True,
+                 collect_stats=False, seed=None):
+        super().__init__(timeout=timeout, collect_stats=collect_stats)
+        self.exploration = exploration
+        self.reuse_tree = reuse_tree
+        self.rng = random.Random(seed)
+        self.root = None
+        self.max_depth = 0
+        # The root of the last search, kept until the next search so that
+        # the discarded parts of the tree are not freed on return
+        self._previous_root = None
+
+    def get_move(self, game, time_left):
+        """Search for the best move until the time limit is about to expire
+        and return the most visited move of the root.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            An instance of `isolation.Board` encoding the current state of the
+            game (e.g., player locations and blocked cells).
+
+        time_left : callable
+            A function that returns the number of milliseconds left in the
+            current turn. Returning with any less than 0 ms remaining forfeits
+            the game.
+
+        Returns
+        -------
+        (int, int)
+            Board coordinates corresponding to a legal move; may return
+            (-1, -1) if there are no available legal moves.
+        """
+        self.time_left = time_left
+        self.start_stats()
+        # The moves of the tree (the root included) are not shuffled by the
+        # board: the seeded generator of the player makes the choices
+        shuffle_moves = game.shuffle_moves
+        game.shuffle_moves = False
+        try:
+            root = self.find_root(game)
+            # Free the rest of the previous tree on the clock of this search
+            self.root = self._previous_root = root
+            # A position without legal moves needs no search
+            while root.untried or root.children:
+                self.check_timing()
+                self.run_iteration(game, root)
+        except SearchTimeout:
+            pass
+        finally:
+            game.shuffle_moves = shuffle_moves
+            self.record_iteration(self.max_depth)
+            self.finish_stats()
+        return self.choose_move(root)
+
+    def mcts(self, game, iterations):
+        """Run `iterations` iterations of the search from a new tree and
+        return the most visited move of the root; (-1, -1) if there are no
+        legal moves.
+        """
+        self.root = None
+        shuffle_moves = game.shuffle_moves
+        game.shuffle_moves = False
+        try:
+            root = self.find_root(game)
+            for _ in range(iterations):
+                self.check_timing()
+                self.run_iteration(game, root)
+        finally:
+            game.shuffle_moves = shuffle_moves
+        return self.choose_move(root)
+
+    def find_root(self, game):
+        """Return the node of the current position of `game` in the tree of
+        the previous move (a new node if there is none) and drop the rest of
+        that tree.
+        """
+        key = game.zobrist_key
+        self.max_depth = 0
+        if self.reuse_tree and self.root is not None:
+            for node in [self.root] + self.root.children:
+                if node.key == key:
+                    return node
+        return MCTSNode(None, key, game.get_legal_moves())
+
+    def choose_move(self, root):
+        """Return the move of the most visited child of `root` and keep that
+        child as the root of the next search.
+        """
+        if not root.children:
+            self.root = None
+            return root.untried[0] if root.untried else (-1, -1)
+        best = max(root.children, key=lambda child: child.visits)
+        self.root = best if self.reuse_tree else None
+        return best.move
+
+    def run_iteration(self, game, root):
+        """Select a leaf of the tree by UCT, expand it, play a random game
+        from it and update the statistics of the path.
+        """
+        node = root
+        path = [root]
+        try:
+            while not node.untried and node.children:
+                node = self.select_child(node)
+                game.push(node.move)
+                path.append(node)
+
+            if node.untried:
+                move = node.untried.pop()
+                game.push(move)
+                child = MCTSNode(move, game.zobrist_key, game.get_legal_moves())
+                node.children.append(child)
+                node = child
+                path.append(node)
+
+            # The player waiting in the position of the leaf wins if the
+            # playout ends with the player to move in that position stuck
+            mover_wins = self.playout(game) % 2 == 0
+        finally:
+            for _ in range(len(path) - 1):
+                game.pop()
+
+        self.leaves += 1
+        self.max_depth = max(self.max_depth, len(path) - 1)
+        for node in reversed(path):
+            node.visits += 1
+            if mover_wins:
+                node.wins += 1
+            mover_wins = not mover_wins
+
+    def select_child(self, node):
+        """Return the child of `node` with the largest UCT value. """
+        log_visits = math.log(node.visits)
+        exploration = self.exploration
+        return max(node.children, key=lambda child: (
+            child.wins / child.visits + exploration * math.sqrt(log_visits / child.visits)))
+
+    def playout(self, game):
+        """Play uniformly random moves until the player to move is stuck and
+        return the number of moves played; the board is restored afterwards.
+        """
+        choice = self.rng.choice
+        plies = 0
+        try:
+            legal_moves = game.get_legal_moves()
+            while legal_moves:
+                game.push(choice(legal_moves))
+                plies += 1
+                legal_moves = game.get_legal_moves()
+        finally:
+            for _ in range(plies):
+                game.pop()
+        return plies
@@ -0,0 +1,427 @@
+"""
+This file contains the `BitBoard` class, an alternative engine for the
+`Board` class which keeps the occupancy of the grid in a single Python int
+instead of a list.
+
+Cells are numbered column by column like in `Board` (row + column * stride),
+but every column is followed by two padding bits which never hold a cell.
+Knight moves that run off the top or bottom of a column therefore land on a
+padding bit instead of wrapping into the neighbouring column, so whole sets of
+cells can be moved with plain shifts. Move generation for a single player uses
+the precomputed attack mask of the occupied square.
+"""
+import random
+
+from .isolation import Board, KNIGHT_DIRECTIONS
+
+
+class BitBoard(Board):
+    """Implement the `Board` API on top of integer bitmasks.
+
+    The public interface (and the move ordering contract of
+    `get_legal_moves`) is identical to `Board`, so a `BitBoard` can be passed
+    to any player or used to `play()` a match in place of a `Board`.
+
+    Parameters
+    ----------
+    player_1 : object
+        An object with a get_move() function.
+
+    player_2 : object
+        An object with a get_move() function.
+
+    width : int (optional)
+        The number of columns that the board should have.
+
+    height : int (optional)
+        The number of rows that the board should have.
+
+    seed : int (optional)
+        Seed of the random number generator that shuffles the legal moves of
+        this board and its copies. If None, the global `random` module is used.
+    """
+    # Knight geometry and bit-indexed Zobrist tables per (width, height),
+    # shared by all instances
+    _geometry = {}
+    _zobrist_bit_tables = {}
+
+    def __init__(self, player_1, player_2, width=7, height=7, seed=None):
+        self.width = width
+        self.height = height
+        self.move_count = 0
+        self._player_1 = player_1
+        self._player_2 = player_2
+        self._active_player = player_1
+        self._inactive_player = player_2
+
+        # Random number generator used to shuffle the legal moves; a seeded
+        # board (and all its copies) generates reproducible move orders
+        self._rng = random if seed is None else random.Random(seed)
+
+        (self._stride, self._cells, self._attacks,
+         self._full_mask) = self._get_geometry(width, height)
+
+        self._blocked = 0
+        self._p1_loc = Board.NOT_MOVED
+        self._p2_loc = Board.NOT_MOVED
+        self._undo_stack = []
+
+        (self._zobrist_blocked, self._zobrist_p1, self._zobrist_p2,
+         self._zobrist_side) = self._get_zobrist(width, height)
+        self._zobrist = 0
+
+    @classmethod
+    def _get_geometry(cls, width, height):
+        """Return the (stride, cells, attacks, full_mask) tables for a board
+        size, building them on first use.
+
+        `cells[bit]` is the (row, column) tuple of a bit or None for padding
+        bits, `attacks[bit]` is the mask of all knight destinations of a cell
+        and `full_mask` has one bit set for every cell of the board.
+        """
+        key = (width, height)
+        if key not in cls._geometry:
+            stride = height + 2
+            size = width * stride
+            cells = [None] * size
+            attacks = [0] * size
+            full_mask = 0
+            for c in range(width):
+                for r in range(height):
+                    bit = r + c * stride
+                    cells[bit] = (r, c)
+                    full_mask |= 1 << bit
+                    for dr, dc in KNIGHT_DIRECTIONS:
+                        if 0 <= r + dr < height and 0 <= c + dc < width:
+                            attacks[bit] |= 1 << (r + dr + (c + dc) * stride)
+            cls._geometry[key] = (stride, tuple(cells), tuple(attacks), full_mask)
+        return cls._geometry[key]
+
+    @classmethod
+    def _get_zobrist(cls, width, height):
+        """Return the `Board` Zobrist tables re-indexed by bit, so that a
+        `BitBoard` and a `Board` in the same state have the same key.
+        """
+        key = (width, height)
+        if key not in cls._zobrist_bit_tables:
+            blocked, player_1, player_2, side = super()._get_zobrist(width, height)
+            cells = cls._get_geometry(width, height)[1]
+
+            def by_bit(table):
+                return [table[cell[0] + cell[1] * height] if cell else 0 for cell in cells]
+
+            cls._zobrist_bit_tables[key] = (by_bit(blocked), by_bit(player_1),
+                                            by_bit(player_2), side)
+        return cls._zobrist_bit_tables[key]
+
+    @property
+    def _board_state(self):
+        """A `Board` compatible list view of the current state.
+
+        Only used by the non-critical helpers inherited from `Board` (e.g.,
+        `to_string` and `symmetric_configurations`); it is rebuilt on every
+        access.
+        """
+        state = [Board.BLANK] * (self.width * self.height + 3)
+        blocked = self._blocked
+        stride = self._stride
+        for c in range(self.width):
+            for r in range(self.height):
+                if blocked >> (r + c * stride) & 1:
+                    state[r + c * self.height] = 1
+        state[-3] = int(self._active_player == self._player_2)
+        state[-2] = self._bit_to_idx(self._p2_loc)
+        state[-1] = self._bit_to_idx(self._p1_loc)
+        return state
+
+    def _bit_to_idx(self, bit):
+        if bit == Board.NOT_MOVED:
+            return Board.NOT_MOVED
+        r, c = self._cells[bit]
+        return r + c * self.height
+
+    def copy(self):
+        """ Return a deep copy of the current board. """
+        # Bypass __init__: the shared tables are taken over from this board
+        new_board = object.__new__(BitBoard)
+        new_board.width = self.width
+        new_board.height = self.height
+        new_board.move_count = self.move_count
+        new_board._player_1 = self._player_1
+        new_board._player_2 = self._player_2
+        new_board._active_player = self._active_player
+        new_board._inactive_player = self._inactive_player
+        new_board._stride = self._stride
+        new_board._cells = self._cells
+        new_board._attacks = self._attacks
+        new_board._full_mask = self._full_mask
+        new_board._blocked = self._blocked
+        new_board._p1_loc = self._p1_loc
+        new_board._p2_loc = self._p2_loc
+        new_board._undo_stack = []
+        new_board._zobrist_blocked = self._zobrist_blocked
+        new_board._zobrist_p1 = self._zobrist_p1
+        new_board._zobrist_p2 = self._zobrist_p2
+        new_board._zobrist_side = self._zobrist_side
+        new_board._zobrist = self._zobrist
+        new_board.shuffle_moves = self.shuffle_moves
+        new_board._rng = self._rng
+        return new_board
+
+    def move_is_legal(self, move):
+        """Test whether a move is legal in the current game state.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+
+        Returns
+        -------
+        bool
+            Returns True if the move is legal, False otherwise
+        """
+        return (0 <= move[0] < self.height and 0 <= move[1] < self.width and
+                not self._blocked >> (move[0] + move[1] * self._stride) & 1)
+
+    def get_blank_spaces(self):
+        """Return a list of the locations that are still available on the board.
+        """
+        return self._mask_to_moves(self._full_mask & ~self._blocked)
+
+    def get_player_location(self, player):
+        """Find the current location of the specified player on the board.
+
+        Parameters
+        ----------
+        player : object
+            An object registered as a player in the current game.
+
+        Returns
+        -------
+        (int, int) or None
+            The coordinate pair (row, column) of the input player, or None
+            if the player has not moved.
+        """
+        bit = self.get_location_index(player)
+        if bit == Board.NOT_MOVED:
+            return Board.NOT_MOVED
+        return self._cells[bit]
+
+    def get_location_index(self, player):
+        """Return the move index (the bit) of the location of the specified
+        player, or None if the player has not moved.
+        """
+        if player == self._player_1:
+            return self._p1_loc
+        if player == self._player_2:
+            return self._p2_loc
+        raise RuntimeError(
+            "Invalid player in get_player_location: {}".format(player))
+
+    def get_legal_moves(self, player=None):
+        """Return the list of all legal moves for the specified player.
+
+        Parameters
+        ----------
+        player : object (optional)
+            An object registered as a player in the current game. If None,
+            return the legal moves for the active player on the board.
+
+        Returns
+        -------
+        list<(int, int)>
+            The list of coordinate pairs (row, column) of all legal moves
+            for the player constrained by the current game state.
+        """
+        if player is None:
+            player = self._active_player
+        if player == self._player_1:
+            bit = self._p1_loc
+        elif player == self._player_2:
+            bit = self._p2_loc
+        else:
+            raise RuntimeError(
+                "Invalid player in get_legal_moves: {}".format(player))
+
+        if bit == Board.NOT_MOVED:
+            return self.get_blank_spaces()
+
+        valid_moves = self._mask_to_moves(self._attacks[bit] & ~self._blocked)
+        if self.shuffle_moves:
+            self._rng.shuffle(valid_moves)
+        return valid_moves
+
+    def get_legal_indices(self, player=None):
+        """Return the move indices (bits) of all legal moves of the specified
+        player, in the order of `get_legal_moves`. See `Board.get_legal_indices`.
+        """
+        bit = self._active_location() if player is None else self.get_location_index(player)
+        if bit == Board.NOT_MOVED:
+            mask = self._full_mask & ~self._blocked
+        else:
+            mask = self._attacks[bit] & ~self._blocked
+        moves = []
+        while mask:
+            low = mask & -mask
+            moves.append(low.bit_length() - 1)
+            mask ^= low
+        if self.shuffle_moves:
+            self._rng.shuffle(moves)
+        return moves
+
+    def move_to_index(self, move):
+        """Return the move index of a coordinate pair (row, column) on the
+        board: the bit of the cell (row + column * (height + 2)).
+        """
+        if not (0 <= move[0] < self.height and 0 <= move[1] < self.width):
+            raise KeyError(move)
+        return move[0] + move[1] * self._stride
+
+    def index_to_move(self, bit):
+        """Return the coordinate pair (row, column) of a move index. """
+        return self._cells[bit]
+
+    def mobility(self, player):
+        """Count the legal moves of both players once and derive the utility
+        of the game state from them. See `Board.mobility`.
+        """
+        if player == self._player_1:
+            own_bit, opp_bit = self._p1_loc, self._p2_loc
+        elif player == self._player_2:
+            own_bit, opp_bit = self._p2_loc, self._p1_loc
+        else:
+            raise RuntimeError(
+                "Invalid player in mobility: {}".format(player))
+        own_moves = self._count_moves(own_bit)
+        opp_moves = self._count_moves(opp_bit)
+
+        if player == self._active_player:
+            utility = 0. if own_moves else float("-inf")
+        else:
+            utility = 0. if opp_moves else float("inf")
+        return utility, own_moves, opp_moves
+
+    def reachable_region(self, max_cells):
+        """Return the cell indices of the players and the mask of the blank
+        cells either of them could reach, indexed like `Board` cells (row +
+        column * height), or None. See `Board.reachable_region`.
+        """
+        active_bit, inactive_bit = self._p1_loc, self._p2_loc
+        if self._active_player == self._player_2:
+            active_bit, inactive_bit = inactive_bit, active_bit
+        if active_bit == Board.NOT_MOVED or inactive_bit == Board.NOT_MOVED:
+            return None
+
+        attacks = self._attacks
+        blank = ~self._blocked
+        region = 0
+        frontier = (attacks[active_bit] | attacks[inactive_bit]) & blank
+        while frontier:
+            region |= frontier
+            if bin(region).count("1") > max_cells:
+                return None
+            reached = 0
+            while frontier:
+                low = frontier & -frontier
+                reached |= attacks[low.bit_length() - 1]
+                frontier ^= low
+            frontier = reached & blank & ~region
+
+        # Re-index the region from bits to Board cell indices
+        cells = self._cells
+        height = self.height
+        mask = 0
+        while region:
+            low = region & -region
+            r, c = cells[low.bit_length() - 1]
+            mask |= 1 << (r + c * height)
+            region ^= low
+        return self._bit_to_idx(active_bit), self._bit_to_idx(inactive_bit), mask
+
+    def _active_location(self):
+        """Return the bit of the active player (or NOT_MOVED). """
+        return self._p1_loc if self._active_player == self._player_1 else self._p2_loc
+
+    def _count_moves(self, bit):
+        """Count the legal moves of a player standing on `bit`. """
+        if bit == Board.NOT_MOVED:
+            return bin(self._full_mask & ~self._blocked).count("1")
+        return bin(self._attacks[bit] & ~self._blocked).count("1")
+
+    def _mask_to_moves(self, mask):
+        """Convert a mask of cells into a list of (row, column) tuples. """
+        cells = self._cells
+        moves = []
+        while mask:
+            low = mask & -mask
+            moves.append(cells[low.bit_length() - 1])
+            mask ^= low
+        return moves
+
+    def apply_move(self, move):
+        """Move the active player to a specified location.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+        """
+        self._apply_bit(move[0] + move[1] * self._stride)
+
+    def _apply_bit(self, bit):
+        if self._active_player == self._player_1:
+            prev_bit, locations = self._p1_loc, self._zobrist_p1
+            self._p1_loc = bit
+        else:
+            prev_bit, locations = self._p2_loc, self._zobrist_p2
+            self._p2_loc = bit
+        zobrist = self._zobrist ^ self._zobrist_side ^ self._zobrist_blocked[bit] ^ locations[bit]
+        if prev_bit != Board.NOT_MOVED:
+            zobrist ^= locations[prev_bit]
+        self._zobrist = zobrist
+        self._blocked |= 1 << bit
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        self.move_count += 1
+
+    def push(self, move):
+        """Apply a move in place and remember how to take it back with
+        `pop()`.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+        """
+        self.push_index(move[0] + move[1] * self._stride)
+
+    def push_index(self, bit):
+        """Apply the move to the cell with move index (bit) `bit` in place and
+        remember how to take it back with `pop()`.
+        """
+        if self._active_player == self._player_1:
+            self._undo_stack.append(self._p1_loc)
+        else:
+            self._undo_stack.append(self._p2_loc)
+        self._apply_bit(bit)
+
+    def pop(self):
+        """Undo the last move applied with `push()` or `push_index()`. """
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        prev_bit = self._undo_stack.pop()
+        if self._active_player == self._player_1:
+            bit, locations = self._p1_loc, self._zobrist_p1
+            self._p1_loc = prev_bit
+        else:
+            bit, locations = self._p2_loc, self._zobrist_p2
+            self._p2_loc = prev_bit
+        self._blocked ^= 1 << bit
+        self.move_count -= 1
+
+        zobrist = self._zobrist ^ self._zobrist_side ^ self._zobrist_blocked[bit] ^ locations[bit]
+        if prev_bit != Board.NOT_MOVED:
+            zobrist ^= locations[prev_bit]
+        self._zobrist = zobrist
@@ -13,6 +13,40 @@ from copy import copy
 
 TIME_LIMIT_MILLIS = 150
 
+# Seed of the Zobrist key tables; fixed so that keys are identical in every
+# process and on every machine (e.g., for opening books stored on disk)
+ZOBRIST_SEED = 0x15014710
+
+# Inverse of every symmetry (see Board.symmetric_move) and the symmetries
+# that are valid for boards that are not square
+SYMMETRY_INVERSE = (0, 1, 2, 5, 4, 3, 6, 7)
+NON_SQUARE_SYMMETRIES = (0, 1, 2, 4)
+
+# (row, column) offsets of the eight knight moves
+KNIGHT_DIRECTIONS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2),
+                     (1, -2), (1, 2), (2, -1), (2, 1))
+
+
+def _symmetric_cell(cell, symmetry, width, height):
+    """Map a (row, column) cell through a symmetry (see Board.symmetric_move). """
+    i, j = cell
+    last_row, last_col = height - 1, width - 1
+    if symmetry == 0:
+        return (i, j)
+    if symmetry == 1:
+        return (i, last_col - j)
+    if symmetry == 2:
+        return (last_row - i, j)
+    if symmetry == 3:
+        return (j, last_col - i)
+    if symmetry == 4:
+        return (last_row - i, last_col - j)
+    if symmetry == 5:
+        return (last_row - j, i)
+    if symmetry == 6:
+        return (last_row - j, last_col - i)
+    return (j, i)
+
 
 class Board(object):
     """Implement a model for the game Isolation assuming each player moves like
@@ -33,11 +67,25 @@ class Board(object):
 
     height : int (optional)
         The number of rows that the board should have.
+
+    seed : int (optional)
+        Seed of the random number generator that shuffles the legal moves of
+        this board and its copies. If None, the global `random` module is used.
     """
     BLANK = 0
     NOT_MOVED = None
 
-    def __init__(self, player_1, player_2, width=7, height=7):
+    # Return the legal moves of a knight in random order. Searches that order
+    # the moves themselves may switch this off for their copy of the board.
+    shuffle_moves = True
+
+    # Zobrist key tables, symmetry tables and knight geometry per (width,
+    # height), shared by all instances
+    _zobrist_tables = {}
+    _symmetry_tables = {}
+    _geometry_tables = {}
+
+    def __init__(self, player_1, player_2, width=7, height=7, seed=None):
         self.width = width
         self.height = height
         self.move_count = 0
@@ -46,14 +94,83 @@ class Board(object):
         self._active_player = player_1
         self._inactive_player = player_2
 
+        # Random number generator used to shuffle the legal moves; a seeded
+        # board (and all its copies) generates reproducible move orders
+        self._rng = random if seed is None else random.Random(seed)
+
         # The last 3 entries of the board state includes initiative (0 for
         # player 1, 1 for player 2) player 2 last move, and player 1 last move
         self._board_state = [Board.BLANK] * (width * height + 3)
         self._board_state[-1] = Board.NOT_MOVED
         self._board_state[-2] = Board.NOT_MOVED
 
+        # Previous locations of the players moved with push(), used by pop()
+        self._undo_stack = []
+
+        (self._zobrist_blocked, self._zobrist_p1, self._zobrist_p2,
+         self._zobrist_side) = self._get_zobrist(width, height)
+        self._zobrist = 0
+
+        (self._cells, self._cell_indices, self._neighbors,
+         degrees) = Board._get_knight_geometry(width, height)
+        # Number of blank knight neighbors of every cell, i.e., the number of
+        # legal moves of a player standing on it; maintained by apply/pop
+        self._degrees = list(degrees)
+
+    @classmethod
+    def _get_knight_geometry(cls, width, height):
+        """Return the (cells, cell_indices, neighbors, degrees) tables of a
+        board size, building them on first use.
+
+        `cells[idx]` is the (row, column) tuple of the cell with index `idx`
+        (row + column * height), `cell_indices` maps the tuples back to their
+        index, and `neighbors[idx]` is the tuple of the indices of all knight
+        destinations of the cell that lie on the board, and `degrees[idx]`
+        their number. Moves are returned as the shared tuples of `cells`
+        rather than new ones.
+        """
+        key = (width, height)
+        if key not in Board._geometry_tables:
+            cells = tuple((i, j) for j in range(width) for i in range(height))
+            cell_indices = {cell: idx for idx, cell in enumerate(cells)}
+            neighbors = tuple(
+                tuple(i + di + (j + dj) * height for di, dj in KNIGHT_DIRECTIONS
+                      if 0 <= i + di < height and 0 <= j + dj < width)
+                for i, j in cells)
+            degrees = tuple(len(cell_neighbors) for cell_neighbors in neighbors)
+            Board._geometry_tables[key] = (cells, cell_indices, neighbors, degrees)
+        return Board._geometry_tables[key]
+
+    @classmethod
+    def _get_zobrist(cls, width, height):
+        """Return the (blocked, player_1, player_2, side) Zobrist tables for a
+        board size, building them on first use.
+
+        The first three are lists of random 64-bit keys indexed by cell (row +
+        column * height); `side` is the key toggled while player 2 holds the
+        initiative.
+        """
+        key = (width, height)
+        if key not in Board._zobrist_tables:
+            rng = random.Random(ZOBRIST_SEED ^ (width << 16) ^ height)
+            size = width * height
+            blocked = [rng.getrandbits(64) for _ in range(size)]
+            player_1 = [rng.getrandbits(64) for _ in range(size)]
+            player_2 = [rng.getrandbits(64) for _ in range(size)]
+            Board._zobrist_tables[key] = (blocked, player_1, player_2, rng.getrandbits(64))
+        return Board._zobrist_tables[key]
+
+    @property
+    def zobrist_key(self):
+        """64-bit Zobrist key of the current state, covering the blocked
+        cells, the location of each player and which player holds the
+        initiative. The key is maintained incrementally by `apply_move`, and
+        is stable across processes.
+        """
+        return self._zobrist
+
     def hash(self):
-        return str(self._board_state[0:49]).__hash__()
+        return self._zobrist
 
     @property
     def active_player(self):
@@ -97,6 +214,10 @@ class Board(object):
         new_board._active_player = self._active_player
         new_board._inactive_player = self._inactive_player
         new_board._board_state = copy(self._board_state)
+        new_board._degrees = copy(self._degrees)
+        new_board._zobrist = self._zobrist
+        new_board.shuffle_moves = self.shuffle_moves
+        new_board._rng = self._rng
         return new_board
 
     def forecast_move(self, move):
@@ -118,44 +239,172 @@ class Board(object):
         new_board.apply_move(move)
         return new_board
 
+    def push(self, move):
+        """Apply a move in place, like `apply_move`, and remember how to take
+        it back with `pop()`.
+
+        Searches should prefer push()/pop() over `forecast_move`, as it avoids
+        copying the board for every node of the game tree.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+        """
+        self.push_index(move[0] + move[1] * self.height)
 
-    def _swap(self, board_array, idx, mirror_idx):
-        tmp = board_array[idx]
-        board_array[idx] = board_array[mirror_idx]
-        board_array[mirror_idx] = tmp
+    def push_index(self, idx):
+        """Apply the move to the cell with move index `idx` in place, like
+        `push`; it is taken back with `pop()` as well.
+        """
+        last_move_idx = int(self._active_player == self._player_2) + 1
+        self._undo_stack.append(self._board_state[-last_move_idx])
+        self._apply_index(idx)
+
+    def pop(self):
+        """Undo the last move applied with `push()` or `push_index()`. """
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        last_move_idx = int(self._active_player == self._player_2) + 1
+        idx = self._board_state[-last_move_idx]
+        prev_idx = self._undo_stack.pop()
+        self._board_state[idx] = Board.BLANK
+        self._board_state[-last_move_idx] = prev_idx
+        self._board_state[-3] ^= 1
+        self.move_count -= 1
+        degrees = self._degrees
+        for neighbor in self._neighbors[idx]:
+            degrees[neighbor] += 1
+
+        locations = self._zobrist_p2 if last_move_idx == 2 else self._zobrist_p1
+        zobrist = self._zobrist ^ self._zobrist_side ^ self._zobrist_blocked[idx] ^ locations[idx]
+        if prev_idx != Board.NOT_MOVED:
+            zobrist ^= locations[prev_idx]
+        self._zobrist = zobrist
+
+    @classmethod
+    def _get_symmetries(cls, width, height):
+        """Return the symmetry tables of a board size, building them on first
+        use.
+
+        The result is a list with one (symmetry, permutation, inverse,
+        blocked, player_1, player_2) tuple per symmetry valid for the board
+        shape (see `symmetries`). `permutation[idx]` is the cell index that
+        cell `idx` maps to, `inverse` the permutation of the inverse
+        symmetry, and the last three are the Zobrist tables of the image,
+        i.e., `blocked[idx]` is the key of the image of cell `idx`.
+        """
+        key = (width, height)
+        if key not in Board._symmetry_tables:
+            blocked, player_1, player_2, _ = Board._get_zobrist(width, height)
+            cells = [(i, j) for j in range(width) for i in range(height)]
+            permutations = {}
+            for symmetry in Board._valid_symmetries(width, height):
+                permutations[symmetry] = tuple(
+                    i + j * height for i, j in (_symmetric_cell(cell, symmetry, width, height)
+                                                for cell in cells))
+            tables = []
+            for symmetry, permutation in permutations.items():
+                tables.append((symmetry, permutation, permutations[SYMMETRY_INVERSE[symmetry]],
+                               [blocked[idx] for idx in permutation],
+                               [player_1[idx] for idx in permutation],
+                               [player_2[idx] for idx in permutation]))
+            Board._symmetry_tables[key] = tables
+        return Board._symmetry_tables[key]
+
+    @staticmethod
+    def _valid_symmetries(width, height):
+        return range(8) if width == height else NON_SQUARE_SYMMETRIES
+
+    def symmetries(self):
+        """Return the indices of the symmetries of the board shape: all eight
+        for square boards (see `symmetric_move`), but only the identity, the
+        two mirrors and the rotation by 180 degrees otherwise.
+        """
+        return list(Board._valid_symmetries(self.width, self.height))
 
     def symmetric_configurations(self):
+        """Return the cells of the eight symmetric images of the board state
+        (see `symmetric_move`), indexed like the first width * height entries
+        of the board state. Images of symmetries that are not valid for the
+        board shape are None.
+        """
+        state = self._board_state
         symmetric_boards = [None] * 8
-        for i in range(0,8):
-            symmetric_boards[i] = self._board_state[0:49]
-
-        for j in range(self.width): 
-            for i in range(self.height):
-                idx = i + j * self.height
-                if self._board_state[idx] != Board.BLANK:
-                    vertical_mirror_idx = i + (self.width - j - 1) * self.height
-                    self._swap(symmetric_boards[1], idx, vertical_mirror_idx)
-
-                    horizontal_mirror_idx = (self.height - i - 1) + j * self.height
-                    self._swap(symmetric_boards[2], idx, horizontal_mirror_idx)
-                    
-                    rotation90_idx = j + (self.width - i - 1) * self.height
-                    self._swap(symmetric_boards[3], idx, rotation90_idx)
-
-                    rotation180_idx = (self.height - i - 1) + (self.width - j - 1) * self.height
-                    self._swap(symmetric_boards[4], idx, rotation180_idx)
-                    
-                    rotation270_idx = (self.height - j - 1) + i * self.height
-                    self._swap(symmetric_boards[5], idx, rotation270_idx)
-
-                    diag1_idx = (self.height - j - 1) + (self.width - i -1) * self.height
-                    self._swap(symmetric_boards[6], idx, diag1_idx)
-                    
-                    diag2_idx = j + i * self.height
-                    self._swap(symmetric_boards[7], idx, diag2_idx)
-                    
+        for symmetry, _, inverse, _, _, _ in self._get_symmetries(self.width, self.height):
+            symmetric_boards[symmetry] = [state[idx] for idx in inverse]
         return symmetric_boards
-        
+
+    def symmetric_move(self, move, symmetry):
+        """Map a cell through one of the symmetries of the board.
+
+        The symmetries are numbered like the results of
+        `symmetric_configurations`: 0 is the identity, 1 and 2 the vertical
+        and horizontal mirrors, 3 to 5 the rotations by 90, 180 and 270
+        degrees and 6 and 7 the two diagonal mirrors. Only 0, 1, 2 and 4 are
+        valid for boards that are not square.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) on the board.
+
+        symmetry : int
+            The index of the symmetry (0-7).
+
+        Returns
+        ----------
+        (int, int)
+            The coordinate pair of the cell in the symmetric image.
+        """
+        if symmetry not in Board._valid_symmetries(self.width, self.height):
+            raise ValueError("Symmetry {} is not valid for a {}x{} board".format(
+                symmetry, self.width, self.height))
+        return _symmetric_cell(move, symmetry, self.width, self.height)
+
+    def symmetric_keys(self):
+        """Return the Zobrist keys of the symmetric images of the current
+        state, i.e., the `zobrist_key` each image would have if it had been
+        played on a board.
+
+        Returns
+        ----------
+        list<(int, int)>
+            A (symmetry, key) pair for every symmetry of the board shape (see
+            `symmetries`); the key of the identity is the key of the state.
+        """
+        state = self._board_state
+        blocked_cells = [idx for idx in range(self.width * self.height) if state[idx]]
+        p1_idx, p2_idx = state[-1], state[-2]
+        initiative = Board._get_zobrist(self.width, self.height)[3] if state[-3] else 0
+
+        keys = []
+        for symmetry, _, _, blocked, player_1, player_2 in self._get_symmetries(self.width, self.height):
+            key = initiative
+            for idx in blocked_cells:
+                key ^= blocked[idx]
+            if p1_idx != Board.NOT_MOVED:
+                key ^= player_1[p1_idx]
+            if p2_idx != Board.NOT_MOVED:
+                key ^= player_2[p2_idx]
+            keys.append((symmetry, key))
+        return keys
+
+    def canonical_key(self):
+        """Return the canonical key of the current state: the smallest key of
+        its symmetric images. All states that are symmetric to each other
+        have the same canonical key.
+
+        Returns
+        ----------
+        (int, int)
+            The canonical key and the symmetry that maps the current state to
+            the image with that key (see `symmetric_move`); map moves back to
+            the current state with the inverse symmetry `SYMMETRY_INVERSE`.
+        """
+        symmetry, key = min(self.symmetric_keys(), key=lambda pair: pair[1])
+        return key, symmetry
+
     def move_is_legal(self, move):
         """Test whether a move is legal in the current game state.
 
@@ -170,15 +419,14 @@ class Board(object):
         bool
             Returns True if the move is legal, False otherwise
         """
-        idx = move[0] + move[1] * self.height
-        return (0 <= move[0] < self.height and 0 <= move[1] < self.width and
-                self._board_state[idx] == Board.BLANK)
+        idx = self._cell_indices.get(move)
+        return idx is not None and self._board_state[idx] == Board.BLANK
 
     def get_blank_spaces(self):
         """Return a list of the locations that are still available on the board.
         """
-        return [(i, j) for j in range(self.width) for i in range(self.height)
-                if self._board_state[i + j * self.height] == Board.BLANK]
+        state = self._board_state
+        return [cell for idx, cell in enumerate(self._cells) if state[idx] == Board.BLANK]
 
     def get_player_location(self, player):
         """Find the current location of the specified player on the board.
@@ -194,20 +442,21 @@ class Board(object):
             The coordinate pair (row, column) of the input player, or None
             if the player has not moved.
         """
+        idx = self.get_location_index(player)
+        if idx == Board.NOT_MOVED:
+            return Board.NOT_MOVED
+        return self._cells[idx]
+
+    def get_location_index(self, player):
+        """Return the move index of the location of the specified player, or
+        None if the player has not moved (see `get_player_location`).
+        """
         if player == self._player_1:
-            if self._board_state[-1] == Board.NOT_MOVED:
-                return Board.NOT_MOVED
-            idx = self._board_state[-1]
-        elif player == self._player_2:
-            if self._board_state[-2] == Board.NOT_MOVED:
-                return Board.NOT_MOVED
-            idx = self._board_state[-2]
-        else:
-            raise RuntimeError(
-                "Invalid player in get_player_location: {}".format(player))
-        w = idx // self.height
-        h = idx % self.height
-        return (h, w)
+            return self._board_state[-1]
+        if player == self._player_2:
+            return self._board_state[-2]
+        raise RuntimeError(
+            "Invalid player in get_player_location: {}".format(player))
 
     def get_legal_moves(self, player=None):
         """Return the list of all legal moves for the specified player.
@@ -225,8 +474,40 @@ class Board(object):
             for the player constrained by the current game state.
         """
         if player is None:
-            player = self.active_player
-        return self.__get_moves(self.get_player_location(player))
+            return self.__get_moves(self._active_location())
+        return self.__get_moves(self.get_location_index(player))
+
+    def get_legal_indices(self, player=None):
+        """Return the move indices of all legal moves of the specified player
+        (by default the active player), in the order of `get_legal_moves`.
+
+        Searches should work with move indices (see `move_to_index`) and
+        `push_index()`, and convert only the move they return to a
+        coordinate pair: indices are plain ints, which are neither built nor
+        converted for every node.
+        """
+        state = self._board_state
+        idx = self._active_location() if player is None else self.get_location_index(player)
+        if idx == Board.NOT_MOVED:
+            moves = [cell_idx for cell_idx in range(len(self._cells))
+                     if state[cell_idx] == Board.BLANK]
+        else:
+            moves = [neighbor for neighbor in self._neighbors[idx]
+                     if state[neighbor] == Board.BLANK]
+        if self.shuffle_moves:
+            self._rng.shuffle(moves)
+        return moves
+
+    def move_to_index(self, move):
+        """Return the move index of a coordinate pair (row, column) on the
+        board: row + column * height for a `Board`. Move indices identify the
+        cells of one board class and size only.
+        """
+        return self._cell_indices[move]
+
+    def index_to_move(self, idx):
+        """Return the coordinate pair (row, column) of a move index. """
+        return self._cells[idx]
 
     def apply_move(self, move):
         """Move the active player to a specified location.
@@ -237,21 +518,34 @@ class Board(object):
             A coordinate pair (row, column) indicating the next position for
             the active player on the board.
         """
-        idx = move[0] + move[1] * self.height
-        last_move_idx = int(self.active_player == self._player_2) + 1
+        self._apply_index(move[0] + move[1] * self.height)
+
+    def _apply_index(self, idx):
+        last_move_idx = int(self._active_player == self._player_2) + 1
+
+        locations = self._zobrist_p2 if last_move_idx == 2 else self._zobrist_p1
+        zobrist = self._zobrist ^ self._zobrist_side ^ self._zobrist_blocked[idx] ^ locations[idx]
+        prev_idx = self._board_state[-last_move_idx]
+        if prev_idx != Board.NOT_MOVED:
+            zobrist ^= locations[prev_idx]
+        self._zobrist = zobrist
+
         self._board_state[-last_move_idx] = idx
         self._board_state[idx] = 1
         self._board_state[-3] ^= 1
+        degrees = self._degrees
+        for neighbor in self._neighbors[idx]:
+            degrees[neighbor] -= 1
         self._active_player, self._inactive_player = self._inactive_player, self._active_player
         self.move_count += 1
 
     def is_winner(self, player):
         """ Test whether the specified player has won the game. """
-        return player == self._inactive_player and not self.get_legal_moves(self._active_player)
+        return player == self._inactive_player and not self._count_moves(self._active_location())
 
     def is_loser(self, player):
         """ Test whether the specified player has lost the game. """
-        return player == self._active_player and not self.get_legal_moves(self._active_player)
+        return player == self._active_player and not self._count_moves(self._active_location())
 
     def utility(self, player):
         """Returns the utility of the current game state from the perspective
@@ -275,7 +569,7 @@ class Board(object):
             a value of -inf if the player has lost, and a value of 0
             otherwise.
         """
-        if not self.get_legal_moves(self._active_player):
+        if not self._count_moves(self._active_location()):
 
             if player == self._inactive_player:
                 return float("inf")
@@ -285,19 +579,148 @@ class Board(object):
 
         return 0.
 
-    def __get_moves(self, loc):
+    def mobility(self, player):
+        """Count the legal moves of both players once and derive the utility
+        of the game state from them.
+
+        Heuristics should use this instead of calling `is_loser()`,
+        `is_winner()` and `get_legal_moves()` separately, which generate
+        (and shuffle) the same move lists several times per evaluation.
+
+        Parameters
+        ----------
+        player : object
+            An object registered as a player in the current game.
+
+        Returns
+        ----------
+        (float, int, int)
+            The `utility()` of the game state for the specified player, the
+            number of legal moves of the player and the number of legal moves
+            of its opponent.
+        """
+        if player == self._player_1:
+            own_loc, opp_loc = self._board_state[-1], self._board_state[-2]
+        elif player == self._player_2:
+            own_loc, opp_loc = self._board_state[-2], self._board_state[-1]
+        else:
+            raise RuntimeError(
+                "Invalid player in mobility: {}".format(player))
+        own_moves = self._count_moves(own_loc)
+        opp_moves = self._count_moves(opp_loc)
+
+        if player == self._active_player:
+            utility = 0. if own_moves else float("-inf")
+        else:
+            utility = 0. if opp_moves else float("inf")
+        return utility, own_moves, opp_moves
+
+    def reachable_cells(self, player):
+        """Return the blank cells the specified player could still reach by
+        any sequence of knight moves if the opponent did not move anymore.
+
+        Parameters
+        ----------
+        player : object
+            An object registered as a player in the current game.
+
+        Returns
+        ----------
+        set<(int, int)>
+            The coordinate pairs (row, column) of the reachable cells; all
+            blank cells if the player has not moved yet.
+        """
+        location = self.get_player_location(player)
+        if location == Board.NOT_MOVED:
+            return set(self.get_blank_spaces())
+
+        cells, cell_indices, neighbors, _ = Board._get_knight_geometry(self.width, self.height)
+        state = self._board_state
+        reached = set()
+        frontier = [cell_indices[location]]
+        while frontier:
+            for idx in neighbors[frontier.pop()]:
+                if state[idx] == Board.BLANK and cells[idx] not in reached:
+                    reached.add(cells[idx])
+                    frontier.append(idx)
+        return reached
+
+    def reachable_region(self, max_cells):
+        """Return the cells that still matter for the outcome of the game: the
+        blank cells that either player could reach by any sequence of knight
+        moves. All other blank cells can never be entered again.
+
+        Parameters
+        ----------
+        max_cells : int
+            The flood fill stops as soon as the region has more cells.
+
+        Returns
+        ----------
+        (int, int, int) or None
+            The cell indices (row + column * height) of the active and the
+            inactive player and the mask of the region (bit `idx` set for
+            every cell index `idx` of the region), or None if a player has
+            not moved yet or the region has more than `max_cells` cells.
+        """
+        state = self._board_state
+        active_idx, inactive_idx = state[-1], state[-2]
+        if state[-3]:
+            active_idx, inactive_idx = inactive_idx, active_idx
+        if active_idx == Board.NOT_MOVED or inactive_idx == Board.NOT_MOVED:
+            return None
+
+        neighbors = self._neighbors
+        region = 0
+        size = 0
+        frontier = [active_idx, inactive_idx]
+        while frontier:
+            for idx in neighbors[frontier.pop()]:
+                if state[idx] == Board.BLANK and not region >> idx & 1:
+                    if size == max_cells:
+                        return None
+                    size += 1
+                    region |= 1 << idx
+                    frontier.append(idx)
+        return active_idx, inactive_idx, region
+
+    def is_partitioned(self):
+        """Test whether the players have been separated, i.e., both players
+        have moved and no blank cell can be reached by both of them. From
+        then on the players cannot interfere with each other anymore.
+        """
+        if (self.get_player_location(self._player_1) == Board.NOT_MOVED or
+                self.get_player_location(self._player_2) == Board.NOT_MOVED):
+            return False
+        return not (self.reachable_cells(self._player_1) &
+                    self.reachable_cells(self._player_2))
+
+    def _active_location(self):
+        """Return the cell index of the active player (or NOT_MOVED). """
+        return self._board_state[-1 - self._board_state[-3]]
+
+    def _count_moves(self, idx):
+        """Count the legal moves of a player standing on cell index `idx`
+        without building (or shuffling) the list of moves: a single read of
+        the degree array once the player has moved.
+        """
+        if idx == Board.NOT_MOVED:
+            return self._board_state[:-3].count(Board.BLANK)
+        return self._degrees[idx]
+
+    def __get_moves(self, idx):
         """Generate the list of possible moves for an L-shaped motion (like a
-        knight in chess).
+        knight in chess) from the cell with index `idx`.
         """
-        if loc == Board.NOT_MOVED:
+        if idx == Board.NOT_MOVED:
             return self.get_blank_spaces()
 
-        r, c = loc
-        directions = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
-                      (1, -2), (1, 2), (2, -1), (2, 1)]
-        valid_moves = [(r + dr, c + dc) for dr, dc in directions
-                       if self.move_is_legal((r + dr, c + dc))]
-        random.shuffle(valid_moves)
+        state = self._board_state
+        cells = self._cells
+        valid_moves = [cells[neighbor] for neighbor in self._neighbors[idx]
+                       if state[neighbor] == Board.BLANK]
+        if self.shuffle_moves:
+            self._rng.shuffle(valid_moves)
         return valid_moves
 
     def print_board(self):
@@ -337,6 +760,13 @@ class Board(object):
         """Execute a match between the players by alternately soliciting them
         to select a move and applying it in the game.
 
+        Players may search on their opponent's time by defining the optional
+        hooks `ponder(game)`, called with the position after each of their
+        legal moves, and `end_ponder(game)`, called with the position after
+        the opponent's reply before their next `get_move()` (and with None
+        when the game is over). Both hooks run on the clock of the player's
+        own turn.
+
         Parameters
         ----------
         time_limit : numeric (optional)
@@ -350,6 +780,15 @@ class Board(object):
             move history, and a string indicating the reason for losing
             (e.g., timeout or invalid move).
         """
+        try:
+            return self._play(time_limit)
+        finally:
+            for player in (self._player_1, self._player_2):
+                end_ponder = getattr(player, "end_ponder", None)
+                if end_ponder is not None:
+                    end_ponder(None)
+
+    def _play(self, time_limit):
         move_history = []
 
         time_millis = lambda: 1000 * timeit.default_timer()
@@ -358,15 +797,23 @@ class Board(object):
 
             legal_player_moves = self.get_legal_moves()
             game_copy = self.copy()
+            player = self._active_player
 
             move_start = time_millis()
             time_left = lambda : time_limit - (time_millis() - move_start)
-            curr_move = self._active_player.get_move(game_copy, time_left)
-            move_end = time_left()
+            end_ponder = getattr(player, "end_ponder", None)
+            if end_ponder is not None:
+                end_ponder(game_copy)
+            curr_move = player.get_move(game_copy, time_left)
 
             if curr_move is None:
                 curr_move = Board.NOT_MOVED
 
+            ponder = getattr(player, "ponder", None)
+            if ponder is not None and curr_move in legal_player_moves:
+                ponder(self.forecast_move(curr_move))
+            move_end = time_left()
+
             if move_end < 0:
                 return self._inactive_player, move_history, "timeout"
 
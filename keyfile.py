@@ -0,0 +1,160 @@
+"""This file contains the `KeyFile` class, the storage shared by the opening
+book (`opening_book.py`) and the endgame tablebase (`tablebase.py`).
+
+A key file maps 64-bit position keys to small fixed-width values. It is
+stored in a compact binary file of fixed-width records sorted by key:
+
+    header : magic (8 bytes), board width (uint16), board height (uint16),
+             number of records (uint32)
+    record : key (uint64), value (see the `RECORD` of the subclass)
+
+All integers are little endian. The file is memory-mapped and searched with
+a binary search, so loading a file costs (almost) nothing and only the pages
+touched by the lookups are ever read.
+"""
+import mmap
+import os
+import struct
+
+HEADER = struct.Struct("<8sHHI")
+KEY = struct.Struct("<Q")
+
+
+class KeyFile:
+    """Table of (position key -> value) entries backed by a sorted,
+    memory-mapped binary file.
+
+    New entries are kept in memory until `save()` merges them into a file.
+    Subclasses define the file `MAGIC`, the `RECORD` struct (a uint64 key
+    followed by the fields of the value) and how values map to those fields.
+
+    Parameters
+    ----------
+    filename : str (optional)
+        The file to open. A missing file (or None) gives an empty table.
+
+    width : int (optional)
+        The number of columns of the boards of the table.
+
+    height : int (optional)
+        The number of rows of the boards of the table.
+    """
+    MAGIC = None
+    RECORD = None
+    DESCRIPTION = "isolation key file"
+
+    def __init__(self, filename=None, width=7, height=7):
+        self.width = width
+        self.height = height
+        self._mmap = None
+        self._count = 0
+        self._new_entries = {}
+        if filename is not None and os.path.exists(filename):
+            self.load(filename)
+
+    def load(self, filename):
+        """Memory-map a file, replacing the entries of this table. """
+        self.close()
+        self._new_entries = {}
+        with open(filename, "rb") as data_fp:
+            size = os.fstat(data_fp.fileno()).st_size
+            if size < HEADER.size:
+                raise ValueError("{} is not an {}".format(filename, self.DESCRIPTION))
+            data_map = mmap.mmap(data_fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, width, height, count = HEADER.unpack_from(data_map, 0)
+        if magic != self.MAGIC or size != HEADER.size + count * self.RECORD.size:
+            data_map.close()
+            raise ValueError("{} is not an {}".format(filename, self.DESCRIPTION))
+        if (width, height) != (self.width, self.height):
+            data_map.close()
+            raise ValueError("{} is an {} for {}x{} boards, not {}x{}".format(
+                filename, self.DESCRIPTION, width, height, self.width, self.height))
+        self._mmap = data_map
+        self._count = count
+
+    def close(self):
+        """Release the memory map of the file. """
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+            self._count = 0
+
+    def __len__(self):
+        return self._count + sum(1 for key in self._new_entries
+                                 if self._find(key) is None)
+
+    def __contains__(self, key):
+        return self.lookup(key) is not None
+
+    def lookup(self, key):
+        """Return the value stored for a position key, or None. """
+        if key in self._new_entries:
+            return self._new_entries[key]
+        return self._find(key)
+
+    def add(self, key, value):
+        """Store the value of the position with the given key, replacing any
+        previous entry.
+        """
+        self._new_entries[key] = self._decode(self._encode(value))
+
+    def items(self):
+        """Iterate over all (key, value) entries in key order. """
+        stored = (self._record(idx) for idx in range(self._count))
+        new_entries = iter(sorted(self._new_entries.items()))
+        new_entry = next(new_entries, None)
+        for key, value in stored:
+            while new_entry is not None and new_entry[0] < key:
+                yield new_entry
+                new_entry = next(new_entries, None)
+            if new_entry is not None and new_entry[0] == key:
+                continue
+            yield key, value
+        while new_entry is not None:
+            yield new_entry
+            new_entry = next(new_entries, None)
+
+    def save(self, filename):
+        """Write all entries to a file and memory-map it.
+
+        The table is written to a temporary file first and then moved over
+        `filename`, so an interrupted save never leaves a truncated file.
+        """
+        entries = list(self.items())
+        tmp_filename = filename + ".tmp"
+        with open(tmp_filename, "wb") as data_fp:
+            data_fp.write(HEADER.pack(self.MAGIC, self.width, self.height, len(entries)))
+            for key, value in entries:
+                data_fp.write(self.RECORD.pack(key, *self._encode(value)))
+        self.close()
+        os.replace(tmp_filename, filename)
+        self.load(filename)
+
+    def _encode(self, value):
+        """Return the record fields (after the key) of a value. """
+        raise NotImplementedError
+
+    def _decode(self, fields):
+        """Return the value of the record fields (after the key). """
+        raise NotImplementedError
+
+    def _record(self, idx):
+        fields = self.RECORD.unpack_from(self._mmap, HEADER.size + idx * self.RECORD.size)
+        return fields[0], self._decode(fields[1:])
+
+    def _find(self, key):
+        """Binary search the file for a key and return its value. """
+        data_map = self._mmap
+        record_size = self.RECORD.size
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_key = KEY.unpack_from(data_map, HEADER.size + mid * record_size)[0]
+            if mid_key < key:
+                lo = mid + 1
+            elif mid_key > key:
+                hi = mid
+            else:
+                return self._record(mid)[1]
+        return None
@@ -0,0 +1,64 @@
+"""This file contains the `OpeningBook` class used by the competition agent.
+
+The book maps the canonical key of a position (`Board.canonical_key`, the
+smallest Zobrist key of its symmetric images, which is stable across
+processes) to the move to play in the canonical image. It is stored in a
+memory-mapped key file (see `keyfile.py`) with the records
+
+    record : key (uint64), row (uint8), column (uint8)
+"""
+import struct
+
+from isolation import SYMMETRY_INVERSE
+from keyfile import KeyFile
+
+MAGIC = b"ISOBOOK1"
+RECORD = struct.Struct("<QBB")
+
+
+class OpeningBook(KeyFile):
+    """Opening book of (position key -> move) entries backed by a sorted,
+    memory-mapped binary file.
+
+    New entries are kept in memory until `save()` merges them into a book
+    file.
+
+    Parameters
+    ----------
+    filename : str (optional)
+        The book file to open. A missing file (or None) gives an empty book.
+
+    width : int (optional)
+        The number of columns of the boards of the book.
+
+    height : int (optional)
+        The number of rows of the boards of the book.
+    """
+    MAGIC = MAGIC
+    RECORD = RECORD
+    DESCRIPTION = "opening book"
+
+    def add_position(self, game, move):
+        """Store `move` as the move to play in the current position of `game`
+        (and thereby in all positions symmetric to it), keeping the entry
+        already in the book.
+        """
+        key, symmetry = game.canonical_key()
+        if key not in self:
+            self.add(key, game.symmetric_move(move, symmetry))
+
+    def lookup_position(self, game):
+        """Return the move stored for the current position of `game` (or
+        one symmetric to it), or None.
+        """
+        key, symmetry = game.canonical_key()
+        move = self.lookup(key)
+        if move is None:
+            return None
+        return game.symmetric_move(move, SYMMETRY_INVERSE[symmetry])
+
+    def _encode(self, move):
+        return tuple(move)
+
+    def _decode(self, fields):
+        return tuple(fields)
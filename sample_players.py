@@ -34,13 +34,7 @@ def null_score(game, player):
         The heuristic value of the current game state.
     """
 
-    if game.is_loser(player):
-        return float("-inf")
-
-    if game.is_winner(player):
-        return float("inf")
-
-    return 0.
+    return game.utility(player)
 
 
 def open_move_score(game, player):
@@ -63,13 +57,11 @@ def open_move_score(game, player):
     float
         The heuristic value of the current game state
     """
-    if game.is_loser(player):
-        return float("-inf")
-
-    if game.is_winner(player):
-        return float("inf")
+    utility, own_moves, _ = game.mobility(player)
+    if utility:
+        return utility
 
-    return float(len(game.get_legal_moves(player)))
+    return float(own_moves)
 
 
 def improved_score(game, player):
@@ -93,14 +85,10 @@ def improved_score(game, player):
     float
         The heuristic value of the current game state
     """
-    if game.is_loser(player):
-        return float("-inf")
+    utility, own_moves, opp_moves = game.mobility(player)
+    if utility:
+        return utility
 
-    if game.is_winner(player):
-        return float("inf")
-
-    own_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
     return float(own_moves - opp_moves)
 
 
@@ -126,11 +114,9 @@ def center_score(game, player):
     float
         The heuristic value of the current game state
     """
-    if game.is_loser(player):
-        return float("-inf")
-
-    if game.is_winner(player):
-        return float("inf")
+    utility = game.utility(player)
+    if utility:
+        return utility
 
     w, h = game.width / 2., game.height / 2.
     y, x = game.get_player_location(player)
@@ -260,7 +246,7 @@ if __name__ == "__main__":
     from isolation import Board
 
     # create an isolation board (by default 7x7)
-    player1 = competition_agent.CustomPlayer('data.json')
+    player1 = competition_agent.CustomPlayer('opening_book.bin')
     player2 = GreedyPlayer()
     game = Board(player1, player2)
     time_millis = lambda: 1000 * timeit.default_timer()
@@ -281,10 +267,10 @@ if __name__ == "__main__":
         time_left = lambda : 2000 - (time_millis() - move_start)
         move = player1.get_move(game, time_left)        
         move_end = time_left()
+        player1.update_opening_book(game, move)
         game.apply_move(move)
-        player1.update_opening_book(game)
 
-    player1.save_opening_book('data.json')    
+    player1.save_opening_book('opening_book.bin')
     # place player 1 on the board at row 2, column 3, then place player 2 on
     # the board at row 0, column 5; display the resulting board state.  Note
     # that the .apply_move() method changes the calling object in-place.
@@ -0,0 +1,314 @@
+"""This file contains the `StackSearch` class, a depth-limited alpha-beta
+search that keeps its state on an explicit stack instead of the Python call
+stack.
+
+The recursive searches of `AlphaBetaPlayer` and `CustomPlayer` create a
+Python frame for every node and, when the time runs out, unwind all of them
+with `SearchTimeout`. `StackSearch` walks the same tree in a single loop over
+preallocated per-ply arrays (move list, next move, alpha-beta window, best
+score and move), so a node costs no call and an aborted search returns from
+one frame. Plugged into a player (see the `stack_search` option of the
+players), it returns the same move and score as the player's recursive
+search; only the horizon nodes are not searched again by PVS, since their
+scores do not depend on the window.
+"""
+import math
+
+MAX_PLIES = 50  # deepest search the per-ply arrays are allocated for
+
+
+class StackSearch:
+    """Non-recursive alpha-beta search for a player.
+
+    The search uses the following attributes of `player`:
+
+    - `score(game, player)`: the heuristic value of the leaves (required),
+    - `check_timing()`: called at every node (required); may raise an
+      exception (e.g., `game_agent.SearchTimeout`) to abort the search,
+    - `tt`, `tablebase`, `endgame` (optional): the transposition table,
+      endgame tablebase and endgame solver, used as in
+      `AlphaBetaPlayer.min_value()`,
+    - `order_moves()`, `update_pv()`, `update_cutoff()` and the principal
+      variation tables of `AlphaBetaPlayer` (optional): the move ordering;
+      without them the transposition table move is searched first,
+    - `pvs` (optional): principal variation search,
+    - `leaves` (optional): incremented by the number of leaves evaluated.
+
+    Parameters
+    ----------
+    player : object
+        The searching player; the root of every search is its move.
+
+    min_node_key : int (optional)
+        Mixed into the transposition table key of the nodes where the
+        opponent is on move (see `game_agent.MIN_NODE_KEY`).
+    """
+    def __init__(self, player, min_node_key=0):
+        self.player = player
+        self.min_node_key = min_node_key
+        self.root_score = None
+        self._allocate(MAX_PLIES)
+
+    def _allocate(self, plies):
+        """Allocate the per-ply arrays for searches of up to `plies` plies. """
+        size = plies + 1
+        self._moves = [None] * size
+        self._next = [0] * size
+        self._alpha = [0.] * size
+        self._beta = [0.] * size
+        self._window = [0.] * size
+        self._best_score = [0.] * size
+        self._best_move = [None] * size
+        self._depth = [0] * size
+        self._key = [0] * size
+        self._null_window = [False] * size
+        self._research = [False] * size
+
+    def search(self, game, depth, alpha=-math.inf, beta=math.inf):
+        """Search `game` `depth` plies deep and return the best move of the
+        player, like `AlphaBetaPlayer.alphabeta()`; its score is stored in
+        `root_score`.
+
+        The board is restored if the search is aborted by an exception of
+        `check_timing()`, which is passed on to the caller.
+        """
+        player = self.player
+        player.check_timing()
+
+        # The search works on move indices (see Board.get_legal_indices)
+        legal_moves = game.get_legal_indices()
+        if not legal_moves:
+            # The player has lost
+            self.root_score = -math.inf
+            return (-1, -1)
+        if depth < 1:
+            return game.index_to_move(legal_moves[0])
+        if depth >= len(self._moves):
+            self._allocate(depth)
+
+        score_fn = player.score
+        check_timing = player.check_timing
+        tt = getattr(player, "tt", None)
+        tablebase = getattr(player, "tablebase", None)
+        endgame = getattr(player, "endgame", None)
+        pvs = getattr(player, "pvs", False)
+        ordering = hasattr(player, "order_moves")
+        min_node_key = self.min_node_key
+
+        moves_at, next_at, alpha_at, beta_at = self._moves, self._next, self._alpha, self._beta
+        window_at, best_score_at, best_move_at = self._window, self._best_score, self._best_move
+        depth_at, key_at = self._depth, self._key
+        null_window_at, research_at = self._null_window, self._research
+
+        # The root is searched like AlphaBetaPlayer.alphabeta() does
+        root_ply = game.move_count
+        key = game.zobrist_key
+        tt_move = None
+        if tt is not None:
+            tt_move = tt.lookup(key, depth, alpha, beta)[1]
+        if ordering:
+            player.pv_line = player.pv_table[root_ply][:player.pv_length[root_ply]]
+            player.follow_pv = False
+            player.order_moves(legal_moves, root_ply, tt_move, True)
+            player.pv_length[root_ply] = root_ply
+        elif tt_move in legal_moves:
+            legal_moves.remove(tt_move)
+            legal_moves.insert(0, tt_move)
+
+        moves_at[0] = legal_moves
+        next_at[0] = 0
+        alpha_at[0], beta_at[0], window_at[0] = alpha, beta, alpha
+        best_score_at[0] = -math.inf
+        best_move_at[0] = legal_moves[0]
+        depth_at[0] = depth
+        key_at[0] = key
+        research_at[0] = False
+
+        pv_length = player.pv_length if ordering else None
+        sp = 0
+        leaves = 0
+        try:
+            while True:
+                moves = moves_at[sp]
+                if depth_at[sp] == 1 and next_at[sp] == 0:
+                    # Frontier node: its children are horizon nodes, whose
+                    # scores do not depend on the window, so they are scored
+                    # in place and never searched again by PVS
+                    ply = root_ply + sp
+                    if ordering:
+                        pv_length[ply + 1] = ply + 1
+                        player.follow_pv = False
+                    best_score = best_score_at[sp]
+                    best_move = best_move_at[sp]
+                    window = window_at[sp]
+                    if sp & 1 == 0:
+                        beta = beta_at[sp]
+                        for move in moves:
+                            game.push_index(move)
+                            check_timing()
+                            score = None if tablebase is None else tablebase.score(game, player)
+                            if score is None:
+                                score = score_fn(game, player)
+                            game.pop()
+                            leaves += 1
+                            if score > best_score:
+                                best_score = score
+                                best_move = move
+                                if ordering and (sp == 0 or score > window):
+                                    player.update_pv(ply, move)
+                                if best_score >= beta:
+                                    if ordering and sp > 0:
+                                        player.update_cutoff(ply, move, 1)
+                                    break
+                                if best_score > window:
+                                    window = best_score
+                    else:
+                        alpha = alpha_at[sp]
+                        for move in moves:
+                            game.push_index(move)
+                            check_timing()
+                            score = None if tablebase is None else tablebase.score(game, player)
+                            if score is None:
+                                score = score_fn(game, player)
+                            game.pop()
+                            leaves += 1
+                            if score < best_score:
+                                best_score = score
+                                best_move = move
+                                if ordering and score < window:
+                                    player.update_pv(ply, move)
+                                if best_score <= alpha:
+                                    if ordering:
+                                        player.update_cutoff(ply, move, 1)
+                                    break
+                                if best_score < window:
+                                    window = best_score
+                    best_score_at[sp] = best_score
+                    best_move_at[sp] = best_move
+                    next_at[sp] = len(moves)
+
+                # Search the next move of the node at the top of the stack,
+                # or return its score to its parent if it has none left
+                index = next_at[sp]
+                if index < len(moves):
+                    move = moves[index]
+                    # Maximizing nodes (even plies) narrow the window from
+                    # below, minimizing nodes from above
+                    null_window = index > 0 and pvs and not research_at[sp]
+                    if sp & 1 == 0:
+                        child_alpha, child_beta = window_at[sp], beta_at[sp]
+                        if null_window:
+                            child_beta = math.nextafter(child_alpha, math.inf)
+                    else:
+                        child_alpha, child_beta = alpha_at[sp], window_at[sp]
+                        if null_window:
+                            child_alpha = math.nextafter(child_beta, -math.inf)
+                    null_window_at[sp] = null_window
+                    research_at[sp] = False
+                    child_depth = depth_at[sp] - 1
+                    game.push_index(move)
+
+                    # Enter the child node, as min_value()/max_value() do
+                    check_timing()
+                    ply = game.move_count
+                    if ordering:
+                        pv_length[ply] = ply
+                        # Only the first child of a node on the principal
+                        # variation is on it
+                        on_pv = player.follow_pv
+                        player.follow_pv = False
+
+                    child_moves = game.get_legal_indices()
+                    score = None
+                    if child_moves and tablebase is not None:
+                        score = tablebase.score(game, player)
+                    if score is None and not child_moves:
+                        score = score_fn(game, player)
+                    if score is None and endgame is not None:
+                        score = endgame.solve(game, player)
+                    if score is not None:
+                        leaves += 1
+                    else:
+                        # The child is an inner node: look it up and push it
+                        child_key = game.zobrist_key
+                        if sp & 1 == 0:
+                            child_key ^= min_node_key
+                        tt_move = None
+                        if tt is not None:
+                            score, tt_move = tt.lookup(child_key, child_depth, child_alpha, child_beta)
+                        if score is None:
+                            if ordering:
+                                player.order_moves(child_moves, ply, tt_move, on_pv)
+                            elif tt_move in child_moves:
+                                child_moves.remove(tt_move)
+                                child_moves.insert(0, tt_move)
+                            sp += 1
+                            moves_at[sp] = child_moves
+                            next_at[sp] = 0
+                            alpha_at[sp], beta_at[sp] = child_alpha, child_beta
+                            window_at[sp] = child_alpha if sp & 1 == 0 else child_beta
+                            best_score_at[sp] = -math.inf if sp & 1 == 0 else math.inf
+                            best_move_at[sp] = None
+                            depth_at[sp] = child_depth
+                            key_at[sp] = child_key
+                            research_at[sp] = False
+                            continue
+                    game.pop()
+                else:
+                    # All moves searched (or cut off): store the node
+                    score = best_score_at[sp]
+                    if tt is not None:
+                        tt.store(key_at[sp], depth_at[sp], score, alpha_at[sp], beta_at[sp],
+                                 best_move_at[sp])
+                    if sp == 0:
+                        break
+                    sp -= 1
+                    game.pop()
+                    move = moves_at[sp][next_at[sp]]
+
+                # Back in the parent (at the top of the stack) with the score
+                # of its child `move`
+                ply = root_ply + sp
+                window = window_at[sp]
+                if sp & 1 == 0:
+                    if null_window_at[sp] and window < score < beta_at[sp]:
+                        # The null window failed high: search again
+                        research_at[sp] = True
+                        continue
+                    if score > best_score_at[sp]:
+                        best_score_at[sp] = score
+                        best_move_at[sp] = move
+                        if ordering and (sp == 0 or score > window):
+                            player.update_pv(ply, move)
+                    if best_score_at[sp] >= beta_at[sp]:
+                        if ordering and sp > 0:
+                            player.update_cutoff(ply, move, depth_at[sp])
+                        next_at[sp] = len(moves_at[sp])
+                        continue
+                    window_at[sp] = max(window, best_score_at[sp])
+                else:
+                    if null_window_at[sp] and alpha_at[sp] < score < window:
+                        # The null window failed low: search again
+                        research_at[sp] = True
+                        continue
+                    if score < best_score_at[sp]:
+                        best_score_at[sp] = score
+                        best_move_at[sp] = move
+                        if ordering and score < window:
+                            player.update_pv(ply, move)
+                    if best_score_at[sp] <= alpha_at[sp]:
+                        if ordering:
+                            player.update_cutoff(ply, move, depth_at[sp])
+                        next_at[sp] = len(moves_at[sp])
+                        continue
+                    window_at[sp] = min(window, best_score_at[sp])
+                next_at[sp] += 1
+        finally:
+            # Restore the board of an aborted search
+            while game.move_count > root_ply:
+                game.pop()
+            if hasattr(player, "leaves"):
+                player.leaves += leaves
+
+        self.root_score = best_score_at[0]
+        return game.index_to_move(best_move_at[0])
@@ -0,0 +1,142 @@
+"""This file contains the `Tablebase` class, a table of exactly solved small
+endgame positions probed by `AlphaBetaPlayer`.
+
+The outcome of a position only depends on the locations of the players and
+on the blank cells either of them can still reach (see
+`Board.reachable_region`); the other blank cells can never be entered
+again. The tablebase therefore maps the key of that region (see
+`region_key`) to whether the player to move wins, for regions of at most
+`TABLEBASE_MAX_BLANKS` cells, however many dead cells the rest of the board
+has. It is stored in a memory-mapped key file (see `keyfile.py`) with the
+records
+
+    record : key (uint64), player to move wins (uint8)
+
+and built offline with `build_tablebase.py`.
+"""
+import struct
+
+from isolation import Board
+from keyfile import KeyFile
+
+MAGIC = b"ISOTBL02"
+RECORD = struct.Struct("<QB")
+
+TABLEBASE_MAX_BLANKS = 12  # largest region of a stored position
+TABLEBASE_SLACK = 20  # blank cells outside the region tolerated before probing
+
+
+def region_key(game, max_cells=TABLEBASE_MAX_BLANKS):
+    """Return the key of the reachable region of the current position of
+    `game`, or None if a player has not moved yet or the region has more
+    than `max_cells` cells.
+
+    The key hashes the locations of the player to move and of its opponent
+    and the cells of the region with the Zobrist tables of the board; it is
+    the smallest key of the symmetric images of the region, so all regions
+    symmetric to each other have the same key.
+    """
+    region = game.reachable_region(max_cells)
+    if region is None:
+        return None
+    active_idx, inactive_idx, mask = region
+    cells = []
+    while mask:
+        low = mask & -mask
+        cells.append(low.bit_length() - 1)
+        mask ^= low
+
+    best_key = None
+    for _, _, _, blocked, player_1, player_2 in Board._get_symmetries(game.width, game.height):
+        key = player_1[active_idx] ^ player_2[inactive_idx]
+        for idx in cells:
+            key ^= blocked[idx]
+        if best_key is None or key < best_key:
+            best_key = key
+    return best_key
+
+
+class Tablebase(KeyFile):
+    """Endgame tablebase of (position key -> player to move wins) entries
+    backed by a sorted, memory-mapped binary file.
+
+    Parameters
+    ----------
+    filename : str (optional)
+        The tablebase file to open. A missing file (or None) gives an empty
+        tablebase.
+
+    width : int (optional)
+        The number of columns of the boards of the tablebase.
+
+    height : int (optional)
+        The number of rows of the boards of the tablebase.
+
+    max_blanks : int (optional)
+        Positions with a larger reachable region are never looked up.
+
+    Attributes
+    ----------
+    probes : int
+        The number of positions with a small region looked up in the
+        stored entries.
+
+    hits : int
+        The number of those positions that were found.
+    """
+    MAGIC = MAGIC
+    RECORD = RECORD
+    DESCRIPTION = "endgame tablebase"
+
+    def __init__(self, filename=None, width=7, height=7, max_blanks=TABLEBASE_MAX_BLANKS):
+        super().__init__(filename, width, height)
+        self.max_blanks = max_blanks
+        self.probes = 0
+        self.hits = 0
+
+    def add_position(self, game, wins):
+        """Store whether the player to move wins the current position of
+        `game` (and all positions with a symmetric region), which must have a
+        reachable region of at most `max_blanks` cells.
+        """
+        key = region_key(game, self.max_blanks)
+        if key is None:
+            raise ValueError("The position has no small reachable region")
+        self.add(key, wins)
+
+    def lookup_position(self, game):
+        """Return True if the player to move wins the current position of
+        `game`, False if it loses and None if the position is not stored.
+        """
+        # Cheap test first: the region is made of blank cells, some of which
+        # may be dead
+        if game.width * game.height - game.move_count > self.max_blanks + TABLEBASE_SLACK:
+            return None
+        if not self._count and not self._new_entries:
+            return None
+        key = region_key(game, self.max_blanks)
+        if key is None:
+            return None
+        self.probes += 1
+        wins = self.lookup(key)
+        if wins is not None:
+            self.hits += 1
+        return wins
+
+    def score(self, game, player):
+        """Return the exact utility of the current position of `game` for
+        `player` (+inf if the player wins, -inf if it loses), or None if the
+        position is not stored.
+        """
+        wins = self.lookup_position(game)
+        if wins is None:
+            return None
+        if wins == (player == game.active_player):
+            return float("inf")
+        return float("-inf")
+
+    def _encode(self, wins):
+        return (int(wins),)
+
+    def _decode(self, fields):
+        return bool(fields[0])
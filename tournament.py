@@ -11,15 +11,22 @@ players, and the players play each match twice -- once as the first player and
 once as the second player.  Randomizing the openings and switching the player
 order corrects for imbalances due to both starting position and initiative.
 """
+import argparse
+import multiprocessing
+import os
 import random
+import time
+import timeit
 
 from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 
 from isolation import Board
 from sample_players import (RandomPlayer, open_move_score,
                             improved_score, center_score)
-from game_agent import (MinimaxPlayer, AlphaBetaPlayer, custom_score,
-                        custom_score_2, custom_score_3)
+from game_agent import (MinimaxPlayer, AlphaBetaPlayer, MCTSPlayer, custom_score,
+                        custom_score_2, custom_score_3, TT_DEFAULT_BYTES)
+from tablebase import Tablebase
 
 NUM_MATCHES = 5  # number of matches against each opponent
 TIME_LIMIT = 150  # number of milliseconds before timeout
@@ -29,38 +36,166 @@ This script evaluates the performance of the custom_score evaluation
 function against a baseline agent using alpha-beta search and iterative
 deepening (ID) called `AB_Improved`. The three `AB_Custom` agents use
 ID and alpha-beta search with the custom_score functions defined in
-game_agent.py.
+game_agent.py, and the `MCTS` agent uses Monte Carlo tree search.
 """
 
 Agent = namedtuple("Agent", ["player", "name"])
 
+# Agents of a worker process of the parallel tournament, see init_worker()
+_worker_agents = None
 
-def play_round(opponent_agent, test_agents, win_counts, num_matches):
+
+def make_agents(tt_bytes=TT_DEFAULT_BYTES, collect_stats=False, tablebase_file=None,
+                pondering=False):
+    """Return the lists of test agents and cpu agents of the tournament. The
+    alpha-beta test agents search on their opponent's time if `pondering`.
+    """
+    tablebase = Tablebase(tablebase_file) if tablebase_file else None
+
+    # Define two agents to compare -- these agents will play from the same
+    # starting position against the same adversaries in the tournament
+    test_agents = [
+        Agent(AlphaBetaPlayer(score_fn=improved_score, tt_bytes=tt_bytes, collect_stats=collect_stats,
+                              tablebase=tablebase, pondering=pondering), "AB_Improved"),
+        Agent(AlphaBetaPlayer(score_fn=custom_score, tt_bytes=tt_bytes, collect_stats=collect_stats,
+                              tablebase=tablebase, pondering=pondering), "AB_Custom"),
+        Agent(AlphaBetaPlayer(score_fn=custom_score_2, tt_bytes=tt_bytes, collect_stats=collect_stats,
+                              tablebase=tablebase, pondering=pondering), "AB_Custom_2"),
+        Agent(AlphaBetaPlayer(score_fn=custom_score_3, tt_bytes=tt_bytes, collect_stats=collect_stats,
+                              tablebase=tablebase, pondering=pondering), "AB_Custom_3"),
+        Agent(MCTSPlayer(collect_stats=collect_stats), "MCTS")
+    ]
+
+    # Define a collection of agents to compete against the test agents
+    cpu_agents = [
+        Agent(RandomPlayer(), "Random"),
+        Agent(MinimaxPlayer(score_fn=open_move_score, collect_stats=collect_stats), "MM_Open"),
+        Agent(MinimaxPlayer(score_fn=center_score, collect_stats=collect_stats), "MM_Center"),
+        Agent(MinimaxPlayer(score_fn=improved_score, collect_stats=collect_stats), "MM_Improved"),
+        Agent(AlphaBetaPlayer(score_fn=open_move_score, tt_bytes=tt_bytes, collect_stats=collect_stats,
+                              tablebase=tablebase), "AB_Open"),
+        Agent(AlphaBetaPlayer(score_fn=center_score, tt_bytes=tt_bytes, collect_stats=collect_stats,
+                              tablebase=tablebase), "AB_Center"),
+        Agent(AlphaBetaPlayer(score_fn=improved_score, tt_bytes=tt_bytes, collect_stats=collect_stats,
+                              tablebase=tablebase), "AB_Improved")
+    ]
+    return test_agents, cpu_agents
+
+
+def search_stats_line(agents):
+    """Summarize the search statistics collected by the agents during one
+    game and clear them for the next game.
+    """
+    parts = []
+    for agent in agents:
+        stats = getattr(agent.player, "stats", None)
+        if stats is None or not stats.moves:
+            continue
+        summary = stats.summary()
+        stats.moves = []
+        ebf = "-" if summary["ebf"] is None else "{:.2f}".format(summary["ebf"])
+        parts.append("{}: {} nodes, {} leaves, {} cutoffs, {:.0f} nodes/s, depth {:.1f}, EBF {}".format(
+            agent.name, summary["nodes"], summary["leaves"], summary["cutoffs"],
+            summary["nps"], summary["depth"], ebf))
+    return " | ".join(parts)
+
+
+def available_cores():
+    """Return the list of CPU cores this process may run on. """
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def init_worker(tt_bytes, collect_stats, tablebase_file, cores):
+    """Build the agents of a worker process and pin it to its own core.
+
+    Games are timed by the wall clock, so two games sharing a core would both
+    lose search depth (or time out) compared to a serial tournament.
+    """
+    global _worker_agents
+    _worker_agents = make_agents(tt_bytes, collect_stats, tablebase_file)
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {cores.get()})
+
+
+def play_game(opponent_idx, agent_idx, agent_first, opening, seed):
+    """Play a single game between two agents in a worker process.
+
+    Returns
+    ----------
+    (bool, str, float, str)
+        Whether the test agent won, the termination reason, the share of
+        the wall clock time of the game the worker actually spent on a CPU,
+        and the search statistics of the game (see `search_stats_line`).
+    """
+    test_agents, cpu_agents = _worker_agents
+    opponent = cpu_agents[opponent_idx].player
+    agent = test_agents[agent_idx].player
+    if agent_first:
+        game = Board(agent, opponent, seed=seed)
+    else:
+        game = Board(opponent, agent, seed=seed)
+    for move in opening:
+        game.apply_move(move)
+
+    # RandomPlayer draws from the global generator
+    random.seed(seed)
+    wall_start, cpu_start = timeit.default_timer(), time.process_time()
+    winner, _, termination = game.play(time_limit=TIME_LIMIT)
+    wall = timeit.default_timer() - wall_start
+    cpu = time.process_time() - cpu_start
+    stats = search_stats_line([test_agents[agent_idx], cpu_agents[opponent_idx]])
+    return winner is agent, termination, cpu / wall if wall > 0 else 1., stats
+
+
+def play_round(opponent_agent, test_agents, win_counts, num_matches, rng=random,
+               executor=None, opponent_idx=None, cpu_shares=None, stats_lines=None):
     """Compare the test agents to the cpu agent in "fair" matches.
 
     "Fair" matches use random starting locations and force the agents to
     play as both first and second player to control for advantages resulting
     from choosing better opening moves or having first initiative to move.
+
+    The openings and the seeds of the boards are drawn from `rng`, so a
+    seeded `random.Random` replays the same games.
+
+    If an `executor` is given, the games are played in its worker processes
+    (see `init_worker`), which identify the opponent by `opponent_idx`; the
+    CPU share of every game is appended to `cpu_shares`.
+
+    The search statistics of every game (for agents collecting them) are
+    appended to `stats_lines`.
     """
+    if executor is not None:
+        return play_round_parallel(opponent_agent, test_agents, win_counts,
+                                   num_matches, rng, executor, opponent_idx,
+                                   cpu_shares, stats_lines)
+
     timeout_count = 0
     forfeit_count = 0
     for _ in range(num_matches):
 
-        games = sum([[Board(opponent_agent.player, agent.player),
-                      Board(agent.player, opponent_agent.player)]
+        seed = rng.getrandbits(32)
+        games = sum([[Board(opponent_agent.player, agent.player, seed=seed),
+                      Board(agent.player, opponent_agent.player, seed=seed)]
                     for agent in test_agents], [])
 
         # initialize all games with a random move and response
         for _ in range(2):
-            move = random.choice(games[0].get_legal_moves())
+            move = rng.choice(games[0].get_legal_moves())
             for game in games:
                 game.apply_move(move)
 
         # play all games and tally the results
-        for game in games:
+        for game_idx, game in enumerate(games):
             winner, _, termination = game.play(time_limit=TIME_LIMIT)
             win_counts[winner] += 1
 
+            stats = search_stats_line([test_agents[game_idx // 2], opponent_agent])
+            if stats and stats_lines is not None:
+                stats_lines.append(stats)
+
             if termination == "timeout":
                 timeout_count += 1
             elif termination == "forfeit":
@@ -69,18 +204,57 @@ def play_round(opponent_agent, test_agents, win_counts, num_matches):
     return timeout_count, forfeit_count
 
 
+def play_round_parallel(opponent_agent, test_agents, win_counts, num_matches,
+                        rng, executor, opponent_idx, cpu_shares, stats_lines):
+    """Play the games of `play_round` concurrently in a process pool. """
+    futures = []
+    for _ in range(num_matches):
+        seed = rng.getrandbits(32)
+        opening_board = Board(None, None)
+        opening = []
+        for _ in range(2):
+            move = rng.choice(opening_board.get_legal_moves())
+            opening_board.apply_move(move)
+            opening.append(move)
+
+        for agent_idx, agent in enumerate(test_agents):
+            for agent_first in [False, True]:
+                future = executor.submit(play_game, opponent_idx, agent_idx,
+                                         agent_first, opening, seed)
+                futures.append((agent, future))
+
+    timeout_count = 0
+    forfeit_count = 0
+    for agent, future in futures:
+        agent_won, termination, cpu_share, stats = future.result()
+        if stats and stats_lines is not None:
+            stats_lines.append(stats)
+        win_counts[agent.player if agent_won else opponent_agent.player] += 1
+        if cpu_shares is not None:
+            cpu_shares.append(cpu_share)
+
+        if termination == "timeout":
+            timeout_count += 1
+        elif termination == "forfeit":
+            forfeit_count += 1
+
+    return timeout_count, forfeit_count
+
+
 def update(total_wins, wins):
     for player in total_wins:
         total_wins[player] += wins[player]
     return total_wins
 
 
-def play_matches(opponent_agents, test_agents, num_matches):
+def play_matches(opponent_agents, test_agents, num_matches, rng=random, executor=None):
     """Play matches between the test agent and each cpu_agent individually. """
     total_wins = {agent.player: 0 for agent in test_agents}
     total_timeouts = 0.
     total_forfeits = 0.
     total_matches = 2 * num_matches * len(opponent_agents)
+    cpu_shares = []
+    stats_lines = []
 
     print("\n{:^9}{:^13}".format("Match #", "Opponent") + ''.join(['{:^13}'.format(x[1].name) for x in enumerate(test_agents)]))
     print("{:^9}{:^13} ".format("", "") +  ' '.join(['{:^5}| {:^5}'.format("Won", "Lost") for x in enumerate(test_agents)]))
@@ -91,7 +265,8 @@ def play_matches(opponent_agents, test_agents, num_matches):
 
         print("{!s:^9}{:^13}".format(idx + 1, agent.name), end="", flush=True)
 
-        counts = play_round(agent, test_agents, wins, num_matches)
+        counts = play_round(agent, test_agents, wins, num_matches, rng,
+                            executor, idx, cpu_shares, stats_lines)
         total_timeouts += counts[0]
         total_forfeits += counts[1]
         total_wins = update(total_wins, wins)
@@ -112,6 +287,11 @@ def play_matches(opponent_agents, test_agents, num_matches):
             ) for x in enumerate(test_agents)
     ]))
 
+    if stats_lines:
+        print("\nSearch statistics per game:")
+        for line in stats_lines:
+            print("  " + line)
+
     if total_timeouts:
         print(("\nThere were {} timeouts during the tournament -- make sure " +
                "your agent handles search timeout correctly, and consider " +
@@ -120,35 +300,75 @@ def play_matches(opponent_agents, test_agents, num_matches):
     if total_forfeits:
         print(("\nYour ID search forfeited {} games while there were still " +
                "legal moves available to play.\n").format(total_forfeits))
+    if cpu_shares:
+        cpu_share = sum(cpu_shares) / len(cpu_shares)
+        print("\nGames got {:.1f}% of their wall clock time on a CPU (lowest: {:.1f}%).".format(
+            100 * cpu_share, 100 * min(cpu_shares)))
+        if cpu_share < 0.9:
+            print("The workers compete for CPU time, so timeouts and search " +
+                  "depths are not comparable to a serial run -- consider " +
+                  "reducing --workers.")
 
 
 def main():
-
-    # Define two agents to compare -- these agents will play from the same
-    # starting position against the same adversaries in the tournament
-    test_agents = [
-        Agent(AlphaBetaPlayer(score_fn=improved_score), "AB_Improved"),
-        Agent(AlphaBetaPlayer(score_fn=custom_score), "AB_Custom"),
-        Agent(AlphaBetaPlayer(score_fn=custom_score_2), "AB_Custom_2"),
-        Agent(AlphaBetaPlayer(score_fn=custom_score_3), "AB_Custom_3")
-    ]
-
-    # Define a collection of agents to compete against the test agents
-    cpu_agents = [
-        Agent(RandomPlayer(), "Random"),
-        Agent(MinimaxPlayer(score_fn=open_move_score), "MM_Open"),
-        Agent(MinimaxPlayer(score_fn=center_score), "MM_Center"),
-        Agent(MinimaxPlayer(score_fn=improved_score), "MM_Improved"),
-        Agent(AlphaBetaPlayer(score_fn=open_move_score), "AB_Open"),
-        Agent(AlphaBetaPlayer(score_fn=center_score), "AB_Center"),
-        Agent(AlphaBetaPlayer(score_fn=improved_score), "AB_Improved")
-    ]
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument("--tt-kb", type=int, default=TT_DEFAULT_BYTES // 2**10,
+                        help="memory ceiling of the transposition table of "
+                             "each alpha-beta agent in KiB (0 disables it)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed the openings and all move generators to "
+                             "replay the same tournament")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of games to play in parallel, each in "
+                             "its own process pinned to one core")
+    parser.add_argument("--stats", action="store_true",
+                        help="collect and print the search statistics "
+                             "(nodes, depth, branching factor) of every game")
+    parser.add_argument("--tablebase", default=None,
+                        help="endgame tablebase file of the alpha-beta agents "
+                             "(see build_tablebase.py)")
+    parser.add_argument("--ponder", action="store_true",
+                        help="let the alpha-beta test agents search on their "
+                             "opponent's time in a helper process")
+    args = parser.parse_args()
+    tt_bytes = args.tt_kb * 2**10
+    if args.ponder and not tt_bytes:
+        parser.error("--ponder requires a transposition table")
+    if args.ponder and args.workers > 1:
+        # The helper processes would share the core of their game
+        parser.error("--ponder cannot be combined with --workers")
+
+    rng = random
+    if args.seed is not None:
+        # The global generator is still used by RandomPlayer
+        random.seed(args.seed)
+        rng = random.Random(args.seed)
+
+    test_agents, cpu_agents = make_agents(tt_bytes, args.stats, args.tablebase, args.ponder)
 
     print(DESCRIPTION)
     print("{:^74}".format("*************************"))
     print("{:^74}".format("Playing Matches"))
     print("{:^74}".format("*************************"))
-    play_matches(cpu_agents, test_agents, NUM_MATCHES)
+    if args.workers <= 1:
+        try:
+            play_matches(cpu_agents, test_agents, NUM_MATCHES, rng)
+        finally:
+            for agent in test_agents:
+                if hasattr(agent.player, "close"):
+                    agent.player.close()
+        return
+
+    cores = available_cores()
+    if args.workers > len(cores):
+        print("WARNING: {} workers share {} cores; games will compete for CPU time.\n".format(
+            args.workers, len(cores)))
+    core_queue = multiprocessing.Queue()
+    for i in range(args.workers):
+        core_queue.put(cores[i % len(cores)])
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker,
+                             initargs=(tt_bytes, args.stats, args.tablebase, core_queue)) as executor:
+        play_matches(cpu_agents, test_agents, NUM_MATCHES, rng, executor)
 
 
 if __name__ == "__main__":